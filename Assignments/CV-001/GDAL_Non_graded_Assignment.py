@@ -1,26 +1,105 @@
 # Import required libraries
+import time  # For startup timing (imported first so the clock starts as early as possible)
+STARTUP_BEGIN = time.perf_counter()  # Reference point of the --profile-startup report
+import argparse  # For the command-line interface
+import importlib  # For importing the heavy modules during warm-up
+import threading  # For cancelling background cache builds
 import tkinter as tk  # For creating GUI
 from tkinter import ttk, filedialog, messagebox  # Additional GUI components
-import numpy as np  # For array operations
-from PIL import Image, ImageTk, ImageDraw  # For image processing and display
-from osgeo import gdal, osr  # GDAL library for GeoTIFF handling
-import os  # For file operations
+from tile_loader import TileLoader  # For background tile loading
+from redraw_scheduler import RedrawScheduler  # For coalescing zoom/pan redraws
+import instrumentation as inst  # For timing spans, counters and the FPS overlay
+
+# NumPy, PIL, OpenCV, GDAL and the raster helpers built on them are imported inside the methods
+# that first need them, so the window appears before they load. warm_up() imports them on a
+# background thread while the window draws; a method needing one earlier waits on Python's
+# import lock and then uses the module the warm-up loaded.
+WARM_UP_MODULES = ('numpy', 'PIL.Image', 'PIL.ImageTk', 'cv2', 'osgeo.gdal', 'osgeo.osr',
+                   'geotransform', 'raster_source', 'raster_cache', 'tile_renderer', 'marker_layer', 'point_io')
+
+
+def warm_up():
+    # Import the heavy modules and initialize GDAL/PROJ on a worker thread; returns the seconds each took
+    timings = {}
+    for name in WARM_UP_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue  # Reported properly when the viewer needs the module
+        timings[name] = time.perf_counter() - start
+    try:
+        from osgeo import gdal, osr  # Already loaded above
+    except ImportError:
+        return timings
+
+    # Load the GeoTIFF driver and open the PROJ database that the first GeoTransform would otherwise wait for
+    start = time.perf_counter()
+    gdal.GetDriverByName('GTiff')
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    timings['gdal/proj init'] = time.perf_counter() - start
+    return timings
+
+
+class StartupProfile:
+    # Startup milestones measured from STARTUP_BEGIN, printed once the window is up and warm-up is done
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.marks = []  # (milestone, seconds since STARTUP_BEGIN)
+        self.warm_up_timings = None
+        self.window_shown = False
+        self.reported = False
+
+    def mark(self, name):
+        # Record a milestone
+        self.marks.append((name, time.perf_counter() - STARTUP_BEGIN))
+
+    def on_window_shown(self):
+        # The main window was mapped for the first time
+        if not self.window_shown:
+            self.window_shown = True
+            self.mark('first window')
+            self.report()
+
+    def on_warm_up_done(self, timings):
+        # The background warm-up finished
+        self.warm_up_timings = timings
+        self.mark('warm-up done')
+        self.report()
+
+    def report(self):
+        # Print the milestones and per-module warm-up times once both are known
+        if not self.enabled or self.reported or not self.window_shown or self.warm_up_timings is None:
+            return
+        self.reported = True
+        print("Startup (ms since the viewer module started loading):")
+        for name, seconds in self.marks:
+            print(f"  {name:24s} {seconds * 1000:8.1f}")
+        print("Background warm-up (ms):")
+        for name, seconds in self.warm_up_timings.items():
+            print(f"  {name:24s} {seconds * 1000:8.1f}")
 
 class GeoTIFFViewer:
-    def __init__(self, root):
+    def __init__(self, root, startup=None):
         # Initialize the main window
         self.root = root
+        self.startup = startup or StartupProfile()  # Startup milestones (printed with --profile-startup)
         self.root.title("GeoTIFF Viewer - Computer Vision Assignment")
         self.root.geometry("1000x700")
         
         # Initialize variables to store image data
         self.dataset = None  # GDAL dataset object
-        self.image_array = None  # Image data as numpy array
+        self.image_width = 0  # Raster width in pixels
+        self.image_height = 0  # Raster height in pixels
         self.geotransform = None  # Geographic transformation parameters
         self.projection = None  # Coordinate system information
-        self.display_image = None  # Image for display in GUI
-        self.photo_image = None  # PhotoImage object for tkinter
-        self.canvas_image = None  # Canvas image reference
+        self.transform = None  # GeoTransform built from the geotransform and projection
+        self.file_path = None  # Path of the loaded file (used as the disk cache key)
+        self.loaded_source = None  # Raster source built for the current file and settings
+        self.raster_cache = None  # Decoded rasters kept on disk between sessions (created on first load)
+        self.cache_build = None  # (job key, cancel event) of the background cache build, if any
+        self.renderer = None  # Tiled renderer for the loaded image
         
         # Variables for zoom and pan functionality
         self.zoom_factor = 1.0  # Current zoom level
@@ -29,11 +108,39 @@ class GeoTIFFViewer:
         self.image_offset_x = 0  # Image offset in X direction
         self.image_offset_y = 0  # Image offset in Y direction
         
-        # List to store marked locations
-        self.marked_points = []
+        # Layer that stores marked locations (created on first load)
+        self.markers = None
+        
+        # Worker threads for GDAL reads and tile resampling
+        self.loader = TileLoader(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # Create the GUI interface
         self.create_gui()
+        self.startup.mark('gui built')
+        
+        # Merge zoom/pan events into at most one redraw per frame
+        self.scheduler = RedrawScheduler(self.canvas, self.draw_preview_frame, self.draw_final_frame)
+        
+        # Live FPS/latency overlay, refreshed while profiling is on
+        self.overlay_job = None
+        if inst.is_enabled():
+            self.update_overlay()
+        
+        # Load the heavy modules in the background once the window has been drawn
+        self.root.bind('<Map>', self.on_map, add='+')
+        self.root.after_idle(self.start_warm_up)
+    
+    def start_warm_up(self):
+        # Import NumPy/PIL/GDAL and the raster helpers on a worker thread while the window is idle
+        self.startup.mark('warm-up started')
+        self.loader.submit(('warm-up',), warm_up, lambda key, timings: self.startup.on_warm_up_done(timings),
+                           lambda key, error: self.startup.on_warm_up_done({}))
+    
+    def on_map(self, event):
+        # The first <Map> of the main window marks the time to first window
+        if event.widget is self.root:
+            self.startup.on_window_shown()
         
     def create_gui(self):
         # Create main frame to hold all components
@@ -48,6 +155,42 @@ class GeoTIFFViewer:
         load_button = ttk.Button(control_frame, text="Load GeoTIFF Image", command=self.load_image)
         load_button.pack(side=tk.LEFT, padx=(0, 10))
         
+        # Build overview pyramid button (speeds up zoomed-out views of large files)
+        overview_button = ttk.Button(control_frame, text="Build Overviews", command=self.build_pyramid)
+        overview_button.pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Display stretch selection for non-uint8 images
+        stretch_frame = ttk.Frame(control_frame)
+        stretch_frame.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(stretch_frame, text="Stretch:").pack(anchor=tk.W)
+        self.stretch_var = tk.StringVar(value='minmax')  # Variable for the selected stretch
+        stretch_box = ttk.Combobox(stretch_frame, textvariable=self.stretch_var, width=10,
+                                   values=('minmax', 'percentile'), state='readonly')
+        stretch_box.pack()
+        stretch_box.bind('<<ComboboxSelected>>', self.on_stretch_change)
+        
+        # Band-to-channel mapping (one band for grayscale, three for an RGB/false-colour composite)
+        band_frame = ttk.Frame(control_frame)
+        band_frame.pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Label(band_frame, text="Bands (R,G,B):").pack(anchor=tk.W)
+        self.bands_var = tk.StringVar(value='1')  # Variable for the band mapping
+        bands_entry = ttk.Entry(band_frame, textvariable=self.bands_var, width=10)
+        bands_entry.pack()
+        bands_entry.bind('<Return>', self.on_stretch_change)
+        ttk.Button(band_frame, text="Apply", command=self.on_stretch_change).pack(pady=(2, 0))
+        
+        # Option to keep decoded rasters in a memory-mapped disk cache
+        self.cache_var = tk.BooleanVar(value=False)  # Variable for the disk cache option (off: it decodes whole files)
+        ttk.Checkbutton(control_frame, text="Disk cache", variable=self.cache_var).pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Profiling switch (shows the FPS/latency overlay) and trace export
+        profile_frame = ttk.Frame(control_frame)
+        profile_frame.pack(side=tk.LEFT, padx=(0, 10))
+        self.profile_var = tk.BooleanVar(value=inst.is_enabled())  # Variable for the profiling option
+        ttk.Checkbutton(profile_frame, text="Profile", variable=self.profile_var,
+                        command=self.on_profile_toggle).pack(anchor=tk.W)
+        ttk.Button(profile_frame, text="Save Trace", command=self.save_trace).pack(pady=(2, 0))
+        
         # Mouse coordinates display
         coord_frame = ttk.Frame(control_frame)
         coord_frame.pack(side=tk.LEFT, padx=(0, 20))
@@ -69,6 +212,15 @@ class GeoTIFFViewer:
         ttk.Label(coord_frame, text="Latitude:").grid(row=1, column=2, sticky=tk.W)
         self.lat_var = tk.StringVar()  # Variable to hold latitude
         ttk.Entry(coord_frame, textvariable=self.lat_var, width=12, state='readonly').grid(row=1, column=3, padx=(5, 10))
+
+        # Coordinates in the dataset's own coordinate system
+        ttk.Label(coord_frame, text="Map X:").grid(row=2, column=0, sticky=tk.W)
+        self.map_x_var = tk.StringVar()  # Variable to hold the dataset X coordinate
+        ttk.Entry(coord_frame, textvariable=self.map_x_var, width=12, state='readonly').grid(row=2, column=1, padx=(5, 10))
+
+        ttk.Label(coord_frame, text="Map Y:").grid(row=2, column=2, sticky=tk.W)
+        self.map_y_var = tk.StringVar()  # Variable to hold the dataset Y coordinate
+        ttk.Entry(coord_frame, textvariable=self.map_y_var, width=12, state='readonly').grid(row=2, column=3, padx=(5, 10))
         
         # Marking location input frame
         mark_frame = ttk.Frame(control_frame)
@@ -88,6 +240,10 @@ class GeoTIFFViewer:
         mark_button = ttk.Button(mark_frame, text="Mark Location", command=self.mark_location)
         mark_button.grid(row=3, column=0, columnspan=2, pady=(5, 0))
         
+        # Import button to add many points from a CSV or GeoJSON file
+        import_button = ttk.Button(mark_frame, text="Import Points", command=self.import_points)
+        import_button.grid(row=4, column=0, columnspan=2, pady=(5, 0))
+        
         # Create canvas for image display
         self.canvas = tk.Canvas(main_frame, bg='white', width=800, height=600)
         self.canvas.pack(fill=tk.BOTH, expand=True)
@@ -110,11 +266,18 @@ class GeoTIFFViewer:
             return
             
         try:
+            from osgeo import gdal  # GDAL library for GeoTIFF handling (normally loaded by the warm-up)
+            from geotransform import GeoTransform  # For vectorized pixel <-> geo conversion
+            from marker_layer import MarkerLayer  # For bulk point markers
+            from raster_cache import RasterCache  # For the decoded disk cache
+            from raster_source import default_band_mapping  # For the default composite
+            
             # Load the GeoTIFF file using GDAL
             self.dataset = gdal.Open(file_path)
             if self.dataset is None:
                 messagebox.showerror("Error", "Could not open the selected file")
                 return
+            self.file_path = file_path
             
             # Get image dimensions
             width = self.dataset.RasterXSize  # Image width in pixels
@@ -126,51 +289,176 @@ class GeoTIFFViewer:
             # Get coordinate system information
             self.projection = self.dataset.GetProjection()
             
-            # Read image data from first band (assuming RGB or grayscale)
-            band = self.dataset.GetRasterBand(1)  # Get first band
-            self.image_array = band.ReadAsArray()  # Read band data as numpy array
-            
-            # Normalize image data for display (convert to 0-255 range)
-            if self.image_array.dtype != np.uint8:
-                # Normalize to 0-255 range for display
-                img_min = np.min(self.image_array)
-                img_max = np.max(self.image_array)
-                self.image_array = ((self.image_array - img_min) / (img_max - img_min) * 255).astype(np.uint8)
-            
-            # Convert numpy array to PIL Image for display
-            if len(self.image_array.shape) == 2:  # Grayscale image
-                pil_image = Image.fromarray(self.image_array, 'L')
-            else:  # Color image
-                pil_image = Image.fromarray(self.image_array, 'RGB')
+            # Precompute the inverse transform and the reprojection to WGS84 once per dataset
+            self.transform = GeoTransform(self.geotransform, self.projection)
             
-            # Store original image for zoom/pan operations
-            self.original_image = pil_image
+            # Store image size for coordinate checks
+            self.image_width = width
+            self.image_height = height
             
-            # Display the image on canvas
-            self.display_image_on_canvas(pil_image)
+            # Default to a natural-colour composite for multi-band images
+            self.bands_var.set(",".join(str(index) for index in default_band_mapping(self.dataset)))
             
             # Reset zoom and pan parameters
             self.zoom_factor = 1.0
             self.image_offset_x = 0
             self.image_offset_y = 0
             
-            # Clear any existing marked points
-            self.marked_points = []
+            # Create the marker layer and disk cache on first use, then clear any existing marked points
+            if self.markers is None:
+                self.markers = MarkerLayer(self.canvas)
+                self.raster_cache = RasterCache()
+            self.markers.clear(width, height)
             
-            messagebox.showinfo("Success", f"Image loaded successfully!\nDimensions: {width} x {height}")
+            # Drop the previous renderer, its cached tiles and any queued redraws
+            self.scheduler.cancel()
+            if self.renderer is not None:
+                self.renderer.clear()
+                self.renderer = None
+            self.canvas.delete("all")
+            
+            # Create a windowed reader for the selected bands on a worker thread (band statistics
+            # can be slow); pixels are then read per visible tile, from overviews when zoomed out
+            def on_loaded(key, source):
+                self.on_source_ready(key, source)
+                messagebox.showinfo("Success", f"Image loaded successfully!\nDimensions: {width} x {height}")
+            
+            self.loader.cancel(('source',))
+            self.loader.submit(('source',), self.source_job(), on_loaded, self.on_source_error)
             
         except Exception as e:
             # Show error message if loading fails
             messagebox.showerror("Error", f"Failed to load image: {str(e)}")
     
-    def display_image_on_canvas(self, pil_image):
-        # Resize image to fit canvas while maintaining aspect ratio
+    def build_pyramid(self):
+        # Build a .ovr overview pyramid for the loaded dataset on demand
+        if self.dataset is None or self.renderer is None:
+            messagebox.showerror("Error", "Please load an image first")
+            return
+        
+        from raster_source import build_overviews, has_overviews  # For the .ovr pyramid
+        if has_overviews(self.dataset):
+            messagebox.showinfo("Overviews", "This image already has overviews")
+            return
+        
+        try:
+            levels = build_overviews(self.dataset)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to build overviews: {str(e)}")
+            return
+        
+        # Cached tiles and the source's per-thread handles predate the .ovr file, so build a new
+        # source from fresh handles; on_source_ready clears the tiles and renders again
+        self.on_stretch_change()
+        messagebox.showinfo("Overviews", f"Built overview levels: {levels}")
+    
+    def source_job(self):
+        # Read the band mapping and stretch on the Tk thread and return a job that builds the
+        # raster source on a worker thread
+        from osgeo import gdal  # GDAL library for GeoTIFF handling
+        from raster_source import GDALRasterSource, parse_band_mapping  # For windowed reads
+        from raster_cache import CachedRasterSource  # For paging pixels from the disk cache
+        bands = parse_band_mapping(self.bands_var.get(), self.dataset.RasterCount)
+        stretch = self.stretch_var.get()
+        path = self.file_path
+        cache = self.raster_cache if self.cache_var.get() else None
+        
+        def job():
+            # Page pixels from the decoded disk cache when this file was opened before
+            if cache is not None:
+                cached = cache.get(path, bands, stretch)
+                if cached is not None:
+                    return CachedRasterSource(cached, bands, stretch)
+            # Own handle: the Tk thread's dataset must not be used from this worker
+            return GDALRasterSource(gdal.Open(path, gdal.GA_ReadOnly), bands=bands, stretch=stretch)
+        return job
+    
+    def on_source_ready(self, key, source):
+        # Swap in a newly built raster source and draw it (runs on the Tk thread)
+        from tile_renderer import TiledRenderer, preview_size  # For viewport-only tiled rendering
+        from raster_source import GDALRasterSource  # For telling uncached sources apart
+        self.loaded_source = source
+        if self.renderer is None:
+            self.renderer = TiledRenderer(self.canvas, source, loader=self.loader)
+        else:
+            self.renderer.clear()
+            self.renderer.source = source
+        self.display_image_on_canvas()
+        
+        # Build the low-resolution preview used while zooming and panning quickly
+        full_box = (0, 0) + source.size
+        self.loader.cancel(('preview',))
+        self.loader.submit(('preview',),
+                           lambda: source.read_region(full_box, preview_size(source.size)),
+                           lambda key, image: self.on_preview_ready(source, image))
+        
+        # Decode the file into the disk cache in the background so the next open is instant. One
+        # build per (file, bands, stretch): a build for an older selection is stopped, and one
+        # already running for this selection is left to finish.
+        if self.cache_var.get() and isinstance(source, GDALRasterSource):
+            key = ('cache', source.path, source.band_indices, source.stretch)
+            self.cancel_cache_build(keep=key)
+            if not self.loader.is_pending(key):
+                cancel = threading.Event()
+                self.cache_build = (key, cancel)
+                self.loader.submit(key, lambda: self.raster_cache.build(source.path, source, cancel),
+                                   self.on_cache_ready,
+                                   lambda key, error: None)  # A failed cache build only costs speed
+        else:
+            self.cancel_cache_build()
+    
+    def cancel_cache_build(self, keep=None):
+        # Stop the background cache build unless it is for the keep key; it exits at the next block
+        if self.cache_build is not None and self.cache_build[0] != keep:
+            key, cancel = self.cache_build
+            cancel.set()
+            self.loader.cancel(key)
+            self.cache_build = None
+    
+    def on_preview_ready(self, source, image):
+        # Attach the preview image if its source is still the one on screen
+        if self.renderer is not None and self.loaded_source is source:
+            self.renderer.set_preview(image)
+    
+    def on_cache_ready(self, key, array):
+        # Page further tiles from the freshly built cache instead of decoding the file again,
+        # if the source on screen still shows the same file, bands and stretch
+        from raster_cache import CachedRasterSource  # For paging pixels from the disk cache
+        from raster_source import GDALRasterSource  # For telling uncached sources apart
+        if self.cache_build is not None and self.cache_build[0] == key:
+            self.cache_build = None
+        source = self.renderer.source if self.renderer is not None else None
+        if array is None or not isinstance(source, GDALRasterSource):
+            return
+        if key == ('cache', source.path, source.band_indices, source.stretch):
+            self.renderer.source = CachedRasterSource(array, source.band_indices, source.stretch)
+    
+    def on_source_error(self, key, error):
+        # Report a failure from the background source job
+        messagebox.showerror("Error", f"Failed to load image: {str(error)}")
+    
+    def on_stretch_change(self, event=None):
+        # Recompute the display ranges for the selected bands and stretch, then redraw
+        if self.dataset is None:
+            return
+        
+        try:
+            job = self.source_job()
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.loader.cancel(('source',))
+        self.loader.submit(('source',), job, self.on_source_ready, self.on_source_error)
+    
+    def display_image_on_canvas(self, preview=False):
+        # Draw the visible part of the image at the current zoom and pan
+        # (preview=True only uses cached tiles and the low-resolution preview image)
         canvas_width = self.canvas.winfo_width()
         canvas_height = self.canvas.winfo_height()
         
         # Calculate scaling factor to fit image in canvas
-        if canvas_width > 1 and canvas_height > 1:  # Make sure canvas is initialized
-            img_width, img_height = pil_image.size
+        if self.renderer is not None and canvas_width > 1 and canvas_height > 1:  # Make sure canvas is initialized
+            img_width, img_height = self.renderer.source.size
             scale_x = canvas_width / img_width
             scale_y = canvas_height / img_height
             scale = min(scale_x, scale_y) * 0.9  # Use 90% of available space
@@ -182,21 +470,12 @@ class GeoTIFFViewer:
             new_width = int(img_width * scale)
             new_height = int(img_height * scale)
             
-            # Resize image for display
-            self.display_image = pil_image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            
-            # Convert to PhotoImage for tkinter
-            self.photo_image = ImageTk.PhotoImage(self.display_image)
-            
-            # Clear canvas and display image
-            self.canvas.delete("all")
-            
             # Calculate image position (center image with pan offset)
             x = (canvas_width - new_width) // 2 + self.image_offset_x
             y = (canvas_height - new_height) // 2 + self.image_offset_y
             
-            # Display image on canvas
-            self.canvas_image = self.canvas.create_image(x, y, anchor=tk.NW, image=self.photo_image)
+            # Resample and draw only the tiles that intersect the canvas
+            self.renderer.render(scale, x, y, preview)
             
             # Store display parameters for coordinate conversion
             self.display_scale = scale
@@ -206,9 +485,76 @@ class GeoTIFFViewer:
             # Redraw any marked points
             self.redraw_marked_points()
     
+    def pan_view(self, dx, dy, preview=False):
+        # Shift the drawn tiles and markers instead of re-rendering the whole image
+        self.image_offset_x += dx
+        self.image_offset_y += dy
+        self.display_x += dx
+        self.display_y += dy
+        self.renderer.pan(dx, dy, preview)
+        self.canvas.move('marker', dx, dy)
+    
+    def draw_preview_frame(self, dx, dy, zoomed):
+        # Draw the zoom/pan changes gathered during one frame as a quick preview
+        if self.renderer is None or self.renderer.scale is None:
+            return
+        inst.count('redraws')
+        with inst.span('frame.preview', zoomed=zoomed):
+            if zoomed:
+                self.image_offset_x += dx
+                self.image_offset_y += dy
+                self.display_image_on_canvas(preview=True)
+            else:
+                self.pan_view(dx, dy, preview=True)
+    
+    def draw_final_frame(self):
+        # Input went idle, so draw the frame at full quality
+        if self.renderer is not None and self.renderer.scale is not None:
+            inst.count('redraws')
+            with inst.span('frame.final'):
+                self.display_image_on_canvas()
+    
+    def on_profile_toggle(self):
+        # Start or stop recording spans and counters
+        inst.enable(self.profile_var.get())
+        if inst.is_enabled():
+            self.update_overlay()
+        else:
+            if self.overlay_job is not None:
+                self.root.after_cancel(self.overlay_job)
+                self.overlay_job = None
+            self.canvas.delete('overlay')
+    
+    def update_overlay(self):
+        # Redraw the FPS/latency text in the corner of the canvas twice a second
+        self.canvas.delete('overlay')
+        text = (f"{inst.rate('redraws'):.0f} fps  "
+                f"frame p50 {inst.latency('frame.preview'):.1f} ms p95 {inst.latency('frame.preview', 95):.1f} ms  "
+                f"tile p95 {inst.latency('tile.make', 95):.1f} ms\n"
+                f"read {inst.rate('bytes_read') / 1e6:.1f} MB/s  "
+                f"resampled {inst.rate('pixels_resampled') / 1e6:.1f} MP/s  "
+                f"tiles {inst.rate('tiles_drawn'):.0f}/s  "
+                f"allocs/frame {self.renderer.presenter.last_frame_allocations if self.renderer else 0}")
+        label = self.canvas.create_text(8, 8, text=text, anchor=tk.NW, fill='yellow',
+                                        font=('Courier', 9), tags='overlay')
+        background = self.canvas.create_rectangle(self.canvas.bbox(label), fill='black', tags='overlay')
+        self.canvas.tag_raise(background)
+        self.canvas.tag_raise(label)
+        self.overlay_job = self.root.after(500, self.update_overlay)
+    
+    def save_trace(self):
+        # Write the recorded spans as a Chrome trace (open in chrome://tracing or ui.perfetto.dev)
+        file_path = filedialog.asksaveasfilename(
+            title="Save Trace", defaultextension=".json", filetypes=[("Chrome trace", "*.json")]
+        )
+        if not file_path:
+            return
+        inst.dump_chrome_trace(file_path)
+        messagebox.showinfo("Trace", f"Saved trace to {file_path}")
+    
     def on_mouse_move(self, event):
         # Handle mouse movement over the image
-        if self.dataset is None or self.display_image is None:
+        if self.dataset is None or self.renderer is None or self.renderer.scale is None:
             return
         
         # Convert canvas coordinates to image pixel coordinates
@@ -220,30 +566,36 @@ class GeoTIFFViewer:
         img_y = (canvas_y - self.display_y) / self.display_scale
         
         # Check if mouse is over the image
-        if 0 <= img_x < self.original_image.size[0] and 0 <= img_y < self.original_image.size[1]:
+        if 0 <= img_x < self.image_width and 0 <= img_y < self.image_height:
             # Update pixel coordinate display
             self.pixel_x_var.set(f"{int(img_x)}")
             self.pixel_y_var.set(f"{int(img_y)}")
             
             # Convert pixel coordinates to geographic coordinates
             if self.geotransform:
-                # Apply geotransformation to get geographic coordinates
-                geo_x = self.geotransform[0] + img_x * self.geotransform[1] + img_y * self.geotransform[2]
-                geo_y = self.geotransform[3] + img_x * self.geotransform[4] + img_y * self.geotransform[5]
+                # Apply geotransformation to get the dataset's own coordinates
+                geo_x, geo_y = self.transform.pixel_to_geo(img_x, img_y)
+                self.map_x_var.set(f"{float(geo_x):.6f}")
+                self.map_y_var.set(f"{float(geo_y):.6f}")
+                
+                # Reproject to WGS84 to get longitude/latitude
+                lon, lat = self.transform.transform_points(self.transform.to_wgs84, geo_x, geo_y)
                 
                 # Update geographic coordinate display
-                self.lon_var.set(f"{geo_x:.6f}")
-                self.lat_var.set(f"{geo_y:.6f}")
+                self.lon_var.set(f"{float(lon):.6f}")
+                self.lat_var.set(f"{float(lat):.6f}")
         else:
             # Clear coordinate display when mouse is outside image
             self.pixel_x_var.set("")
             self.pixel_y_var.set("")
             self.lon_var.set("")
             self.lat_var.set("")
+            self.map_x_var.set("")
+            self.map_y_var.set("")
     
     def mark_location(self):
         # Mark a specific location on the image using latitude and longitude
-        if self.dataset is None:
+        if self.dataset is None or self.renderer is None or self.renderer.scale is None:
             messagebox.showerror("Error", "Please load an image first")
             return
         
@@ -254,31 +606,21 @@ class GeoTIFFViewer:
             
             # Convert geographic coordinates to pixel coordinates
             if self.geotransform:
-                # Calculate the inverse transformation
-                det = self.geotransform[1] * self.geotransform[5] - self.geotransform[2] * self.geotransform[4]
-                
-                if det == 0:
+                if not self.transform.invertible:
                     messagebox.showerror("Error", "Cannot convert coordinates")
                     return
                 
-                # Apply inverse geotransformation
-                temp_x = lon - self.geotransform[0]
-                temp_y = lat - self.geotransform[3]
-                
-                pixel_x = (self.geotransform[5] * temp_x - self.geotransform[2] * temp_y) / det
-                pixel_y = (-self.geotransform[4] * temp_x + self.geotransform[1] * temp_y) / det
+                # Apply inverse geotransformation (after reprojecting from WGS84)
+                pixel_x, pixel_y = self.transform.wgs84_to_pixel(lon, lat)
+                pixel_x, pixel_y = float(pixel_x), float(pixel_y)
                 
                 # Check if coordinates are within image bounds
-                if 0 <= pixel_x < self.original_image.size[0] and 0 <= pixel_y < self.original_image.size[1]:
-                    # Convert to display coordinates
-                    display_x = self.display_x + pixel_x * self.display_scale
-                    display_y = self.display_y + pixel_y * self.display_scale
-                    
-                    # Store marked point
-                    self.marked_points.append((display_x, display_y, lon, lat))
+                if 0 <= pixel_x < self.image_width and 0 <= pixel_y < self.image_height:
+                    # Store marked point (pixel coordinates do not change with zoom or pan)
+                    self.markers.add_points(pixel_x, pixel_y, lon, lat)
                     
                     # Draw cross at the location
-                    self.draw_cross(display_x, display_y)
+                    self.redraw_marked_points()
                     
                     messagebox.showinfo("Success", f"Location marked at: {lon:.6f}, {lat:.6f}")
                 else:
@@ -288,37 +630,39 @@ class GeoTIFFViewer:
             # Handle invalid input
             messagebox.showerror("Error", "Please enter valid numeric coordinates")
     
-    def draw_cross(self, x, y):
-        # Draw a cross marker at specified coordinates
-        size = 10  # Size of the cross
+    def import_points(self):
+        # Import many marker points at once from a CSV (lon/lat columns) or GeoJSON file
+        if self.dataset is None or self.renderer is None or self.renderer.scale is None:
+            messagebox.showerror("Error", "Please load an image first")
+            return
+        
+        file_path = filedialog.askopenfilename(
+            title="Select Points File",
+            filetypes=[("Point files", "*.csv *.geojson *.json"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
         
-        # Draw cross lines on canvas
-        self.canvas.create_line(x - size, y, x + size, y, fill='red', width=3, tags='marker')
-        self.canvas.create_line(x, y - size, x, y + size, fill='red', width=3, tags='marker')
+        try:
+            from point_io import load_points  # For importing CSV/GeoJSON points
+            lons, lats = load_points(file_path)
+            if not self.transform.invertible:
+                messagebox.showerror("Error", "Cannot convert coordinates")
+                return
+            
+            # Convert every point to pixel coordinates in one vectorized call
+            pixel_x, pixel_y = self.transform.wgs84_to_pixel(lons, lats)
+            kept = self.markers.add_points(pixel_x, pixel_y, lons, lats)
+        except (OSError, ValueError, KeyError) as e:
+            messagebox.showerror("Error", f"Failed to import points: {str(e)}")
+            return
         
-        # Draw circle around cross for better visibility
-        self.canvas.create_oval(x - size - 2, y - size - 2, x + size + 2, y + size + 2, 
-                               outline='red', width=2, tags='marker')
+        self.redraw_marked_points()
+        messagebox.showinfo("Success", f"Imported {kept} of {len(lons)} points inside the image")
     
     def redraw_marked_points(self):
-        # Redraw all marked points after zoom or pan
-        self.canvas.delete('marker')  # Remove existing markers
-        
-        for display_x, display_y, lon, lat in self.marked_points:
-            # Recalculate display position based on current zoom and pan
-            # Convert back to pixel coordinates and then to current display coordinates
-            if self.geotransform:
-                det = self.geotransform[1] * self.geotransform[5] - self.geotransform[2] * self.geotransform[4]
-                temp_x = lon - self.geotransform[0]
-                temp_y = lat - self.geotransform[3]
-                pixel_x = (self.geotransform[5] * temp_x - self.geotransform[2] * temp_y) / det
-                pixel_y = (-self.geotransform[4] * temp_x + self.geotransform[1] * temp_y) / det
-                
-                # Convert to current display coordinates
-                new_display_x = self.display_x + pixel_x * self.display_scale
-                new_display_y = self.display_y + pixel_y * self.display_scale
-                
-                self.draw_cross(new_display_x, new_display_y)
+        # Redraw the marked points inside the viewport after zoom or pan
+        self.markers.draw(self.display_scale, self.display_x, self.display_y)
     
     def on_mouse_wheel(self, event):
         # Handle zoom functionality with mouse wheel
@@ -336,8 +680,8 @@ class GeoTIFFViewer:
         if 0.1 <= new_zoom <= 10.0:  # Limit zoom range
             self.zoom_factor = new_zoom
             
-            # Refresh display with new zoom level
-            self.display_image_on_canvas(self.original_image)
+            # Redraw with the new zoom level on the next frame
+            self.scheduler.request_zoom()
     
     def on_mouse_press(self, event):
         # Handle mouse press for panning
@@ -350,31 +694,52 @@ class GeoTIFFViewer:
     
     def on_mouse_drag(self, event):
         # Handle mouse drag for panning
-        if self.dataset is None:
+        if self.dataset is None or self.renderer is None or self.renderer.scale is None:
             return
         
         # Calculate pan offset
         dx = event.x - self.pan_start_x
         dy = event.y - self.pan_start_y
         
-        # Update image offset
-        self.image_offset_x += dx
-        self.image_offset_y += dy
-        
         # Update pan start position
         self.pan_start_x = event.x
         self.pan_start_y = event.y
         
-        # Refresh display with new pan offset
-        self.display_image_on_canvas(self.original_image)
+        # Move the drawn tiles by the pan offset on the next frame
+        self.scheduler.request_pan(dx, dy)
+    
+    def on_close(self):
+        # Stop queued redraws and background workers before closing the window
+        self.scheduler.cancel()
+        if self.overlay_job is not None:
+            self.root.after_cancel(self.overlay_job)
+        self.cancel_cache_build()
+        self.loader.shutdown()
+        if self.raster_cache is not None:
+            self.raster_cache.cleanup()
+        if inst.is_enabled():
+            inst.print_summary()
+        self.root.destroy()
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="GeoTIFF viewer")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Print the time to first window and the background warm-up times")
+    return parser.parse_args(argv)
 
 # Main program execution
 if __name__ == "__main__":
+    args = parse_args()
+    startup = StartupProfile(args.profile_startup)
+    startup.mark('imports done')
+    
     # Create main window
     root = tk.Tk()
+    startup.mark('tk root created')
     
     # Create application instance
-    app = GeoTIFFViewer(root)
+    app = GeoTIFFViewer(root, startup)
     
     # Start GUI event loop
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,209 @@
+# Reproducible benchmarks for the filtering and edge-detection code in question2/3/4
+#
+# Examples:
+#   python benchmark_filters.py --sizes 256 1024 4096 --json report.json --csv report.csv
+#   python benchmark_filters.py --save-baseline baseline.json
+#   python benchmark_filters.py --baseline baseline.json --tolerance 0.15
+#   python benchmark_filters.py --sizes 1024 --trace trace.json
+import argparse  # For the command-line interface
+import csv  # For the CSV report
+import json  # For the JSON report and baselines
+import platform  # For recording the machine in the report
+import time  # For timing
+import cv2  # OpenCV filters under test
+import numpy as np  # For synthetic images
+from correlation_engine import correlation2d  # Vectorized correlation engine
+from gradients import gradient_magnitude  # Fused float32 gradient magnitude
+import instrumentation as inst  # For the optional trace timeline
+
+DEFAULT_SIZES = (256, 512, 1024, 2048, 4096, 8192)
+DEFAULT_DTYPES = ('uint8', 'float32')
+LOOP_MAX_PIXELS = 256 * 256  # The pure-Python reference loop is only timed on small images
+SEED = 1234
+
+# Kernels from question2.py and question4.py
+CORRELATION_KERNEL = np.array([[1, 0], [0, -1]])
+PREWITT_X = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]], dtype=np.float32)
+PREWITT_Y = np.array([[-1, -1, -1], [0, 0, 0], [1, 1, 1]], dtype=np.float32)
+
+
+def correlation2d_loop(img, ker):
+    # Reference nested-loop correlation, as written in question2.py
+    h, w = ker.shape
+    out = np.zeros((img.shape[0]-h+1, img.shape[1]-w+1))
+    for i in range(out.shape[0]):
+        for j in range(out.shape[1]):
+            out[i, j] = np.sum(img[i:i+h, j:j+w] * ker)
+    return out
+
+
+def sobel_magnitude(img):
+    # Sobel edge map exactly as computed in question4.py
+    sobel_x = cv2.Sobel(img, cv2.CV_64F, 1, 0, ksize=3)
+    sobel_y = cv2.Sobel(img, cv2.CV_64F, 0, 1, ksize=3)
+    return np.sqrt(sobel_x**2 + sobel_y**2)
+
+
+def prewitt_magnitude(img):
+    # Prewitt edge map exactly as computed in question4.py
+    prewitt_x = cv2.filter2D(img, -1, PREWITT_X)
+    prewitt_y = cv2.filter2D(img, -1, PREWITT_Y)
+    return np.sqrt(prewitt_x.astype(np.float32)**2 + prewitt_y.astype(np.float32)**2)
+
+
+# name -> (function, supported dtypes, largest image it is timed on)
+OPERATIONS = {
+    'correlation2d_loop': (lambda img: correlation2d_loop(img, CORRELATION_KERNEL),
+                           ('uint8', 'float32'), LOOP_MAX_PIXELS),
+    'correlation2d_engine': (lambda img: correlation2d(img, CORRELATION_KERNEL), ('uint8', 'float32'), None),
+    'prewitt_filter2d': (prewitt_magnitude, ('uint8', 'float32'), None),
+    'sobel': (sobel_magnitude, ('uint8', 'float32'), None),
+    'sobel_fused': (lambda img: gradient_magnitude(img, 'sobel'), ('uint8', 'float32'), None),
+    'prewitt_fused': (lambda img: gradient_magnitude(img, 'prewitt'), ('uint8', 'float32'), None),
+    'gaussian_blur': (lambda img: cv2.GaussianBlur(img, (5, 5), 1), ('uint8', 'float32'), None),
+    'median_blur': (lambda img: cv2.medianBlur(img, 5), ('uint8', 'float32'), None),
+    'bilateral_filter': (lambda img: cv2.bilateralFilter(img, 9, 75, 75), ('uint8', 'float32'), None),
+}
+
+
+def synthetic_image(size, dtype, seed=SEED):
+    # Smooth gradient with blobs and noise, so filters see edges and texture like a photo
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    img = 96 * x + 64 * y + 48 * np.sin(12 * np.pi * x) * np.cos(8 * np.pi * y)
+    img += rng.normal(0, 12, (size, size)).astype(np.float32)
+    img = np.clip(img + 40, 0, 255)
+    return img.astype(np.uint8) if dtype == 'uint8' else img.astype(np.float32)
+
+
+def time_operation(func, img, repeats, min_time):
+    # Run once to warm up, then collect at least `repeats` timings and `min_time` seconds
+    func(img)
+    timings = []
+    start = time.perf_counter()
+    while len(timings) < repeats or time.perf_counter() - start < min_time:
+        t0 = time.perf_counter()
+        func(img)
+        timings.append(time.perf_counter() - t0)
+        if len(timings) >= 10 * repeats:
+            break
+    return np.array(timings)
+
+
+def run_benchmarks(operations, sizes, dtypes, repeats, min_time):
+    # Time every (operation, size, dtype) combination and return one record per run
+    records = []
+    for size in sizes:
+        for dtype in dtypes:
+            img = synthetic_image(size, dtype)
+            for name in operations:
+                func, supported, max_pixels = OPERATIONS[name]
+                if dtype not in supported or (max_pixels is not None and size * size > max_pixels):
+                    continue
+                with inst.span(name, size=size, dtype=dtype):
+                    timings = time_operation(func, img, repeats, min_time)
+                median = float(np.median(timings))
+                record = {
+                    'operation': name,
+                    'size': size,
+                    'dtype': dtype,
+                    'runs': len(timings),
+                    'median_ms': median * 1000,
+                    'p95_ms': float(np.percentile(timings, 95)) * 1000,
+                    'mp_per_s': size * size / median / 1e6,
+                }
+                records.append(record)
+                print(f"{name:22s} {size:5d}^2 {dtype:8s} median {record['median_ms']:10.3f} ms  "
+                      f"p95 {record['p95_ms']:10.3f} ms  {record['mp_per_s']:9.1f} MP/s")
+    return records
+
+
+def record_key(record):
+    # Identity of a benchmark case across runs
+    return f"{record['operation']}|{record['size']}|{record['dtype']}"
+
+
+def compare_to_baseline(records, baseline_path, tolerance):
+    # Report cases whose median got slower than the baseline by more than `tolerance`
+    with open(baseline_path) as f:
+        baseline = {record_key(record): record for record in json.load(f)['results']}
+    regressions = []
+    for record in records:
+        old = baseline.get(record_key(record))
+        if old is None:
+            continue
+        ratio = record['median_ms'] / old['median_ms']
+        record['baseline_ratio'] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(record)
+            print(f"REGRESSION {record_key(record)}: {old['median_ms']:.3f} ms -> "
+                  f"{record['median_ms']:.3f} ms ({ratio:.2f}x)")
+    return regressions
+
+
+def write_reports(records, json_path, csv_path):
+    # Save the results as JSON (with machine details) and/or CSV
+    if json_path:
+        report = {
+            'machine': platform.platform(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'opencv_threads': cv2.getNumThreads(),
+            'results': records,
+        }
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if csv_path:
+        fields = ['operation', 'size', 'dtype', 'runs', 'median_ms', 'p95_ms', 'mp_per_s', 'baseline_ratio']
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Benchmark the filtering and edge-detection kernels")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="Square image sizes to test")
+    parser.add_argument('--dtypes', nargs='+', default=list(DEFAULT_DTYPES), choices=DEFAULT_DTYPES)
+    parser.add_argument('--ops', nargs='+', default=list(OPERATIONS), choices=list(OPERATIONS))
+    parser.add_argument('--repeats', type=int, default=5, help="Minimum timed runs per case")
+    parser.add_argument('--min-time', type=float, default=0.2, help="Minimum seconds spent per case")
+    parser.add_argument('--threads', type=int, help="OpenCV thread count (default: OpenCV's choice)")
+    parser.add_argument('--json', help="Write a JSON report here")
+    parser.add_argument('--csv', help="Write a CSV report here")
+    parser.add_argument('--baseline', help="Compare against this saved JSON report")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed slowdown against the baseline (0.10 = 10%%)")
+    parser.add_argument('--save-baseline', help="Save this run as a baseline JSON file")
+    parser.add_argument('--trace', help="Write a Chrome trace of the run here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Run the benchmarks, write reports and return 1 if any case regressed
+    args = parse_args(argv)
+    if args.threads is not None:
+        cv2.setNumThreads(args.threads)
+    if args.trace:
+        inst.enable()
+    records = run_benchmarks(args.ops, args.sizes, args.dtypes, args.repeats, args.min_time)
+
+    regressions = []
+    if args.baseline:
+        regressions = compare_to_baseline(records, args.baseline, args.tolerance)
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+
+    write_reports(records, args.json, args.csv)
+    if args.save_baseline:
+        write_reports(records, args.save_baseline, None)
+    if args.trace:
+        inst.dump_chrome_trace(args.trace)
+    return 1 if regressions else 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
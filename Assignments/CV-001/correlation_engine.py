@@ -0,0 +1,147 @@
+# Vectorized drop-in replacements for correlation2d/convolution2d from question2.py
+#
+# Three paths are chosen automatically from the kernel:
+#   - separable: rank-1 kernels (Sobel, Prewitt, Gaussian, box) run as two 1-D passes
+#   - fft:       large kernels are multiplied in the frequency domain
+#   - direct:    small kernels use sliding_window_view + einsum
+# Integer inputs give exactly the same values as the reference loop on every path.
+# Float inputs are not bit-identical on any path, the direct one included, because einsum,
+# the 1-D passes and the FFT add the products in a different order than np.sum does. The
+# difference stays within about 1e-15 * max|img| * sum|ker| (np.allclose holds); compare float
+# results with a tolerance, not np.array_equal.
+import numpy as np  # For array operations
+from numpy.lib.stride_tricks import sliding_window_view  # For windowed views without copies
+
+MODES = ('valid', 'same', 'full')
+METHODS = ('auto', 'direct', 'separable', 'fft')
+FFT_MIN_KERNEL_AREA = 121  # Kernels with at least this many taps (11x11) use the FFT path
+RANK_TOLERANCE = 1e-10  # Relative size of the second singular value for a rank-1 kernel
+
+
+def pad_for_mode(img, kh, kw, mode):
+    # Zero-pad the last two axes so a 'valid' correlation gives the requested output size
+    if mode == 'valid':
+        return img
+    if mode == 'full':
+        top, bottom, left, right = kh - 1, kh - 1, kw - 1, kw - 1
+    else:  # 'same': centred slice of the full output, like scipy.signal
+        top, bottom = kh - 1 - (kh - 1) // 2, (kh - 1) // 2
+        left, right = kw - 1 - (kw - 1) // 2, (kw - 1) // 2
+    pad = [(0, 0)] * (img.ndim - 2) + [(top, bottom), (left, right)]
+    return np.pad(img, pad)
+
+
+def is_integer_input(img, ker):
+    # Integer data can be computed exactly in int64
+    return np.issubdtype(img.dtype, np.integer) and np.issubdtype(ker.dtype, np.integer)
+
+
+def separable_factors(ker):
+    # Column and row vectors with ker == outer(col, row), or None if the kernel is not rank-1
+    if min(ker.shape) < 2:
+        return None
+
+    # Integer kernels: exact integer factorization from the largest column, reduced by its gcd
+    if np.issubdtype(ker.dtype, np.integer):
+        j = int(np.argmax(np.abs(ker).sum(axis=0)))
+        col = ker[:, j]
+        divisor = np.gcd.reduce(col)
+        if divisor == 0:
+            return None
+        col = col // divisor
+        i = int(np.argmax(np.abs(col)))
+        if np.any(ker[i, :] % col[i]):
+            return None
+        row = ker[i, :] // col[i]
+        return (col, row) if np.array_equal(np.outer(col, row), ker) else None
+
+    # Float kernels: rank-1 check with the SVD
+    u, s, vt = np.linalg.svd(ker.astype(np.float64))
+    if s[0] == 0 or s[1] > RANK_TOLERANCE * s[0]:
+        return None
+    root = np.sqrt(s[0])
+    return u[:, 0] * root, vt[0] * root
+
+
+def correlate_direct(padded, ker, out_dtype):
+    # Every output pixel as a dot product of its window with the kernel
+    kh, kw = ker.shape
+    windows = sliding_window_view(padded, (kh, kw), axis=(-2, -1))
+    return np.einsum('...ijkl,kl->...ij', windows, ker.astype(out_dtype), dtype=out_dtype)
+
+
+def correlate_separable(padded, col, row, out_dtype):
+    # Row pass then column pass, each accumulated from shifted views
+    kh, kw = len(col), len(row)
+    out_h = padded.shape[-2] - kh + 1
+    out_w = padded.shape[-1] - kw + 1
+    tmp = np.zeros(padded.shape[:-1] + (out_w,), dtype=out_dtype)
+    for l in range(kw):
+        if row[l]:
+            tmp += row[l] * padded[..., :, l:l + out_w].astype(out_dtype, copy=False)
+    out = np.zeros(padded.shape[:-2] + (out_h, out_w), dtype=out_dtype)
+    for k in range(kh):
+        if col[k]:
+            out += col[k] * tmp[..., k:k + out_h, :]
+    return out
+
+
+def correlate_fft(padded, ker, exact):
+    # Correlation as a circular convolution with the flipped kernel; the valid part is
+    # unaffected by wrap-around when the transform has the size of the padded input
+    kh, kw = ker.shape
+    height, width = padded.shape[-2:]
+    shape = (height, width)
+    spectrum = np.fft.rfft2(padded, s=shape) * np.fft.rfft2(ker[::-1, ::-1], s=shape)
+    out = np.fft.irfft2(spectrum, s=shape)[..., kh - 1:, kw - 1:]
+    if exact:
+        out = np.rint(out).astype(np.int64)  # Integer inputs: rounding recovers the exact sums
+    return out
+
+
+def choose_method(ker):
+    # Pick the fastest path for a kernel
+    if separable_factors(ker) is not None:
+        return 'separable'
+    if ker.size >= FFT_MIN_KERNEL_AREA:
+        return 'fft'
+    return 'direct'
+
+
+def correlation2d(img, ker, mode='valid', method='auto'):
+    # Correlation (no kernel flip) of an HxW image or an NxHxW batch; returns float64 like the loop
+    img = np.asarray(img)
+    ker = np.asarray(ker)
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}")
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+    if img.ndim not in (2, 3) or ker.ndim != 2:
+        raise ValueError("Expected an HxW or NxHxW image and a 2-D kernel")
+
+    kh, kw = ker.shape
+    padded = pad_for_mode(img, kh, kw, mode)
+    if padded.shape[-2] < kh or padded.shape[-1] < kw:
+        return np.zeros(img.shape[:-2] + (0, 0))
+
+    exact = is_integer_input(img, ker)
+    out_dtype = np.int64 if exact else np.float64
+    if method == 'auto':
+        method = choose_method(ker)
+
+    if method == 'separable':
+        factors = separable_factors(ker)
+        if factors is None:
+            raise ValueError("Kernel is not separable")
+        out = correlate_separable(padded, factors[0], factors[1], out_dtype)
+    elif method == 'fft':
+        out = correlate_fft(padded, ker, exact)
+    else:
+        out = correlate_direct(padded, ker, out_dtype)
+    return out.astype(np.float64, copy=False)
+
+
+def convolution2d(img, ker, mode='valid', method='auto'):
+    # Convolution: flip the kernel (rotate 180 degrees) and correlate
+    ker = np.asarray(ker)
+    return correlation2d(img, ker[::-1, ::-1], mode=mode, method=method)
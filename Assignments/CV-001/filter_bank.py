@@ -0,0 +1,248 @@
+# Parameter sweeps over the denoising filters from question3.py, scored with PSNR and SSIM
+#
+# Example:
+#   python filter_bank.py Elements/*.jpeg --noise gaussian --target-psnr 30 --target-ssim 0.85 --workers 8
+# Every (image, filter, parameters) result is cached on disk, so repeated sweeps only run new settings.
+import argparse  # For the command-line interface
+import csv  # For the CSV report
+import hashlib  # For image hashes in cache keys
+import itertools  # For parameter grids
+import json  # For the result cache
+import os  # For file operations
+import time  # For timing the filters
+from concurrent.futures import ProcessPoolExecutor, as_completed  # For parallel sweeps
+import cv2  # OpenCV filters under test
+import numpy as np  # For array operations
+from noise_augment import add_noise, batch_rng  # For the noisy inputs
+
+# Parameter grids; the settings hardcoded in question3.py are included in each
+FILTER_GRIDS = {
+    'gaussian': {'ksize': (3, 5, 7, 9), 'sigma': (0.5, 1.0, 1.5, 2.0)},
+    'median': {'ksize': (3, 5, 7)},
+    'bilateral': {'d': (5, 9), 'sigma_color': (25, 50, 75, 100), 'sigma_space': (25, 75)},
+}
+
+SSIM_WINDOW = (11, 11)  # Gaussian window of Wang et al. (2004)
+SSIM_SIGMA = 1.5
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+TIMING_REPEATS = 3  # The fastest of this many runs is reported
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'filter_bank.json')
+
+
+def apply_filter(name, img, params):
+    # Run one filter with one parameter setting
+    if name == 'gaussian':
+        return cv2.GaussianBlur(img, (params['ksize'], params['ksize']), params['sigma'])
+    if name == 'median':
+        return cv2.medianBlur(img, params['ksize'])
+    if name == 'bilateral':
+        return cv2.bilateralFilter(img, params['d'], params['sigma_color'], params['sigma_space'])
+    raise ValueError(f"filter must be one of {tuple(FILTER_GRIDS)}")
+
+
+def parameter_grid(name):
+    # Every parameter combination of one filter as a list of dictionaries
+    grid = FILTER_GRIDS[name]
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+def psnr(clean, filtered):
+    # Peak signal-to-noise ratio in dB for 0-255 images
+    diff = np.subtract(clean, filtered, dtype=np.float32)
+    mse = float(np.mean(diff * diff))
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def ssim(clean, filtered):
+    # Mean structural similarity, with all local statistics computed as whole-image Gaussian blurs
+    x = clean.astype(np.float32)
+    y = filtered.astype(np.float32)
+
+    def blur(a):
+        return cv2.GaussianBlur(a, SSIM_WINDOW, SSIM_SIGMA)
+
+    mu_x, mu_y = blur(x), blur(y)
+    mu_xx, mu_yy, mu_xy = mu_x * mu_x, mu_y * mu_y, mu_x * mu_y
+    var_x = blur(x * x) - mu_xx
+    var_y = blur(y * y) - mu_yy
+    cov_xy = blur(x * y) - mu_xy
+    num = (2 * mu_xy + SSIM_C1) * (2 * cov_xy + SSIM_C2)
+    den = (mu_xx + mu_yy + SSIM_C1) * (var_x + var_y + SSIM_C2)
+    return float(np.mean(num / den))
+
+
+def image_hash(img):
+    # Content hash of an image, including its shape and dtype
+    digest = hashlib.sha1(f"{img.shape}|{img.dtype}|".encode('utf-8'))
+    digest.update(np.ascontiguousarray(img).data)
+    return digest.hexdigest()
+
+
+def cache_key(clean_hash, noisy_hash, name, params):
+    # Cache key of one (image pair, filter, parameters) result
+    return f"{clean_hash}|{noisy_hash}|{name}|{json.dumps(params, sort_keys=True)}"
+
+
+class ResultCache:
+    # Sweep results stored in one JSON file, keyed by image hashes and filter parameters
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.results = json.load(f)
+
+    def get(self, key):
+        # Cached result or None
+        return self.results.get(key)
+
+    def put(self, key, result):
+        # Remember one result (written to disk by save)
+        self.results[key] = result
+
+    def save(self):
+        # Write the cache atomically so an interrupted run never leaves a broken file
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.results, f)
+        os.replace(temp_path, self.path)
+
+
+def evaluate_settings(clean, noisy, name, settings):
+    # Worker task: time and score one filter on one image for several parameter settings
+    cv2.setNumThreads(1)  # Parallelism comes from the process pool, not from OpenCV
+    results = []
+    for params in settings:
+        timings = []
+        for _ in range(TIMING_REPEATS):
+            start = time.perf_counter()
+            filtered = apply_filter(name, noisy, params)
+            timings.append(time.perf_counter() - start)
+        results.append({'psnr': psnr(clean, filtered), 'ssim': ssim(clean, filtered),
+                        'ms': min(timings) * 1000})
+    return results
+
+
+def run_sweep(pairs, filters, cache, workers):
+    # Evaluate every filter setting on every (clean, noisy) pair; returns one record per result
+    hashes = [(image_hash(clean), image_hash(noisy)) for clean, noisy in pairs]
+    records = []
+    jobs = []
+    for index, (clean, noisy) in enumerate(pairs):
+        for name in filters:
+            missing = []
+            for params in parameter_grid(name):
+                key = cache_key(*hashes[index], name, params)
+                cached = cache.get(key)
+                if cached is None:
+                    missing.append(params)
+                else:
+                    records.append(dict(cached, image=index, filter=name, params=params))
+            if missing:
+                jobs.append((index, name, missing))
+
+    # One task per (image, filter) so each image is sent to a worker once per filter
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(evaluate_settings, pairs[index][0], pairs[index][1], name, missing):
+                   (index, name, missing) for index, name, missing in jobs}
+        for future in as_completed(futures):
+            index, name, missing = futures[future]
+            for params, result in zip(missing, future.result()):
+                cache.put(cache_key(*hashes[index], name, params), result)
+                records.append(dict(result, image=index, filter=name, params=params))
+    cache.save()
+    return records
+
+
+def summarize(records):
+    # Average PSNR, SSIM and time of every (filter, parameters) setting over all images
+    groups = {}
+    for record in records:
+        key = (record['filter'], json.dumps(record['params'], sort_keys=True))
+        groups.setdefault(key, []).append(record)
+    summary = []
+    for (name, params), group in groups.items():
+        summary.append({
+            'filter': name,
+            'params': json.loads(params),
+            'psnr': float(np.mean([r['psnr'] for r in group])),
+            'ssim': float(np.mean([r['ssim'] for r in group])),
+            'ms': float(np.mean([r['ms'] for r in group])),
+        })
+    return sorted(summary, key=lambda row: row['ms'])
+
+
+def fastest_meeting_target(summary, target_psnr=None, target_ssim=None):
+    # Fastest setting whose average quality meets both targets, or None
+    for row in summary:  # Already sorted by time
+        if target_psnr is not None and row['psnr'] < target_psnr:
+            continue
+        if target_ssim is not None and row['ssim'] < target_ssim:
+            continue
+        return row
+    return None
+
+
+def load_images(paths):
+    # Grayscale images from disk
+    images = []
+    for path in paths:
+        image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            raise FileNotFoundError(f"Image not found: {path}")
+        images.append(image)
+    return images
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Sweep denoising filter parameters and score them")
+    parser.add_argument('images', nargs='+', help="Clean input images")
+    parser.add_argument('--noise', choices=('gaussian', 'salt_pepper', 'poisson', 'speckle'),
+                        default='gaussian', help="Noise added to the clean images")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the noise")
+    parser.add_argument('--filters', nargs='+', default=list(FILTER_GRIDS), choices=list(FILTER_GRIDS))
+    parser.add_argument('--target-psnr', type=float, help="Minimum average PSNR in dB")
+    parser.add_argument('--target-ssim', type=float, help="Minimum average SSIM")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help="Result cache file ('' to disable)")
+    parser.add_argument('--csv', help="Write the averaged results here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Run the sweep, print the results sorted by speed and the fastest setting meeting the targets
+    args = parse_args(argv)
+    images = load_images(args.images)
+    pairs = [(image, add_noise(image, batch_rng(args.seed, index), args.noise))
+             for index, image in enumerate(images)]
+
+    summary = summarize(run_sweep(pairs, args.filters, ResultCache(args.cache), args.workers))
+    for row in summary:
+        print(f"{row['filter']:10s} {json.dumps(row['params']):55s} PSNR {row['psnr']:6.2f} dB  "
+              f"SSIM {row['ssim']:.4f}  {row['ms']:8.3f} ms")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['filter', 'params', 'psnr', 'ssim', 'ms'])
+            writer.writeheader()
+            writer.writerows(dict(row, params=json.dumps(row['params'])) for row in summary)
+
+    if args.target_psnr is None and args.target_ssim is None:
+        return 0
+    best = fastest_meeting_target(summary, args.target_psnr, args.target_ssim)
+    if best is None:
+        print("No setting meets the quality target")
+        return 1
+    print(f"Fastest setting meeting the target: {best['filter']} {json.dumps(best['params'])} "
+          f"({best['ms']:.3f} ms, PSNR {best['psnr']:.2f} dB, SSIM {best['ssim']:.4f})")
+    return 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+# Reusable PhotoImages and resampling buffers for drawing frames without per-frame allocations
+import math  # For whole-pixel windows
+import threading  # Tile buffers are taken on worker threads
+import cv2  # For resampling straight into preallocated buffers
+import numpy as np  # For array operations
+from PIL import Image, ImageTk  # For handing pixels to Tk
+import instrumentation as inst  # For allocation counters
+
+MAX_IDLE_PHOTOS = 64  # PhotoImages kept for reuse once their tiles leave the view
+MAX_IDLE_TILE_BUFFERS = 64  # Tile buffers kept for reuse once their tiles leave the tile cache
+INTERPOLATION = {
+    Image.Resampling.NEAREST: cv2.INTER_NEAREST,
+    Image.Resampling.BILINEAR: cv2.INTER_LINEAR,
+    Image.Resampling.BICUBIC: cv2.INTER_CUBIC,
+    Image.Resampling.LANCZOS: cv2.INTER_LANCZOS4,
+}
+
+
+class FramePresenter:
+    # Hands out PhotoImages that are updated in place with paste() and output buffers that are
+    # resampled into with OpenCV, counting every new allocation per frame. Preview tiles share
+    # one buffer per shape; full-quality tiles, which stay in the tile cache, get pooled buffers
+    # that come back when the cache evicts them.
+    def __init__(self, max_idle_photos=MAX_IDLE_PHOTOS, max_idle_tile_buffers=MAX_IDLE_TILE_BUFFERS):
+        self.max_idle_photos = max_idle_photos
+        self.max_idle_tile_buffers = max_idle_tile_buffers
+        self.idle_photos = {}  # (mode, width, height) -> list of PhotoImages not on the canvas
+        self.buffers = {}  # (height, width, channels) -> reusable uint8 array
+        self.idle_tile_buffers = {}  # Array shape -> list of tile buffers no tile is using
+        self.lock = threading.Lock()  # Guards the tile buffer pool and the counters
+        self.frame_start_allocations = 0  # total_allocations at the end of the previous frame
+        self.last_frame_allocations = 0
+        self.total_allocations = 0
+        self.reused = 0
+
+    def note_allocation(self, kind):
+        # Count one new PhotoImage or buffer (tile buffers are counted from worker threads)
+        with self.lock:
+            self.total_allocations += 1
+        inst.count(f"alloc.{kind}")
+
+    def end_frame(self):
+        # Finish a frame and remember how many allocations were made since the previous one,
+        # including tile buffers that worker threads allocated in between
+        with self.lock:
+            self.last_frame_allocations = self.total_allocations - self.frame_start_allocations
+            self.frame_start_allocations = self.total_allocations
+        inst.count('alloc.frames')
+        return self.last_frame_allocations
+
+    def photo_for(self, image):
+        # PhotoImage showing a PIL image, reusing an idle one of the same mode and size
+        key = (image.mode, image.size[0], image.size[1])
+        idle = self.idle_photos.get(key)
+        if idle:
+            photo = idle.pop()
+            photo.paste(image)
+            self.reused += 1
+        else:
+            photo = ImageTk.PhotoImage(image)
+            self.note_allocation('photoimage')
+        photo.presenter_key = key
+        return photo
+
+    def release(self, photo):
+        # Return a PhotoImage whose canvas item was deleted, keeping at most max_idle_photos
+        key = getattr(photo, 'presenter_key', None)
+        if key is None:
+            return
+        idle = self.idle_photos.setdefault(key, [])
+        if sum(len(photos) for photos in self.idle_photos.values()) < self.max_idle_photos:
+            idle.append(photo)
+
+    def buffer(self, height, width, channels):
+        # Reusable uint8 output buffer; valid until the next call with the same shape
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        buf = self.buffers.get(shape)
+        if buf is None:
+            buf = np.empty(shape, dtype=np.uint8)
+            self.buffers[shape] = buf
+            self.note_allocation('buffer')
+        return buf
+
+    def tile_buffer(self, height, width, channels):
+        # Pooled uint8 buffer for a full-quality tile; it belongs to the tile until release_tile
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        with self.lock:
+            idle = self.idle_tile_buffers.get(shape)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+        buf = np.empty(shape, dtype=np.uint8)
+        self.note_allocation('tile_buffer')
+        return buf
+
+    def release_buffer(self, buf):
+        # Return a tile buffer to the pool, keeping at most max_idle_tile_buffers
+        with self.lock:
+            if sum(len(idle) for idle in self.idle_tile_buffers.values()) < self.max_idle_tile_buffers:
+                self.idle_tile_buffers.setdefault(buf.shape, []).append(buf)
+
+    def release_tile(self, tile):
+        # Give back the buffer behind a tile made by resample_tile/wrap_tile (e.g. on cache eviction)
+        buf = getattr(tile, 'presenter_buffer', None)
+        if buf is not None:
+            tile.presenter_buffer = None
+            self.release_buffer(buf)
+
+    @staticmethod
+    def wrap(out):
+        # PIL image sharing the memory of a uint8 HxW or HxWx3 array
+        mode = 'L' if out.ndim == 2 else 'RGB'
+        return Image.frombuffer(mode, (out.shape[1], out.shape[0]), out, 'raw', mode, 0, 1)
+
+    def wrap_tile(self, out):
+        # PIL image of a pooled tile buffer that hands the buffer back through release_tile
+        tile = self.wrap(out)
+        tile.presenter_buffer = out
+        return tile
+
+    def resample_tile(self, array, box, size, resample=Image.Resampling.LANCZOS):
+        # Full-quality tile: resample the box of a uint8 array into a pooled buffer
+        channels = 1 if array.ndim == 2 else array.shape[2]
+        out = self.tile_buffer(size[1], size[0], channels)
+        self.resample(array, box, size, resample, out=out)
+        return self.wrap_tile(out)
+
+    def resample(self, array, box, size, resample=Image.Resampling.NEAREST, out=None):
+        # Resample the (x0, y0, x1, y1) box of a uint8 array to size into out (default: the reused
+        # preview buffer of that size) and wrap it as a PIL image without copying
+        x0, y0, x1, y1 = box
+        width, height = size
+        channels = 1 if array.ndim == 2 else array.shape[2]
+        if out is None:
+            out = self.buffer(height, width, channels)
+        scale_x = (x1 - x0) / width
+        scale_y = (y1 - y0) / height
+        if resample != Image.Resampling.NEAREST and scale_x > 1 and scale_y > 1:
+            # Shrinking: area-average the whole-pixel window like PIL's reducing resize (the
+            # window is at most one source pixel larger than the box, under one output pixel)
+            window = array[int(y0):int(math.ceil(y1)), int(x0):int(math.ceil(x1))]
+            cv2.resize(window, (width, height), dst=out, interpolation=cv2.INTER_AREA)
+        else:
+            # Enlarging (or nearest): map the fractional box exactly with an affine warp; output pixel
+            # centre (i + 0.5) maps to source coordinate x0 + (i + 0.5) * scale (pixel centres at +0.5)
+            matrix = np.array([[scale_x, 0, x0 + 0.5 * scale_x - 0.5],
+                               [0, scale_y, y0 + 0.5 * scale_y - 0.5]], dtype=np.float64)
+            cv2.warpAffine(array, matrix, (width, height), dst=out,
+                           flags=INTERPOLATION.get(resample, cv2.INTER_NEAREST) | cv2.WARP_INVERSE_MAP,
+                           borderMode=cv2.BORDER_REPLICATE)
+        return self.wrap(out)
+
+    def clear(self):
+        # Drop idle PhotoImages and buffers (e.g. after loading another image)
+        self.idle_photos.clear()
+        self.buffers.clear()
+        with self.lock:
+            self.idle_tile_buffers.clear()
+
+    def stats(self):
+        # Allocation counts for the overlay and reports
+        return {'last_frame_allocations': self.last_frame_allocations,
+                'total_allocations': self.total_allocations,
+                'photo_reuses': self.reused,
+                'idle_photos': sum(len(photos) for photos in self.idle_photos.values()),
+                'idle_tile_buffers': sum(len(idle) for idle in self.idle_tile_buffers.values())}
@@ -0,0 +1,215 @@
+# Headless batch processing of GeoTIFF directories (no Tk or display required)
+#
+# Example:
+#   python geotiff_batch.py scenes/ -o out/ --quicklook --export-png --bands 4,3,2 \
+#       --stretch percentile --sample 73.05,33.68 --points survey.csv --workers 8
+import argparse  # For the command-line interface
+import csv  # For writing sampled values
+import glob  # For finding input files
+import os  # For file operations
+import time  # For throughput measurement
+from concurrent.futures import ProcessPoolExecutor, as_completed  # For parallel processing
+import numpy as np  # For array operations
+from PIL import Image  # For writing PNG files
+from osgeo import gdal  # GDAL library for GeoTIFF handling
+from raster_source import (GDALRasterSource, parse_band_mapping,  # For windowed reads and normalization
+                           default_band_mapping, read_composite)
+from geotransform import GeoTransform  # For lon/lat -> pixel conversion
+from point_io import load_points  # For reading sample points from CSV/GeoJSON
+from raster_cache import RasterCache, CachedRasterSource  # For the decoded disk cache
+
+QUICKLOOK_SIZE = 1024  # Default longest edge of quicklook images
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # Each --export-png worker holds a full composite in memory
+
+
+def fit_size(size, max_size):
+    # Largest size with the same aspect ratio that fits in max_size x max_size
+    width, height = size
+    factor = min(1.0, max_size / max(width, height))
+    return max(1, int(width * factor)), max(1, int(height * factor))
+
+
+def sample_points(dataset, transform, lons, lats):
+    # Pixel values of every band at the given WGS84 points (NaN outside the raster). Points are
+    # grouped by raster block; each band reads one window per group (the bounding box of its
+    # points) and picks all of the group's values with one fancy index.
+    pixel_x, pixel_y = transform.wgs84_to_pixel(lons, lats)
+    col = np.floor(pixel_x).astype(np.int64)
+    row = np.floor(pixel_y).astype(np.int64)
+    inside = (col >= 0) & (col < dataset.RasterXSize) & (row >= 0) & (row < dataset.RasterYSize)
+    values = np.full((len(lons), dataset.RasterCount), np.nan)
+    index = np.flatnonzero(inside)
+    if not index.size:
+        return pixel_x, pixel_y, values
+
+    # Sort the inside points by block so each group is a contiguous run
+    block_x, block_y = dataset.GetRasterBand(1).GetBlockSize()
+    blocks_per_row = -(-dataset.RasterXSize // block_x)
+    block_id = (row[index] // block_y) * blocks_per_row + col[index] // block_x
+    order = np.argsort(block_id, kind='stable')
+    index = index[order]
+    starts = np.flatnonzero(np.diff(block_id[order], prepend=-1))
+    groups = np.split(index, starts[1:])
+
+    bands = [dataset.GetRasterBand(band_index) for band_index in range(1, dataset.RasterCount + 1)]
+    for group in groups:
+        group_col, group_row = col[group], row[group]
+        x0, y0 = int(group_col.min()), int(group_row.min())
+        xsize, ysize = int(group_col.max()) - x0 + 1, int(group_row.max()) - y0 + 1
+        for channel, band in enumerate(bands):
+            window = band.ReadAsArray(x0, y0, xsize, ysize)
+            values[group, channel] = window[group_row - y0, group_col - x0]
+    return pixel_x, pixel_y, values
+
+
+def process_file(path, options):
+    # Process one GeoTIFF in a worker process; returns a summary dictionary
+    start = time.perf_counter()
+    result = {'path': path, 'bytes': 0, 'outputs': [], 'samples': [], 'error': None}
+    try:
+        result['bytes'] = os.path.getsize(path)
+        gdal.UseExceptions()
+        dataset = gdal.Open(path, gdal.GA_ReadOnly)
+        if options['bands']:
+            bands = parse_band_mapping(options['bands'], dataset.RasterCount)
+        else:
+            bands = default_band_mapping(dataset)
+        source = GDALRasterSource(dataset, bands=bands, stretch=options['stretch'])
+        name = os.path.splitext(os.path.basename(path))[0]
+
+        # With a cache directory, decode once and page every later read from the memory map
+        composite = None
+        if options['cache_dir'] and (options['quicklook'] or options['export_png']):
+            composite = RasterCache(options['cache_dir']).get_or_build(path, source)
+            source = CachedRasterSource(composite, bands, options['stretch'])
+
+        # Quicklook: whole image decimated by GDAL (from overviews when present)
+        if options['quicklook']:
+            out_path = os.path.join(options['output'], f"{name}_quicklook.png")
+            full_box = (0, 0) + source.size
+            source.read_region(full_box, fit_size(source.size, options['quicklook_size'])).save(out_path)
+            result['outputs'].append(out_path)
+
+        # Full-resolution normalized PNG, read block by block into one uint8 buffer
+        if options['export_png']:
+            out_path = os.path.join(options['output'], f"{name}_normalized.png")
+            if composite is None:
+                composite = read_composite(dataset, bands, source.ranges)
+            Image.fromarray(composite).save(out_path)
+            result['outputs'].append(out_path)
+
+        # Pixel and geo values at the requested points
+        if len(options['lons']):
+            transform = GeoTransform.from_dataset(dataset)
+            pixel_x, pixel_y, values = sample_points(dataset, transform, options['lons'], options['lats'])
+            for i in range(len(options['lons'])):
+                result['samples'].append([path, options['lons'][i], options['lats'][i],
+                                          pixel_x[i], pixel_y[i]] + list(values[i]))
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def lon_lat(text):
+    # argparse type for a LON,LAT pair
+    parts = text.split(',')
+    try:
+        if len(parts) != 2:
+            raise ValueError
+        return float(parts[0]), float(parts[1])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LON,LAT such as 73.05,33.68, got {text!r}")
+
+
+def find_inputs(input_dir, pattern):
+    # GeoTIFF files in the input directory, sorted for reproducible output
+    return sorted(glob.glob(os.path.join(input_dir, pattern)))
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Batch-process a directory of GeoTIFF files")
+    parser.add_argument('input_dir', help="Directory containing GeoTIFF files")
+    parser.add_argument('-o', '--output', default='batch_output', help="Output directory")
+    parser.add_argument('--pattern', default='*.tif*', help="Glob pattern for input files")
+    parser.add_argument('--quicklook', action='store_true', help="Write a downscaled PNG per file")
+    parser.add_argument('--quicklook-size', type=int, default=QUICKLOOK_SIZE,
+                        help="Longest edge of quicklook images in pixels")
+    parser.add_argument('--export-png', action='store_true', help="Write a full-resolution normalized PNG")
+    parser.add_argument('--bands', default='', help="Band mapping such as 1 or 4,3,2 (default: 1,2,3 or 1)")
+    parser.add_argument('--stretch', choices=('minmax', 'percentile'), default='minmax',
+                        help="Display stretch used for normalization")
+    parser.add_argument('--sample', action='append', default=[], metavar='LON,LAT', type=lon_lat,
+                        help="Sample every band at this WGS84 point (can be repeated)")
+    parser.add_argument('--points', help="CSV or GeoJSON file of points to sample")
+    parser.add_argument('--cache-dir', help="Keep decoded rasters in this memory-mapped cache directory")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of worker processes (default {DEFAULT_WORKERS})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Run the batch over every matching file and print a throughput summary
+    args = parse_args(argv)
+    paths = find_inputs(args.input_dir, args.pattern)
+    if not paths:
+        print(f"No files matching {args.pattern} in {args.input_dir}")
+        return 1
+    os.makedirs(args.output, exist_ok=True)
+
+    # Collect sample points from the command line and the points file
+    lons = [lon for lon, _ in args.sample]
+    lats = [lat for _, lat in args.sample]
+    if args.points:
+        file_lons, file_lats = load_points(args.points)
+        lons.extend(file_lons.tolist())
+        lats.extend(file_lats.tolist())
+
+    options = {
+        'output': args.output,
+        'quicklook': args.quicklook,
+        'quicklook_size': args.quicklook_size,
+        'export_png': args.export_png,
+        'bands': args.bands,
+        'stretch': args.stretch,
+        'cache_dir': args.cache_dir,
+        'lons': np.array(lons, dtype=np.float64),
+        'lats': np.array(lats, dtype=np.float64),
+    }
+
+    # Process files in parallel and report progress as they finish
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(process_file, path, options) for path in paths]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = f"ERROR: {result['error']}" if result['error'] else f"{len(result['outputs'])} outputs"
+            print(f"{result['path']}: {result['seconds']:.2f} s, {status}")
+    elapsed = time.perf_counter() - start
+
+    # Write all sampled values to one CSV
+    samples = [row for result in results for row in result['samples']]
+    if samples:
+        max_bands = max(len(row) - 5 for row in samples)
+        samples_path = os.path.join(args.output, 'samples.csv')
+        with open(samples_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['file', 'lon', 'lat', 'pixel_x', 'pixel_y'] +
+                            [f"band_{i}" for i in range(1, max_bands + 1)])
+            writer.writerows(sorted(samples, key=lambda row: row[0]))
+        print(f"Wrote {len(samples)} samples to {samples_path}")
+
+    # Throughput summary
+    total_mb = sum(result['bytes'] for result in results) / (1024 * 1024)
+    failures = sum(1 for result in results if result['error'])
+    print(f"Processed {len(results)} files ({failures} failed), {total_mb:.1f} MB in {elapsed:.2f} s: "
+          f"{len(results) / elapsed:.2f} files/s, {total_mb / elapsed:.1f} MB/s")
+    return 1 if failures else 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
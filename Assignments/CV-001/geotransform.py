@@ -0,0 +1,87 @@
+# Vectorized pixel <-> geographic coordinate conversion for GDAL datasets
+import numpy as np  # For array operations
+from osgeo import osr  # For reprojection to WGS84
+
+
+class GeoTransform:
+    # Affine geotransform whose inverse is computed once; every method accepts scalars or
+    # NumPy arrays of points and converts them in one vectorized operation
+    def __init__(self, geotransform, projection=None):
+        self.geotransform = tuple(geotransform)
+        gt = self.geotransform
+
+        # Inverse of the 2x2 part of the affine transform (None if it is singular)
+        det = gt[1] * gt[5] - gt[2] * gt[4]
+        if det == 0:
+            self.inverse = None
+        else:
+            self.inverse = (gt[5] / det, -gt[2] / det, -gt[4] / det, gt[1] / det)
+
+        # Transformations between the dataset's coordinate system and WGS84 longitude/latitude
+        self.to_wgs84 = None
+        self.from_wgs84 = None
+        if projection:
+            source_srs = osr.SpatialReference()
+            source_srs.ImportFromWkt(projection)
+            wgs84_srs = osr.SpatialReference()
+            wgs84_srs.ImportFromEPSG(4326)
+            # Keep (x, y) = (lon, lat) order regardless of the CRS axis definition
+            source_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            wgs84_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+            if not source_srs.IsSame(wgs84_srs):
+                self.to_wgs84 = osr.CoordinateTransformation(source_srs, wgs84_srs)
+                self.from_wgs84 = osr.CoordinateTransformation(wgs84_srs, source_srs)
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        # Build the transform from an open GDAL dataset
+        return cls(dataset.GetGeoTransform(), dataset.GetProjection())
+
+    @property
+    def invertible(self):
+        # Whether geographic coordinates can be converted back to pixels
+        return self.inverse is not None
+
+    def pixel_to_geo(self, pixel_x, pixel_y):
+        # Pixel/line coordinates to the dataset's geographic coordinates
+        gt = self.geotransform
+        pixel_x = np.asarray(pixel_x, dtype=np.float64)
+        pixel_y = np.asarray(pixel_y, dtype=np.float64)
+        geo_x = gt[0] + pixel_x * gt[1] + pixel_y * gt[2]
+        geo_y = gt[3] + pixel_x * gt[4] + pixel_y * gt[5]
+        return geo_x, geo_y
+
+    def geo_to_pixel(self, geo_x, geo_y):
+        # The dataset's geographic coordinates to pixel/line coordinates
+        if self.inverse is None:
+            raise ValueError("Geotransform cannot be inverted")
+        gt = self.geotransform
+        inv = self.inverse
+        temp_x = np.asarray(geo_x, dtype=np.float64) - gt[0]
+        temp_y = np.asarray(geo_y, dtype=np.float64) - gt[3]
+        pixel_x = inv[0] * temp_x + inv[1] * temp_y
+        pixel_y = inv[2] * temp_x + inv[3] * temp_y
+        return pixel_x, pixel_y
+
+    @staticmethod
+    def transform_points(transformation, x, y):
+        # Run an osr transformation over arrays of points in a single call
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if transformation is None:
+            return x, y
+        if x.size == 0:
+            return x, y  # TransformPoints rejects an empty point list
+        points = np.column_stack([x.ravel(), y.ravel()])
+        result = np.asarray(transformation.TransformPoints(points), dtype=np.float64)
+        return result[:, 0].reshape(x.shape), result[:, 1].reshape(y.shape)
+
+    def pixel_to_wgs84(self, pixel_x, pixel_y):
+        # Pixel/line coordinates to WGS84 longitude/latitude
+        geo_x, geo_y = self.pixel_to_geo(pixel_x, pixel_y)
+        return self.transform_points(self.to_wgs84, geo_x, geo_y)
+
+    def wgs84_to_pixel(self, lon, lat):
+        # WGS84 longitude/latitude to pixel/line coordinates
+        geo_x, geo_y = self.transform_points(self.from_wgs84, lon, lat)
+        return self.geo_to_pixel(geo_x, geo_y)
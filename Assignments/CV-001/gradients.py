@@ -0,0 +1,55 @@
+# Sobel/Prewitt gradient magnitude in float32 with the magnitude fused into one output buffer
+import cv2  # OpenCV filters
+import numpy as np  # For array operations
+
+PREWITT_X = np.array([[-1, 0, 1],
+                      [-1, 0, 1],
+                      [-1, 0, 1]], dtype=np.float32)
+
+PREWITT_Y = np.array([[-1, -1, -1],
+                      [ 0,  0,  0],
+                      [ 1,  1,  1]], dtype=np.float32)
+
+OPERATORS = ('sobel', 'prewitt')
+NORMS = ('l2', 'l1')
+
+
+def gradients(img, operator='sobel'):
+    # Signed x and y derivatives as float32 (negative gradients are kept, not clipped to uint8)
+    if operator == 'sobel':
+        grad_x = cv2.Sobel(img, cv2.CV_32F, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(img, cv2.CV_32F, 0, 1, ksize=3)
+    elif operator == 'prewitt':
+        grad_x = cv2.filter2D(img, cv2.CV_32F, PREWITT_X)
+        grad_y = cv2.filter2D(img, cv2.CV_32F, PREWITT_Y)
+    else:
+        raise ValueError(f"operator must be one of {OPERATORS}")
+    return grad_x, grad_y
+
+
+def gradient_magnitude(img, operator='sobel', norm='l2', orientation=False, out=None):
+    # Edge strength of a single-channel image. Peak memory is two float32 gradients plus the
+    # float32 output, instead of the four float64 temporaries of np.sqrt(gx**2 + gy**2).
+    # norm='l1' gives |gx| + |gy|; orientation=True also returns the angle in degrees (0-360).
+    if norm not in NORMS:
+        raise ValueError(f"norm must be one of {NORMS}")
+    if img.ndim != 2:
+        raise ValueError(f"Expected a single-channel image, got shape {img.shape}")
+    if out is None:
+        out = np.empty(img.shape, dtype=np.float32)
+    elif out.dtype != np.float32 or out.shape != img.shape:
+        # OpenCV would silently write a new array instead of filling this one
+        raise ValueError(f"out must be a float32 array of shape {img.shape}, got {out.dtype} {out.shape}")
+
+    grad_x, grad_y = gradients(img, operator)
+    angle = cv2.phase(grad_x, grad_y, angleInDegrees=True) if orientation else None
+
+    if norm == 'l2':
+        cv2.magnitude(grad_x, grad_y, magnitude=out)
+    else:
+        # In place: the gradients are not needed afterwards
+        np.abs(grad_x, out=grad_x)
+        np.abs(grad_y, out=grad_y)
+        cv2.add(grad_x, grad_y, dst=out)
+
+    return (out, angle) if orientation else out
@@ -0,0 +1,191 @@
+# Lightweight timing spans and counters for the viewer and the CV scripts
+#
+# Usage:
+#   import instrumentation as inst
+#   inst.enable()                          # or set CV_PROFILE=1 in the environment
+#   with inst.span('gdal.read', band=1):
+#       arr = band.ReadAsArray(...)
+#   inst.count('bytes_read', arr.nbytes)
+#
+#   @inst.timed('normalize')
+#   def normalize(...): ...
+#
+#   inst.dump_chrome_trace('trace.json')   # open in chrome://tracing or ui.perfetto.dev
+#
+# While disabled, span() returns a shared do-nothing object and count() returns at once,
+# so the hooks can stay in hot paths.
+import functools  # For the decorator
+import json  # For the trace file
+import os  # For the environment switch and process id
+import threading  # For thread ids and the lock
+import time  # For timestamps
+from collections import deque  # For bounded event and sample buffers
+
+MAX_EVENTS = 200000  # Trace events kept (oldest dropped first)
+RECENT_SAMPLES = 240  # Durations kept per span name for latency percentiles
+RATE_WINDOW_S = 1.0  # Window used for per-second rates
+
+enabled = os.environ.get('CV_PROFILE', '') not in ('', '0')
+lock = threading.Lock()
+events = deque(maxlen=MAX_EVENTS)  # Chrome trace events
+span_stats = {}  # name -> [calls, total seconds, max seconds, deque of recent durations]
+counters = {}  # name -> total
+counter_samples = {}  # name -> deque of (time, value) within the rate window
+start_time = time.perf_counter()
+
+
+def enable(flag=True):
+    # Turn recording on or off at run time
+    global enabled
+    enabled = flag
+
+
+def is_enabled():
+    # True while recording
+    return enabled
+
+
+def reset():
+    # Forget all recorded spans and counters
+    global start_time
+    with lock:
+        events.clear()
+        span_stats.clear()
+        counters.clear()
+        counter_samples.clear()
+        start_time = time.perf_counter()
+
+
+def record_span(name, begin, end, args=None):
+    # Store one finished span (timestamps from time.perf_counter)
+    duration = end - begin
+    event = {'name': name, 'ph': 'X', 'ts': (begin - start_time) * 1e6, 'dur': duration * 1e6,
+             'pid': os.getpid(), 'tid': threading.get_ident()}
+    if args:
+        event['args'] = args
+    with lock:
+        events.append(event)
+        stats = span_stats.get(name)
+        if stats is None:
+            stats = span_stats[name] = [0, 0.0, 0.0, deque(maxlen=RECENT_SAMPLES)]
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] = max(stats[2], duration)
+        stats[3].append(duration)
+
+
+class Span:
+    # Context manager that times its block
+    __slots__ = ('name', 'args', 'begin')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_span(self.name, self.begin, time.perf_counter(), self.args)
+        return False
+
+
+class NullSpan:
+    # Stand-in returned while recording is off
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, **args):
+    # Time a block: `with span('name'):`
+    return Span(name, args) if enabled else NULL_SPAN
+
+
+def timed(name=None):
+    # Decorator that times every call of a function (checked per call, so enable() works later)
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            begin = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record_span(span_name, begin, time.perf_counter())
+        return wrapper
+    return decorate
+
+
+def count(name, value=1):
+    # Add to a counter (bytes read, pixels resampled, redraws, ...)
+    if not enabled:
+        return
+    now = time.perf_counter()
+    with lock:
+        counters[name] = counters.get(name, 0) + value
+        samples = counter_samples.get(name)
+        if samples is None:
+            samples = counter_samples[name] = deque()
+        samples.append((now, value))
+        while samples and samples[0][0] < now - RATE_WINDOW_S:
+            samples.popleft()
+
+
+def rate(name):
+    # Per-second rate of a counter over the last RATE_WINDOW_S seconds
+    now = time.perf_counter()
+    with lock:
+        samples = counter_samples.get(name, ())
+        return sum(value for t, value in samples if t >= now - RATE_WINDOW_S) / RATE_WINDOW_S
+
+
+def latency(name, percentile=50):
+    # Recent duration of a span in milliseconds at the given percentile (0 if never recorded)
+    with lock:
+        stats = span_stats.get(name)
+        recent = sorted(stats[3]) if stats else []
+    if not recent:
+        return 0.0
+    index = min(len(recent) - 1, int(len(recent) * percentile / 100))
+    return recent[index] * 1000
+
+
+def summary():
+    # Totals per span (calls, total/mean/max ms) and per counter
+    with lock:
+        spans = {name: {'calls': calls, 'total_ms': total * 1000, 'mean_ms': total * 1000 / calls,
+                        'max_ms': longest * 1000}
+                 for name, (calls, total, longest, _) in span_stats.items()}
+        return {'spans': spans, 'counters': dict(counters)}
+
+
+def print_summary():
+    # Human-readable summary, slowest spans first
+    result = summary()
+    for name, stats in sorted(result['spans'].items(), key=lambda item: -item[1]['total_ms']):
+        print(f"{name:30s} {stats['calls']:8d} calls  {stats['total_ms']:10.1f} ms total  "
+              f"{stats['mean_ms']:8.3f} ms mean  {stats['max_ms']:8.3f} ms max")
+    for name, total in sorted(result['counters'].items()):
+        print(f"{name:30s} {total:14,}")
+
+
+def dump_chrome_trace(path):
+    # Write the recorded spans (and counter totals) as a Chrome trace JSON file
+    with lock:
+        trace_events = list(events)
+        totals = dict(counters)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms', 'otherData': {'counters': totals}}, f)
+    return path
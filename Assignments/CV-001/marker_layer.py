@@ -0,0 +1,140 @@
+# Bulk point markers for the GeoTIFF viewer, backed by a grid spatial index
+import tkinter as tk  # For canvas anchor constants
+import numpy as np  # For array operations
+from PIL import Image, ImageTk  # For the rasterized overlay
+
+GRID_CELL_SIZE = 256  # Index cell size in image pixels
+DENSE_THRESHOLD = 400  # Above this many visible points, draw one overlay image instead of crosses
+CROSS_SIZE = 10  # Half length of a cross marker in screen pixels
+MARKER_COLOR = (255, 0, 0)  # Red, same as the cross markers
+
+
+class GridIndex:
+    # Uniform grid over image pixel coordinates; points are sorted by cell so every row of
+    # cells in a query window is one contiguous slice
+    def __init__(self, pixel_x, pixel_y, width, height, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cols = max(1, int(np.ceil(width / cell_size)))
+        self.rows = max(1, int(np.ceil(height / cell_size)))
+        cell_x = np.clip((pixel_x // cell_size).astype(np.int64), 0, self.cols - 1)
+        cell_y = np.clip((pixel_y // cell_size).astype(np.int64), 0, self.rows - 1)
+        cell_ids = cell_y * self.cols + cell_x
+        self.order = np.argsort(cell_ids, kind='stable')
+        self.sorted_ids = cell_ids[self.order]
+        self.pixel_x = pixel_x
+        self.pixel_y = pixel_y
+
+    def query(self, x0, y0, x1, y1):
+        # Indices of the points inside the pixel rectangle [x0, x1) x [y0, y1)
+        col0 = max(0, int(x0 // self.cell_size))
+        col1 = min(self.cols - 1, int(x1 // self.cell_size))
+        row0 = max(0, int(y0 // self.cell_size))
+        row1 = min(self.rows - 1, int(y1 // self.cell_size))
+        if col1 < col0 or row1 < row0 or len(self.order) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # One slice per row of cells
+        rows = np.arange(row0, row1 + 1)
+        starts = np.searchsorted(self.sorted_ids, rows * self.cols + col0, side='left')
+        ends = np.searchsorted(self.sorted_ids, rows * self.cols + col1, side='right')
+        candidates = np.concatenate([self.order[a:b] for a, b in zip(starts, ends)])
+
+        # Exact filter on the candidates from the boundary cells
+        px = self.pixel_x[candidates]
+        py = self.pixel_y[candidates]
+        inside = (px >= x0) & (px < x1) & (py >= y0) & (py < y1)
+        return candidates[inside]
+
+
+class MarkerLayer:
+    # Holds marked points in image pixel coordinates and draws only those in the viewport
+    def __init__(self, canvas, cell_size=GRID_CELL_SIZE, dense_threshold=DENSE_THRESHOLD):
+        self.canvas = canvas
+        self.cell_size = cell_size
+        self.dense_threshold = dense_threshold
+        self.overlay_photo = None  # PhotoImage for the rasterized dense overlay
+        self.clear()
+
+    def clear(self, width=0, height=0):
+        # Remove all points (width/height are the raster size used by the index)
+        self.width = width
+        self.height = height
+        self.pixel_x = np.empty(0)
+        self.pixel_y = np.empty(0)
+        self.lon = np.empty(0)
+        self.lat = np.empty(0)
+        self.index = None
+        self.canvas.delete('marker')
+        self.overlay_photo = None
+
+    def __len__(self):
+        return len(self.pixel_x)
+
+    def add_points(self, pixel_x, pixel_y, lon, lat):
+        # Add a batch of points; points outside the raster are dropped. Returns how many were kept
+        pixel_x = np.atleast_1d(np.asarray(pixel_x, dtype=np.float64))
+        pixel_y = np.atleast_1d(np.asarray(pixel_y, dtype=np.float64))
+        inside = (pixel_x >= 0) & (pixel_x < self.width) & (pixel_y >= 0) & (pixel_y < self.height)
+        self.pixel_x = np.concatenate([self.pixel_x, pixel_x[inside]])
+        self.pixel_y = np.concatenate([self.pixel_y, pixel_y[inside]])
+        self.lon = np.concatenate([self.lon, np.atleast_1d(lon)[inside]])
+        self.lat = np.concatenate([self.lat, np.atleast_1d(lat)[inside]])
+
+        # Rebuild the index once per batch
+        self.index = GridIndex(self.pixel_x, self.pixel_y, self.width, self.height, self.cell_size)
+        return int(inside.sum())
+
+    def draw_cross(self, x, y):
+        # Draw a cross marker at specified canvas coordinates
+        size = CROSS_SIZE
+        self.canvas.create_line(x - size, y, x + size, y, fill='red', width=3, tags='marker')
+        self.canvas.create_line(x, y - size, x, y + size, fill='red', width=3, tags='marker')
+        self.canvas.create_oval(x - size - 2, y - size - 2, x + size + 2, y + size + 2,
+                                outline='red', width=2, tags='marker')
+
+    def rasterize(self, display_x, display_y, canvas_width, canvas_height):
+        # Draw many points into one RGBA image; opacity grows with the number of points per pixel
+        x = display_x.astype(np.int64)
+        y = display_y.astype(np.int64)
+        keep = (x >= 0) & (x < canvas_width) & (y >= 0) & (y < canvas_height)
+        counts = np.bincount(y[keep] * canvas_width + x[keep], minlength=canvas_width * canvas_height)
+        counts = counts.reshape(canvas_height, canvas_width)
+
+        # Grow every point to a 3x3 dot
+        dots = np.zeros((canvas_height + 2, canvas_width + 2), dtype=np.int64)
+        for dy in range(3):
+            for dx in range(3):
+                dots[dy:dy + canvas_height, dx:dx + canvas_width] += counts
+        dots = dots[1:-1, 1:-1]
+
+        overlay = np.zeros((canvas_height, canvas_width, 4), dtype=np.uint8)
+        overlay[..., :3] = MARKER_COLOR
+        overlay[..., 3] = np.where(dots > 0, np.minimum(255, 96 + dots * 32), 0)
+        return Image.fromarray(overlay, 'RGBA')
+
+    def draw(self, scale, origin_x, origin_y):
+        # Draw the points inside the visible canvas at the given display scale and origin
+        self.canvas.delete('marker')
+        self.overlay_photo = None
+        if self.index is None or len(self) == 0:
+            return
+
+        # Viewport in image pixel coordinates, with a margin so crosses at the edges still show
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        margin = CROSS_SIZE / scale
+        visible = self.index.query(-origin_x / scale - margin, -origin_y / scale - margin,
+                                   (canvas_width - origin_x) / scale + margin,
+                                   (canvas_height - origin_y) / scale + margin)
+        if len(visible) == 0:
+            return
+
+        display_x = origin_x + self.pixel_x[visible] * scale
+        display_y = origin_y + self.pixel_y[visible] * scale
+        if len(visible) <= self.dense_threshold:
+            for x, y in zip(display_x, display_y):
+                self.draw_cross(x, y)
+        else:
+            overlay = self.rasterize(display_x, display_y, canvas_width, canvas_height)
+            self.overlay_photo = ImageTk.PhotoImage(overlay)
+            self.canvas.create_image(0, 0, anchor=tk.NW, image=self.overlay_photo, tags='marker')
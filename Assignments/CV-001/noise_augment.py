@@ -0,0 +1,148 @@
+# Seeded, batched noise augmentation (Gaussian, salt & pepper, Poisson, speckle) for uint8/float32 images
+#
+# Example:
+#   for clean, noisy in noisy_pairs(frames, 'gaussian', seed=7, batch_size=64, workers=8, var=20):
+#       train_step(clean, noisy)
+# The same seed always gives the same noise, whatever the number of workers.
+import itertools  # For cutting streams into batches
+from concurrent.futures import ProcessPoolExecutor  # For generating batches in parallel
+import numpy as np  # For array operations and random generators
+
+MAX_VALUE = 255  # Pixel range of uint8 images; float32 images use the same 0-255 scale
+DTYPES = (np.uint8, np.float32)
+
+
+def batch_rng(seed, index):
+    # Independent generator for one batch, so every batch is reproducible on any worker
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def prepare_output(batch, out, dtype):
+    # Output array for a batch: the given buffer, or a new one of the requested dtype
+    dtype = np.dtype(dtype or batch.dtype)
+    if dtype not in DTYPES:
+        raise ValueError("Only uint8 and float32 images are supported")
+    if out is None:
+        out = np.empty(batch.shape, dtype=dtype)
+    elif out.shape != batch.shape or out.dtype not in DTYPES:
+        raise ValueError("out must be a uint8 or float32 array with the batch's shape")
+    return out
+
+
+def prepare_scratch(batch, scratch):
+    # float32 working buffer with the batch's shape, reused across calls when given
+    if scratch is None or scratch.shape != batch.shape or scratch.dtype != np.float32:
+        scratch = np.empty(batch.shape, dtype=np.float32)
+    return scratch
+
+
+def finish(scratch, out):
+    # Clip the float32 result to the pixel range and store it in out (rounded for uint8)
+    np.clip(scratch, 0, MAX_VALUE, out=scratch)
+    if out.dtype == np.uint8:
+        np.rint(scratch, out=scratch)
+    np.copyto(out, scratch, casting='unsafe')
+    return out
+
+
+def add_gaussian_noise(batch, rng, mean=0, var=20, out=None, scratch=None, dtype=None):
+    # Additive Gaussian noise with the given mean and variance
+    out = prepare_output(batch, out, dtype)
+    scratch = prepare_scratch(batch, scratch)
+    rng.standard_normal(dtype=np.float32, out=scratch)
+    scratch *= np.float32(var ** 0.5)
+    scratch += np.float32(mean)
+    scratch += batch
+    return finish(scratch, out)
+
+
+def add_salt_pepper_noise(batch, rng, prob=0.02, out=None, scratch=None, dtype=None):
+    # Set a fraction `prob` of pixels to 0 (pepper) or 255 (salt), half each
+    out = prepare_output(batch, out, dtype)
+    scratch = prepare_scratch(batch, scratch)
+    rng.random(dtype=np.float32, out=scratch)
+    if out is not batch:
+        np.copyto(out, batch, casting='unsafe')
+    out[scratch < prob / 2] = 0  # pepper
+    out[scratch > 1 - prob / 2] = MAX_VALUE  # salt
+    return out
+
+
+def add_poisson_noise(batch, rng, scale=1.0, out=None, scratch=None, dtype=None):
+    # Shot noise: each pixel is a Poisson count with mean pixel * scale, divided back by scale.
+    # Larger scale means more photons and relatively less noise.
+    out = prepare_output(batch, out, dtype)
+    scratch = prepare_scratch(batch, scratch)
+    np.multiply(batch, np.float32(scale), out=scratch, casting='unsafe')
+    np.maximum(scratch, 0, out=scratch)
+    # Generator.poisson has no out= argument, so go image by image to bound the int64 temporary
+    for i in range(len(batch)):
+        np.divide(rng.poisson(scratch[i]), scale, out=scratch[i], casting='unsafe')
+    return finish(scratch, out)
+
+
+def add_speckle_noise(batch, rng, var=0.04, out=None, scratch=None, dtype=None):
+    # Multiplicative noise: pixel * (1 + n) with n ~ N(0, var)
+    out = prepare_output(batch, out, dtype)
+    scratch = prepare_scratch(batch, scratch)
+    rng.standard_normal(dtype=np.float32, out=scratch)
+    scratch *= np.float32(var ** 0.5)
+    scratch += np.float32(1)
+    scratch *= batch
+    return finish(scratch, out)
+
+
+NOISE_FUNCTIONS = {
+    'gaussian': add_gaussian_noise,
+    'salt_pepper': add_salt_pepper_noise,
+    'poisson': add_poisson_noise,
+    'speckle': add_speckle_noise,
+}
+
+
+def add_noise(batch, rng, kind='gaussian', out=None, scratch=None, dtype=None, **params):
+    # Apply one noise type to an image or a batch of images
+    if kind not in NOISE_FUNCTIONS:
+        raise ValueError(f"kind must be one of {tuple(NOISE_FUNCTIONS)}")
+    return NOISE_FUNCTIONS[kind](np.asarray(batch), rng, out=out, scratch=scratch, dtype=dtype, **params)
+
+
+def make_noisy_batch(batch, seed, index, kind, dtype, params):
+    # Worker task: the noisy version of one clean batch, seeded by its batch index
+    return add_noise(batch, batch_rng(seed, index), kind, dtype=dtype, **params)
+
+
+def iter_batches(images, batch_size):
+    # Stack an array or any iterable of equally sized images into batches
+    if isinstance(images, np.ndarray):
+        for start in range(0, len(images), batch_size):
+            yield images[start:start + batch_size]
+        return
+    iterator = iter(images)
+    while True:
+        chunk = list(itertools.islice(iterator, batch_size))
+        if not chunk:
+            return
+        yield np.stack(chunk)
+
+
+def noisy_pairs(images, kind='gaussian', seed=0, batch_size=32, workers=1, dtype=None, **params):
+    # Stream (clean, noisy) batches in input order. With workers > 1 the noise is generated in a
+    # process pool, with at most 2 * workers batches in flight so memory stays bounded.
+    batches = enumerate(iter_batches(images, batch_size))
+    if workers <= 1:
+        scratch = None
+        for index, clean in batches:
+            scratch = prepare_scratch(clean, scratch)
+            yield clean, add_noise(clean, batch_rng(seed, index), kind, scratch=scratch, dtype=dtype, **params)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for index, clean in batches:
+            pending.append((clean, executor.submit(make_noisy_batch, clean, seed, index, kind, dtype, params)))
+            if len(pending) >= 2 * workers:
+                clean, future = pending.pop(0)
+                yield clean, future.result()
+        for clean, future in pending:
+            yield clean, future.result()
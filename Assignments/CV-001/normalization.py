@@ -0,0 +1,130 @@
+# Display normalization for non-uint8 rasters without full-image temporaries
+import numpy as np  # For array operations
+
+HISTOGRAM_BINS = 4096  # Histogram resolution used for percentile stretch
+BLOCK_PIXELS = 1 << 22  # Target pixels per block for streaming passes (about 4 MP)
+STRETCHES = {
+    'minmax': (0.0, 100.0),  # Full data range
+    'percentile': (2.0, 98.0),  # Clip the darkest and brightest 2%
+}
+
+
+def iter_blocks(band):
+    # Yield (xoff, yoff, xsize, ysize) windows aligned to the band's natural block size,
+    # grouping block rows so striped files are not read one scanline at a time
+    block_x, block_y = band.GetBlockSize()
+    width, height = band.XSize, band.YSize
+    block_x = min(block_x, width)
+    rows = max(block_y, (BLOCK_PIXELS // max(1, block_x)) // block_y * block_y)
+    for yoff in range(0, height, rows):
+        ysize = min(rows, height - yoff)
+        for xoff in range(0, width, block_x):
+            yield xoff, yoff, min(block_x, width - xoff), ysize
+
+
+def percentiles_from_histogram(hist, lo, hi, low_pct, high_pct):
+    # Interpolate percentile values from a histogram spanning [lo, hi]
+    hist = np.asarray(hist, dtype=np.float64)
+    total = hist.sum()
+    if total == 0:
+        return float(lo), float(hi)
+    cumulative = np.cumsum(hist) / total
+    edges = np.linspace(lo, hi, len(hist) + 1)
+    values = []
+    for pct in (low_pct, high_pct):
+        idx = int(np.searchsorted(cumulative, pct / 100.0))
+        idx = min(idx, len(hist) - 1)
+        previous = cumulative[idx - 1] if idx > 0 else 0.0
+        frac = 0.0 if hist[idx] == 0 else (pct / 100.0 - previous) * total / hist[idx]
+        values.append(float(edges[idx] + np.clip(frac, 0.0, 1.0) * (edges[idx + 1] - edges[idx])))
+    return values[0], values[1]
+
+
+def streaming_min_max(band):
+    # Exact min/max with one block in memory at a time
+    data_min, data_max = np.inf, -np.inf
+    for xoff, yoff, xsize, ysize in iter_blocks(band):
+        block = band.ReadAsArray(xoff, yoff, xsize, ysize)
+        data_min = min(data_min, block.min())
+        data_max = max(data_max, block.max())
+    return float(data_min), float(data_max)
+
+
+def streaming_histogram(band, lo, hi, bins=HISTOGRAM_BINS):
+    # Histogram over [lo, hi] accumulated block by block
+    hist = np.zeros(bins, dtype=np.int64)
+    for xoff, yoff, xsize, ysize in iter_blocks(band):
+        block = band.ReadAsArray(xoff, yoff, xsize, ysize)
+        hist += np.histogram(block, bins=bins, range=(lo, hi))[0]
+    return hist
+
+
+def band_stats(band, stretch='minmax', streaming=False):
+    # Display range (lo, hi) for a band; GDAL statistics/histograms by default,
+    # or an exact block-wise streaming pass when streaming=True
+    low_pct, high_pct = STRETCHES[stretch]
+
+    if streaming:
+        data_min, data_max = streaming_min_max(band)
+    else:
+        data_min, data_max = band.ComputeRasterMinMax(True)  # Approximate, uses overviews when present
+
+    if (low_pct, high_pct) == (0.0, 100.0) or data_max <= data_min:
+        return float(data_min), float(data_max)
+
+    if streaming:
+        hist = streaming_histogram(band, data_min, data_max)
+    else:
+        hist = band.GetHistogram(data_min, data_max, buckets=HISTOGRAM_BINS,
+                                 include_out_of_range=1, approx_ok=1)
+    return percentiles_from_histogram(hist, data_min, data_max, low_pct, high_pct)
+
+
+def array_stats(arr, stretch='minmax'):
+    # Display range for an in-memory array, computed without float copies of the array
+    low_pct, high_pct = STRETCHES[stretch]
+    data_min, data_max = float(arr.min()), float(arr.max())
+    if (low_pct, high_pct) == (0.0, 100.0) or data_max <= data_min:
+        return data_min, data_max
+    hist = np.histogram(arr, bins=HISTOGRAM_BINS, range=(data_min, data_max))[0]
+    return percentiles_from_histogram(hist, data_min, data_max, low_pct, high_pct)
+
+
+def normalize_to_uint8(arr, lo, hi, out=None):
+    # Linearly stretch [lo, hi] to 0-255, writing into out (allocated if not given);
+    # the only temporary is one float32 copy of arr, so call it per block
+    if out is None:
+        out = np.empty(arr.shape, dtype=np.uint8)
+    if hi <= lo:
+        out[...] = 0
+        return out
+    if arr.dtype == np.uint8 and (lo, hi) == (0.0, 255.0):
+        np.copyto(out, arr)  # Already in display range
+        return out
+    scratch = np.subtract(arr, lo, dtype=np.float32)
+    scratch *= 255.0 / (hi - lo)
+    np.clip(scratch, 0, 255, out=scratch)
+    np.copyto(out, scratch, casting='unsafe')
+    return out
+
+
+def normalize_array(arr, lo, hi, out=None, block_rows=None):
+    # Normalize a large in-memory array a row block at a time
+    if out is None:
+        out = np.empty(arr.shape, dtype=np.uint8)
+    if block_rows is None:
+        row_pixels = max(1, arr[0].size) if arr.ndim else 1
+        block_rows = max(1, BLOCK_PIXELS // row_pixels)
+    for start in range(0, arr.shape[0], block_rows):
+        normalize_to_uint8(arr[start:start + block_rows], lo, hi, out=out[start:start + block_rows])
+    return out
+
+
+def normalize_band(band, lo, hi, out=None):
+    # Read and normalize a whole band block by block into one uint8 buffer
+    if out is None:
+        out = np.empty((band.YSize, band.XSize), dtype=np.uint8)
+    for xoff, yoff, xsize, ysize in iter_blocks(band):
+        block = band.ReadAsArray(xoff, yoff, xsize, ysize)
+        normalize_to_uint8(block, lo, hi, out=out[yoff:yoff + ysize, xoff:xoff + xsize])
+    return out
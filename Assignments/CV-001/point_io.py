@@ -0,0 +1,101 @@
+# Reading point coordinates from CSV and GeoJSON files (no GUI dependencies)
+import csv  # For reading point tables
+import json  # For reading GeoJSON files
+import os  # For file extensions
+import numpy as np  # For array operations
+
+# Column names accepted for longitude and latitude in CSV files
+LON_COLUMNS = ('lon', 'lng', 'long', 'longitude', 'x')
+LAT_COLUMNS = ('lat', 'latitude', 'y')
+
+
+def find_column(fieldnames, candidates):
+    # Find a column by any of its accepted names, ignoring case
+    lookup = {name.strip().lower(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in lookup:
+            return lookup[candidate]
+    raise ValueError(f"No column named any of: {', '.join(candidates)}")
+
+
+def load_points_csv(path):
+    # Read longitude/latitude columns from a CSV file into two arrays
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        lon_column = find_column(reader.fieldnames or [], LON_COLUMNS)
+        lat_column = find_column(reader.fieldnames or [], LAT_COLUMNS)
+        rows = [(row[lon_column], row[lat_column]) for row in reader]
+    if not rows:
+        return np.empty(0), np.empty(0)
+    coords = np.array(rows, dtype=np.float64)
+    return coords[:, 0], coords[:, 1]
+
+
+def load_points_geojson(path):
+    # Read Point and MultiPoint geometries from a GeoJSON file into two arrays
+    with open(path) as f:
+        data = json.load(f)
+    features = data.get('features', [data])
+    coords = []
+    for feature in features:
+        geometry = feature.get('geometry', feature)
+        if geometry is None:
+            continue
+        if geometry.get('type') == 'Point':
+            coords.append(geometry['coordinates'][:2])
+        elif geometry.get('type') == 'MultiPoint':
+            coords.extend(point[:2] for point in geometry['coordinates'])
+    if not coords:
+        return np.empty(0), np.empty(0)
+    coords = np.array(coords, dtype=np.float64)
+    return coords[:, 0], coords[:, 1]
+
+
+def load_points(path):
+    # Read points from a CSV or GeoJSON file, chosen by extension
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.json', '.geojson'):
+        return load_points_geojson(path)
+    return load_points_csv(path)
+
+
+def feature_id(feature, index, id_property=None):
+    # Zone identifier: a chosen property, the feature id, or the position in the file
+    properties = feature.get('properties') or {}
+    if id_property and id_property in properties:
+        return str(properties[id_property])
+    if feature.get('id') is not None:
+        return str(feature['id'])
+    return str(index)
+
+
+def load_zones_geojson(path, id_property=None):
+    # Read Polygon, MultiPolygon, Point and MultiPoint features as zones; polygons are lists of
+    # rings (N x 2 arrays, outer ring first, then holes) and points are one N x 2 array
+    with open(path) as f:
+        data = json.load(f)
+    features = data.get('features', [data])
+    zones = []
+    for index, feature in enumerate(features):
+        geometry = feature.get('geometry', feature)
+        if geometry is None:
+            continue
+        kind = geometry.get('type')
+        if kind == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif kind == 'MultiPolygon':
+            parts = geometry['coordinates']
+        elif kind == 'Point':
+            points = [geometry['coordinates'][:2]]
+        elif kind == 'MultiPoint':
+            points = [point[:2] for point in geometry['coordinates']]
+        else:
+            continue
+        zone = {'id': feature_id(feature, index, id_property)}
+        if kind in ('Polygon', 'MultiPolygon'):
+            zone['polygons'] = [[np.array(ring, dtype=np.float64)[:, :2] for ring in rings if len(ring) >= 3]
+                                for rings in parts]
+        else:
+            zone['points'] = np.array(points, dtype=np.float64).reshape(-1, 2)
+        zones.append(zone)
+    return zones
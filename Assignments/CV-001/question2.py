@@ -29,3 +29,11 @@ conv_out = convolution2d(image, kernel)
 
 print("Correlation:\n", corr_out)
 print("Convolution:\n", conv_out)
+
+# Same results from the vectorized engine (correlation_engine.py), which also handles
+# 'same'/'full' modes, NxHxW batches, and separable/FFT paths for larger kernels
+from correlation_engine import correlation2d as fast_correlation2d, convolution2d as fast_convolution2d
+
+print("Vectorized engine matches loop:",
+      np.array_equal(fast_correlation2d(image, kernel), corr_out) and
+      np.array_equal(fast_convolution2d(image, kernel), conv_out))
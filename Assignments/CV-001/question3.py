@@ -1,6 +1,7 @@
 import cv2
 import numpy as np
 import matplotlib.pyplot as plt
+from noise_augment import add_noise  # Batched, seeded noise generators
 
 # ✅ Correct file path (choose one of the below styles)
 image = cv2.imread(r"D:\7th\CV\Github\Computer-Vision\General\Elements\fast.jpeg", cv2.IMREAD_GRAYSCALE)
@@ -10,23 +11,11 @@ image = cv2.imread(r"D:\7th\CV\Github\Computer-Vision\General\Elements\fast.jpeg
 if image is None:
     raise FileNotFoundError("Image not found. Check the file path.")
 
-# --- Add Gaussian Noise ---
-def add_gaussian_noise(img, mean=0, var=20):
-    noise = np.random.normal(mean, var**0.5, img.shape)
-    noisy = img + noise
-    return np.clip(noisy, 0, 255).astype(np.uint8)
-
-# --- Add Salt & Pepper Noise ---
-def add_salt_pepper_noise(img, prob=0.02):
-    noisy = img.copy()
-    rnd = np.random.rand(*img.shape)
-    noisy[rnd < prob/2] = 0       # pepper
-    noisy[rnd > 1 - prob/2] = 255 # salt
-    return noisy
-
-# Noisy images
-gaussian_noisy = add_gaussian_noise(image)
-sp_noisy = add_salt_pepper_noise(image)
+# --- Add Noise ---
+# Seeded generator, so the noisy images are the same on every run
+rng = np.random.default_rng(0)
+gaussian_noisy = add_noise(image, rng, 'gaussian', mean=0, var=20)
+sp_noisy = add_noise(image, rng, 'salt_pepper', prob=0.02)
 
 # --- Filtering ---
 gaussian_filtered  = cv2.GaussianBlur(gaussian_noisy, (5,5), 1)
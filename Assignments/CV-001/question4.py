@@ -1,6 +1,6 @@
 import cv2
-import numpy as np
 import matplotlib.pyplot as plt
+from gradients import gradient_magnitude  # Fused float32 gradient magnitude
 
 # ✅ Correct path (raw string or double slashes or forward slashes)
 image = cv2.imread(r"D:\7th\CV\Github\Computer-Vision\General\Elements\fast.jpeg", cv2.IMREAD_GRAYSCALE)
@@ -9,22 +9,13 @@ if image is None:
     raise FileNotFoundError("Image not found. Check the file path.")
 
 # --- Sobel Operator ---
-sobel_x = cv2.Sobel(image, cv2.CV_64F, 1, 0, ksize=3)
-sobel_y = cv2.Sobel(image, cv2.CV_64F, 0, 1, ksize=3)
-sobel = np.sqrt(sobel_x**2 + sobel_y**2)
+# float32 gradients with the magnitude written into one preallocated output
+# (see gradients.py; the old CV_64F version needed four float64 temporaries)
+sobel = gradient_magnitude(image, 'sobel')
 
 # --- Prewitt Operator ---
-prewitt_kernel_x = np.array([[-1, 0, 1],
-                             [-1, 0, 1],
-                             [-1, 0, 1]], dtype=np.float32)
-
-prewitt_kernel_y = np.array([[-1,-1,-1],
-                             [ 0, 0, 0],
-                             [ 1, 1, 1]], dtype=np.float32)
-
-prewitt_x = cv2.filter2D(image, -1, prewitt_kernel_x)
-prewitt_y = cv2.filter2D(image, -1, prewitt_kernel_y)
-prewitt = np.sqrt(prewitt_x.astype(np.float32)**2 + prewitt_y.astype(np.float32)**2)
+# Computed in float32 so negative gradients are no longer clipped to 0 by a uint8 filter2D
+prewitt = gradient_magnitude(image, 'prewitt')
 
 # --- Visualization ---
 titles = ["Original", "Sobel Edge Map", "Prewitt Edge Map"]
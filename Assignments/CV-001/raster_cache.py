@@ -0,0 +1,159 @@
+# On-disk cache of decoded, normalized rasters stored as memory-mapped .npy files
+import hashlib  # For cache keys
+import math  # For decimation steps
+import os  # For file operations
+import tempfile  # For unique temporary entry names
+import threading  # For guarding the set of temporary files
+import time  # For finding stale temporary files
+import numpy as np  # For array operations and memory mapping
+from PIL import Image  # For building tiles
+from osgeo import gdal  # GDAL library for GeoTIFF handling
+from raster_source import read_composite  # For block-wise decoding into the memory map
+import instrumentation as inst  # For timing spans and counters
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'geotiff_viewer')
+DEFAULT_MAX_BYTES = 4 * 1024 ** 3  # Evict least recently used entries above 4 GB
+STALE_TEMP_SECONDS = 24 * 3600  # Temporary files older than this were left by a crashed session
+
+
+class RasterCache:
+    # Decoded uint8 rasters keyed by file path, modification time and band/stretch selection
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or os.environ.get('GEOTIFF_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.temp_paths = set()  # Temporary files of builds still running
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.remove_stale_temp()
+
+    def entry_path(self, path, bands, stretch):
+        # Cache file for one (file, mtime, size, bands, stretch) combination
+        stat = os.stat(path)
+        text = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{tuple(bands)}|{stretch}"
+        return os.path.join(self.cache_dir, hashlib.sha1(text.encode('utf-8')).hexdigest() + '.npy')
+
+    def get(self, path, bands, stretch):
+        # Memory-map a cached raster read-only, or return None if it is not cached
+        entry = self.entry_path(path, bands, stretch)
+        if not os.path.exists(entry):
+            return None
+        os.utime(entry)  # Mark as recently used for eviction
+        return np.load(entry, mmap_mode='r')
+
+    def build(self, path, source, cancel=None):
+        # Decode a raster block by block straight into a new memory-mapped file; returns None
+        # (leaving no files behind) if the optional cancel event is set before it finishes
+        entry = self.entry_path(path, source.band_indices, source.stretch)
+        width, height = source.size
+        shape = (height, width) if len(source.band_indices) == 1 else (height, width, len(source.band_indices))
+
+        # Write to a temporary file and rename it so readers never see a partial entry; the name is
+        # unique so concurrent builds of the same entry (reopen, stretch change) never share a file
+        fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(entry) + '.', suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        with self.lock:
+            self.temp_paths.add(temp_path)
+        out = None
+        try:
+            out = np.lib.format.open_memmap(temp_path, mode='w+', dtype=np.uint8, shape=shape)
+            dataset = gdal.Open(path, gdal.GA_ReadOnly)  # Own handle, safe on worker threads
+            if read_composite(dataset, source.band_indices, source.ranges, out=out, cancel=cancel) is None:
+                return None
+            out.flush()
+            out = None  # Unmap before the rename
+            os.replace(temp_path, entry)
+        finally:
+            out = None
+            self.remove_temp(temp_path)
+        self.evict(keep=entry)
+        return np.load(entry, mmap_mode='r')
+
+    def remove_temp(self, temp_path):
+        # Delete one temporary file if it is still there
+        with self.lock:
+            self.temp_paths.discard(temp_path)
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass  # Already renamed into place or removed
+
+    def cleanup(self):
+        # Delete the temporary files of builds that are still running (called when the app exits)
+        with self.lock:
+            temp_paths = list(self.temp_paths)
+        for temp_path in temp_paths:
+            self.remove_temp(temp_path)
+
+    def remove_stale_temp(self):
+        # Delete temporary files that a crashed or killed session left behind
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        for name in os.listdir(self.cache_dir):
+            temp_path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith('.tmp') and os.stat(temp_path).st_mtime < cutoff:
+                    os.remove(temp_path)
+            except OSError:
+                continue
+
+    def get_or_build(self, path, source):
+        # Cached raster for the source's bands and stretch, decoding it on a miss
+        cached = self.get(path, source.band_indices, source.stretch)
+        return cached if cached is not None else self.build(path, source)
+
+    def evict(self, keep=None):
+        # Delete least recently used entries until the cache fits in max_bytes
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npy'):
+                entry = os.path.join(self.cache_dir, name)
+                stat = os.stat(entry)
+                entries.append((stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            try:
+                os.remove(entry)
+            except OSError:
+                continue  # Still mapped on some platforms; try again next time
+            total -= size
+
+
+class CachedRasterSource:
+    # Tile source that pages pixels straight from a memory-mapped cached raster
+    def __init__(self, array, band_indices, stretch):
+        self.array = array
+        self.band_indices = tuple(band_indices)
+        self.stretch = stretch
+        self.size = (array.shape[1], array.shape[0])
+        self.mode = 'L' if array.ndim == 2 else 'RGB'
+
+    def read_region(self, box, size, resample=Image.Resampling.LANCZOS, presenter=None):
+        # Resample the source box to the output size, skipping rows/columns when zoomed far out;
+        # with a presenter the result goes into one of its pooled tile buffers
+        x0, y0, x1, y1 = box
+        out_width, out_height = size
+
+        # Integer step that keeps at least twice the output resolution before the final resample
+        step = max(1, int(min((x1 - x0) / out_width, (y1 - y0) / out_height) / 2))
+        xoff = int(math.floor(x0))
+        yoff = int(math.floor(y0))
+        xend = min(int(math.ceil(x1)), self.size[0])
+        yend = min(int(math.ceil(y1)), self.size[1])
+
+        # Strided view into the memory map; only the touched pages are read from disk. OpenCV
+        # reads a row-strided view directly, so only skipped columns need a compacting copy.
+        with inst.span('cache.read', step=step):
+            window = np.asarray(self.array[yoff:yend:step, xoff:xend:step])
+            if presenter is None or step > 1:
+                window = np.ascontiguousarray(window)
+        inst.count('bytes_read', window.nbytes)
+        sub_box = ((x0 - xoff) / step, (y0 - yoff) / step,
+                   min((x1 - xoff) / step, window.shape[1]), min((y1 - yoff) / step, window.shape[0]))
+        inst.count('pixels_resampled', out_width * out_height)
+        with inst.span('resample'):
+            if presenter is not None:
+                return presenter.resample_tile(window, sub_box, size, resample)
+            return Image.fromarray(window).resize(size, resample, box=sub_box)
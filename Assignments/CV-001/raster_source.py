@@ -0,0 +1,194 @@
+# GDAL-backed tile source that reads only the window needed for each tile
+import math  # For rounding window bounds
+import threading  # For per-thread dataset handles
+import numpy as np  # For array operations
+from PIL import Image  # For building tiles
+from osgeo import gdal  # GDAL library for GeoTIFF handling
+from normalization import band_stats, iter_blocks, normalize_to_uint8  # For display stretch
+import instrumentation as inst  # For timing spans and counters
+
+MIN_OVERVIEW_SIZE = 256  # Smallest overview edge worth building
+
+# GDAL resampling used when a window is read straight into a smaller buffer
+GDAL_RESAMPLING = {
+    Image.Resampling.NEAREST: gdal.GRIORA_NearestNeighbour,
+    Image.Resampling.BILINEAR: gdal.GRIORA_Bilinear,
+    Image.Resampling.BICUBIC: gdal.GRIORA_Cubic,
+    Image.Resampling.LANCZOS: gdal.GRIORA_Lanczos,
+}
+
+
+def has_overviews(dataset):
+    # Check whether the dataset already has an overview pyramid
+    return dataset.GetRasterBand(1).GetOverviewCount() > 0
+
+
+def overview_levels(width, height):
+    # Decimation factors 2, 4, 8, ... until the overview becomes too small
+    levels = []
+    factor = 2
+    while max(width, height) // factor >= MIN_OVERVIEW_SIZE:
+        levels.append(factor)
+        factor *= 2
+    return levels
+
+
+def build_overviews(dataset, resampling='AVERAGE'):
+    # Build the pyramid (GDAL writes an external .ovr file for read-only datasets)
+    levels = overview_levels(dataset.RasterXSize, dataset.RasterYSize)
+    if levels:
+        dataset.BuildOverviews(resampling, levels)
+    return levels
+
+
+def parse_band_mapping(text, band_count):
+    # Parse a band-to-channel mapping such as "4,3,2" (one band for grayscale, three for RGB)
+    bands = tuple(int(part) for part in text.replace(' ', '').split(',') if part)
+    if len(bands) not in (1, 3):
+        raise ValueError("Enter one band (grayscale) or three bands (R,G,B)")
+    for index in bands:
+        if not 1 <= index <= band_count:
+            raise ValueError(f"Band {index} does not exist (image has {band_count} bands)")
+    return bands
+
+
+def default_band_mapping(dataset):
+    # Natural colour for 3+ band images, first band otherwise
+    return (1, 2, 3) if dataset.RasterCount >= 3 else (1,)
+
+
+def band_range(band, stretch):
+    # Display range for one band (uint8 data keeps its full range under min-max)
+    if band.DataType == gdal.GDT_Byte and stretch == 'minmax':
+        return 0.0, 255.0
+    return band_stats(band, stretch)
+
+
+def read_composite(dataset, bands, ranges, out=None, cancel=None):
+    # Read a full-resolution composite block by block into one interleaved uint8 buffer;
+    # returns None as soon as the optional cancel event is set
+    height, width = dataset.RasterYSize, dataset.RasterXSize
+    if out is None:
+        shape = (height, width) if len(bands) == 1 else (height, width, len(bands))
+        out = np.empty(shape, dtype=np.uint8)
+    first_band = dataset.GetRasterBand(bands[0])
+    for xoff, yoff, xsize, ysize in iter_blocks(first_band):
+        if cancel is not None and cancel.is_set():
+            return None
+        for channel, index in enumerate(bands):
+            block = dataset.GetRasterBand(index).ReadAsArray(xoff, yoff, xsize, ysize)
+            target = out[yoff:yoff + ysize, xoff:xoff + xsize]
+            if len(bands) > 1:
+                target = target[..., channel]
+            normalize_to_uint8(block, *ranges[channel], out=target)
+    return out
+
+
+class GDALRasterSource:
+    # Tile source that reads windows of one band (grayscale) or three bands (RGB composite),
+    # using overviews when zoomed out
+    def __init__(self, dataset, bands=(1,), stretch='minmax'):
+        self.dataset = dataset
+        self.band_indices = tuple(bands)
+        self.bands = [dataset.GetRasterBand(index) for index in self.band_indices]
+        self.path = dataset.GetDescription()  # Used to reopen the file in worker threads
+        self.local = threading.local()  # Per-thread dataset handles
+        self.owner = threading.get_ident()  # Thread that may use the dataset passed in
+        self.size = (dataset.RasterXSize, dataset.RasterYSize)
+        self.stretch = stretch
+        self.mode = 'L' if len(self.bands) == 1 else 'RGB'
+
+        # Display range per band (GDAL statistics, read from overviews when possible)
+        self.ranges = [band_range(band, stretch) for band in self.bands]
+
+    def pick_overview(self, scale, first_band=None):
+        # Index of the smallest overview that still has the resolution needed (-1 for full res)
+        first_band = self.bands[0] if first_band is None else first_band
+        best_level, best_width = -1, first_band.XSize
+        needed_width = self.size[0] * scale
+        for i in range(first_band.GetOverviewCount()):
+            overview_width = first_band.GetOverview(i).XSize
+            if needed_width <= overview_width < best_width:
+                best_level, best_width = i, overview_width
+        return best_level
+
+    def thread_bands(self):
+        # GDAL dataset handles must not be shared between threads, so every thread other than
+        # the one that built the source opens its own
+        if threading.get_ident() == self.owner:
+            return self.bands
+        bands = getattr(self.local, 'bands', None)
+        if bands is None:
+            self.local.dataset = gdal.Open(self.path, gdal.GA_ReadOnly)
+            bands = [self.local.dataset.GetRasterBand(index) for index in self.band_indices]
+            self.local.bands = bands
+        return bands
+
+    @staticmethod
+    def band_level(band, level):
+        # Full-resolution band or one of its overviews
+        return band if level < 0 else band.GetOverview(level)
+
+    def empty_buffer(self, width, height, presenter=None):
+        # Preallocated uint8 output holding every channel interleaved (pooled when a presenter is given)
+        if presenter is not None:
+            return presenter.tile_buffer(height, width, len(self.bands))
+        if self.mode == 'L':
+            return np.empty((height, width), dtype=np.uint8)
+        return np.empty((height, width, len(self.bands)), dtype=np.uint8)
+
+    def channel_view(self, buffer, channel):
+        # Writable view of one channel inside the interleaved buffer
+        return buffer if self.mode == 'L' else buffer[..., channel]
+
+    def read_region(self, box, size, resample=Image.Resampling.LANCZOS, presenter=None):
+        # Read the source box (in full-resolution pixels) resampled to the output size; with a
+        # presenter the result goes into one of its pooled tile buffers
+        x0, y0, x1, y1 = box
+        out_width, out_height = size
+        bands = self.thread_bands()
+
+        # Use the coarsest overview that is still sharp enough
+        level = self.pick_overview(out_width / (x1 - x0), bands[0])
+        reference = self.band_level(bands[0], level)
+        factor_x = reference.XSize / self.size[0]
+        factor_y = reference.YSize / self.size[1]
+
+        # Integer window in the chosen level's pixel grid
+        xoff = int(math.floor(x0 * factor_x))
+        yoff = int(math.floor(y0 * factor_y))
+        xsize = max(1, min(int(math.ceil(x1 * factor_x)), reference.XSize) - xoff)
+        ysize = max(1, min(int(math.ceil(y1 * factor_y)), reference.YSize) - yoff)
+
+        if xsize > out_width or ysize > out_height:
+            # Still downsampling: let GDAL decimate each band straight into an output-sized buffer
+            buffer = self.empty_buffer(out_width, out_height, presenter)
+            for channel, band in enumerate(bands):
+                with inst.span('gdal.read', level=level, decimated=True):
+                    arr = self.band_level(band, level).ReadAsArray(
+                        xoff, yoff, xsize, ysize, buf_xsize=out_width, buf_ysize=out_height,
+                        resample_alg=GDAL_RESAMPLING.get(resample, gdal.GRIORA_Lanczos))
+                inst.count('bytes_read', arr.nbytes)
+                inst.count('pixels_resampled', arr.size)
+                with inst.span('normalize'):
+                    normalize_to_uint8(arr, *self.ranges[channel], out=self.channel_view(buffer, channel))
+            return presenter.wrap_tile(buffer) if presenter is not None else Image.fromarray(buffer)
+
+        # Upsampling: read the native window and resample the exact sub-box (with OpenCV into a
+        # pooled buffer when a presenter is given, otherwise with PIL)
+        buffer = self.empty_buffer(xsize, ysize, presenter)
+        for channel, band in enumerate(bands):
+            with inst.span('gdal.read', level=level, decimated=False):
+                arr = self.band_level(band, level).ReadAsArray(xoff, yoff, xsize, ysize)
+            inst.count('bytes_read', arr.nbytes)
+            with inst.span('normalize'):
+                normalize_to_uint8(arr, *self.ranges[channel], out=self.channel_view(buffer, channel))
+        sub_box = (x0 * factor_x - xoff, y0 * factor_y - yoff,
+                   x1 * factor_x - xoff, y1 * factor_y - yoff)
+        inst.count('pixels_resampled', out_width * out_height)
+        with inst.span('resample'):
+            if presenter is not None:
+                tile = presenter.resample_tile(buffer, sub_box, size, resample)
+                presenter.release_buffer(buffer)  # The native window is only needed for this tile
+                return tile
+            return Image.fromarray(buffer).resize(size, resample, box=sub_box)
@@ -0,0 +1,65 @@
+# Coalesces zoom and pan events into at most one redraw per frame
+FRAME_INTERVAL_MS = 16  # About 60 redraws per second
+IDLE_DELAY_MS = 150  # Quiet time before the full-quality frame is drawn
+
+
+class RedrawScheduler:
+    # Collects zoom/pan changes between frames and renders them together: a cheap preview
+    # while the input is busy, then one full-quality frame once it goes idle
+    def __init__(self, widget, draw_preview, draw_final,
+                 frame_ms=FRAME_INTERVAL_MS, idle_ms=IDLE_DELAY_MS):
+        self.widget = widget  # Any Tk widget, used for after() timers
+        self.draw_preview = draw_preview  # Called as draw_preview(dx, dy, zoomed)
+        self.draw_final = draw_final  # Called with no arguments when input goes idle
+        self.frame_ms = frame_ms
+        self.idle_ms = idle_ms
+        self.pending_dx = 0
+        self.pending_dy = 0
+        self.zoom_pending = False
+        self.frame_job = None
+        self.idle_job = None
+
+    def request_pan(self, dx, dy):
+        # Add a pan offset to the next frame
+        self.pending_dx += dx
+        self.pending_dy += dy
+        self.schedule()
+
+    def request_zoom(self):
+        # Mark the zoom level as changed for the next frame
+        self.zoom_pending = True
+        self.schedule()
+
+    def schedule(self):
+        # Make sure one frame is queued and restart the idle timer
+        if self.frame_job is None:
+            self.frame_job = self.widget.after(self.frame_ms, self.flush)
+        if self.idle_job is not None:
+            self.widget.after_cancel(self.idle_job)
+        self.idle_job = self.widget.after(self.idle_ms, self.settle)
+
+    def flush(self):
+        # Draw all changes gathered since the last frame as one preview
+        self.frame_job = None
+        dx, dy, zoomed = self.pending_dx, self.pending_dy, self.zoom_pending
+        self.pending_dx = self.pending_dy = 0
+        self.zoom_pending = False
+        if dx or dy or zoomed:
+            self.draw_preview(dx, dy, zoomed)
+
+    def settle(self):
+        # Input went idle: apply anything still pending, then draw full quality
+        self.idle_job = None
+        if self.frame_job is not None:
+            self.widget.after_cancel(self.frame_job)
+            self.flush()
+        self.draw_final()
+
+    def cancel(self):
+        # Drop queued frames, e.g. when a new image is loaded
+        for job in (self.frame_job, self.idle_job):
+            if job is not None:
+                self.widget.after_cancel(job)
+        self.frame_job = self.idle_job = None
+        self.pending_dx = self.pending_dy = 0
+        self.zoom_pending = False
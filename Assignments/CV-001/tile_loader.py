@@ -0,0 +1,82 @@
+# Background tile loading for the Tk viewer
+import os  # For the CPU count
+import queue  # For handing finished work back to the Tk thread
+from concurrent.futures import ThreadPoolExecutor  # GDAL reads and PIL resizes release the GIL
+
+POLL_INTERVAL_MS = 15  # How often the Tk thread collects finished work
+DEFAULT_WORKERS = min(8, os.cpu_count() or 2)
+
+
+class TileLoader:
+    # Runs jobs on a thread pool and delivers their results on the Tk thread through root.after polling
+    def __init__(self, root, workers=DEFAULT_WORKERS, poll_ms=POLL_INTERVAL_MS):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile-loader')
+        self.pending = {}  # Job key -> (future, callback, error_callback)
+        self.finished = queue.SimpleQueue()  # (key, future) pairs filled by worker threads
+        self.running = True
+        self.root.after(self.poll_ms, self.poll)
+
+    def submit(self, key, job, callback, error_callback=None):
+        # Queue a job unless one with the same key is already pending
+        if key in self.pending:
+            return
+        future = self.executor.submit(job)
+        self.pending[key] = (future, callback, error_callback)
+        future.add_done_callback(lambda done: self.finished.put((key, done)))
+
+    def is_pending(self, key):
+        # Check whether a job is queued or running
+        return key in self.pending
+
+    def cancel(self, key):
+        # Cancel one job; a job that already started still runs but its result is dropped
+        entry = self.pending.pop(key, None)
+        if entry is not None:
+            entry[0].cancel()
+
+    def cancel_except(self, keep, prefix=None):
+        # Cancel pending jobs whose keys are not in keep (optionally only keys starting with prefix),
+        # so work for tiles that scrolled out of view never piles up
+        for key in list(self.pending):
+            if key in keep:
+                continue
+            if prefix is not None and key[:len(prefix)] != prefix:
+                continue
+            self.cancel(key)
+
+    def cancel_all(self):
+        # Cancel every pending job
+        for key in list(self.pending):
+            self.cancel(key)
+
+    def poll(self):
+        # Deliver finished jobs on the Tk thread, then schedule the next poll
+        while True:
+            try:
+                key, future = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            entry = self.pending.get(key)
+            if entry is None or entry[0] is not future:
+                continue  # Cancelled or superseded
+            del self.pending[key]
+            _, callback, error_callback = entry
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                if error_callback is not None:
+                    error_callback(key, error)
+                continue
+            callback(key, future.result())
+
+        if self.running:
+            self.root.after(self.poll_ms, self.poll)
+
+    def shutdown(self):
+        # Stop polling and drop queued work
+        self.running = False
+        self.cancel_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,271 @@
+# Tiled rendering helpers for the GeoTIFF viewer
+import tkinter as tk  # For canvas anchor constants
+from collections import OrderedDict  # For LRU ordering of cached tiles
+from PIL import Image  # For resampling tiles
+import numpy as np  # For the preview pixels
+import instrumentation as inst  # For timing spans and counters
+from frame_presenter import FramePresenter  # For reused PhotoImages and resampling buffers
+
+TILE_SIZE = 256  # Tile edge length in display pixels
+CACHE_LIMIT_BYTES = 128 * 1024 * 1024  # Memory cap for cached tiles (128 MB)
+PREVIEW_MAX_SIZE = 1024  # Longest edge of the low-resolution image used for previews
+
+
+def preview_size(size, max_size=PREVIEW_MAX_SIZE):
+    # Size of the preview image for a raster, keeping its aspect ratio
+    width, height = size
+    factor = min(1.0, max_size / max(width, height))
+    return max(1, int(width * factor)), max(1, int(height * factor))
+
+
+class PILImageSource:
+    # Tile source backed by a PIL image that is already in memory
+    def __init__(self, pil_image):
+        self.image = pil_image
+        self.size = pil_image.size
+        self.array = None  # Pixels as a NumPy array, made on the first pooled read
+
+    def read_region(self, box, size, resample=Image.Resampling.LANCZOS, presenter=None):
+        # Resample only the source box (in image pixels) to the requested output size, into one
+        # of the presenter's pooled tile buffers when a presenter is given
+        inst.count('pixels_resampled', size[0] * size[1])
+        with inst.span('resample'):
+            if presenter is not None and self.image.mode in ('L', 'RGB'):
+                if self.array is None:
+                    self.array = np.asarray(self.image)
+                return presenter.resample_tile(self.array, box, size, resample)
+            return self.image.resize(size, resample, box=box)
+
+
+class TileCache:
+    # LRU cache of resampled tiles keyed by (zoom, tile_x, tile_y) with a memory cap; on_evict is
+    # called with every tile that leaves the cache so its buffer can be reused
+    def __init__(self, max_bytes=CACHE_LIMIT_BYTES, on_evict=None):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.tiles = OrderedDict()
+        self.on_evict = on_evict
+
+    @staticmethod
+    def tile_bytes(tile):
+        # Approximate memory used by a PIL tile
+        width, height = tile.size
+        return width * height * len(tile.getbands())
+
+    def get(self, key):
+        # Return a cached tile and mark it as most recently used
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def put(self, key, tile):
+        # Store a tile and evict the least recently used ones above the memory cap
+        if key in self.tiles:
+            self.evicted(self.tiles.pop(key))
+        self.tiles[key] = tile
+        self.current_bytes += self.tile_bytes(tile)
+        while self.current_bytes > self.max_bytes and len(self.tiles) > 1:
+            _, old_tile = self.tiles.popitem(last=False)
+            self.evicted(old_tile)
+
+    def evicted(self, tile):
+        # Account for a tile that left the cache
+        self.current_bytes -= self.tile_bytes(tile)
+        if self.on_evict is not None:
+            self.on_evict(tile)
+
+    def clear(self):
+        # Drop every cached tile
+        for tile in self.tiles.values():
+            if self.on_evict is not None:
+                self.on_evict(tile)
+        self.tiles.clear()
+        self.current_bytes = 0
+
+
+class TiledRenderer:
+    # Draws only the tiles of the zoomed image that intersect the visible canvas
+    def __init__(self, canvas, source, tile_size=TILE_SIZE, cache=None, loader=None, presenter=None):
+        self.canvas = canvas
+        self.source = source  # Object with .size and .read_region(box, size)
+        self.loader = loader  # Optional TileLoader; tiles are made synchronously without one
+        self.tile_size = tile_size
+        self.cache = cache if cache is not None else TileCache()
+        self.scale = None  # Current display scale (None until first render)
+        self.origin_x = 0  # Canvas position of the image's top-left corner
+        self.origin_y = 0
+        self.drawn_tiles = {}  # Tile key -> (canvas item id, PhotoImage, is_preview)
+        self.wanted_tiles = set()  # Tile keys visible at the moment
+        self.preview_image = None  # Low-resolution copy of the whole image for quick previews
+        self.preview_array = None  # The same pixels as a NumPy array, resampled with OpenCV
+        self.presenter = presenter if presenter is not None else FramePresenter()
+        if self.cache.on_evict is None:
+            self.cache.on_evict = self.presenter.release_tile  # Evicted tiles give their buffers back
+
+    @staticmethod
+    def zoom_key(scale):
+        # Round the scale so tiles of the same zoom level share cache entries
+        return round(scale, 6)
+
+    def display_size(self, scale=None):
+        # Size of the whole image at the given (default: current) scale
+        scale = self.scale if scale is None else scale
+        img_width, img_height = self.source.size
+        return max(1, int(img_width * scale)), max(1, int(img_height * scale))
+
+    def visible_tiles(self):
+        # List the tile keys that intersect the visible part of the canvas
+        canvas_width = self.canvas.winfo_width()
+        canvas_height = self.canvas.winfo_height()
+        disp_width, disp_height = self.display_size()
+
+        # Visible region in display-image coordinates, clipped to the image
+        left = max(0, -self.origin_x)
+        top = max(0, -self.origin_y)
+        right = min(disp_width, canvas_width - self.origin_x)
+        bottom = min(disp_height, canvas_height - self.origin_y)
+        if right <= left or bottom <= top:
+            return []
+
+        zoom = self.zoom_key(self.scale)
+        size = self.tile_size
+        return [(zoom, tile_x, tile_y)
+                for tile_y in range(top // size, (bottom - 1) // size + 1)
+                for tile_x in range(left // size, (right - 1) // size + 1)]
+
+    def tile_bounds(self, key, scale=None):
+        # Display-image pixel bounds (x0, y0, x1, y1) of a tile
+        _, tile_x, tile_y = key
+        disp_width, disp_height = self.display_size(scale)
+        x0 = tile_x * self.tile_size
+        y0 = tile_y * self.tile_size
+        return x0, y0, min(x0 + self.tile_size, disp_width), min(y0 + self.tile_size, disp_height)
+
+    def make_tile(self, key, scale, source):
+        # Resample the source region covered by one tile into a pooled buffer (safe to call from
+        # worker threads, since the scale and source are passed in rather than read from self)
+        x0, y0, x1, y1 = self.tile_bounds(key, scale)
+        box = (x0 / scale, y0 / scale, x1 / scale, y1 / scale)
+        with inst.span('tile.make'):
+            return source.read_region(box, (x1 - x0, y1 - y0), presenter=self.presenter)
+
+    def set_preview(self, image):
+        # Attach the low-resolution preview image (a PIL image of the whole raster)
+        self.preview_image = image
+        self.preview_array = None if image is None else np.asarray(image)
+    
+    def make_preview_tile(self, key):
+        # Cheap nearest-neighbour stand-in for a tile, cut from the low-resolution preview image
+        # into a reused buffer (only valid until the next preview tile of the same size)
+        x0, y0, x1, y1 = self.tile_bounds(key)
+        factor_x = self.preview_image.size[0] / self.source.size[0] / self.scale
+        factor_y = self.preview_image.size[1] / self.source.size[1] / self.scale
+        box = (x0 * factor_x, y0 * factor_y, x1 * factor_x, y1 * factor_y)
+        return self.presenter.resample(self.preview_array, box, (x1 - x0, y1 - y0))
+
+    def request_tile(self, key):
+        # Ask the loader to make a tile in the background
+        scale, source = self.scale, self.source
+        self.loader.submit(('tile',) + key, lambda: self.make_tile(key, scale, source),
+                           self.on_tile_loaded)
+
+    def on_tile_loaded(self, job_key, tile):
+        # Cache a finished tile and draw it if it is still wanted (runs on the Tk thread)
+        key = job_key[1:]
+        self.cache.put(key, tile)
+        drawn = self.drawn_tiles.get(key)
+        if key in self.wanted_tiles and (drawn is None or drawn[2]):
+            self.draw_tile(key, tile)
+            self.canvas.tag_lower('tile')
+
+    def draw_tile(self, key, tile, is_preview=False):
+        # Place a tile on the canvas at its current position, replacing any preview of it
+        if key in self.drawn_tiles:
+            self.remove_tile(key)
+        x0, y0, _, _ = self.tile_bounds(key)
+        with inst.span('photoimage', preview=is_preview):
+            photo = self.presenter.photo_for(tile)
+        with inst.span('canvas.draw'):
+            item = self.canvas.create_image(self.origin_x + x0, self.origin_y + y0,
+                                            anchor=tk.NW, image=photo, tags='tile')
+        self.drawn_tiles[key] = (item, photo, is_preview)
+        inst.count('tiles_drawn')
+    
+    def remove_tile(self, key):
+        # Delete a drawn tile and give its PhotoImage back for reuse
+        item, photo, _ = self.drawn_tiles.pop(key)
+        self.canvas.delete(item)
+        self.presenter.release(photo)
+
+    def update_visible(self, preview=False):
+        # Remove tiles that left the view and draw the ones that entered it; in preview mode
+        # missing tiles are stood in for from the preview image and nothing new is resampled
+        visible = self.visible_tiles()
+        self.wanted_tiles = set(visible)
+        for key in list(self.drawn_tiles):
+            if key not in self.wanted_tiles:
+                self.remove_tile(key)
+
+        # Drop background work for tiles that scrolled out of view
+        if self.loader is not None:
+            self.loader.cancel_except({('tile',) + key for key in visible}, prefix=('tile',))
+
+        for key in visible:
+            drawn = self.drawn_tiles.get(key)
+            if drawn is not None and (preview or not drawn[2]):
+                continue
+            tile = self.cache.get(key)
+            if tile is not None:
+                self.draw_tile(key, tile)
+            elif preview and self.preview_image is not None:
+                if drawn is None:
+                    self.draw_tile(key, self.make_preview_tile(key), is_preview=True)
+            elif self.loader is not None:
+                self.request_tile(key)
+            else:
+                tile = self.make_tile(key, self.scale, self.source)
+                self.cache.put(key, tile)
+                self.draw_tile(key, tile)
+
+        # Keep tiles below markers and other overlays
+        self.canvas.tag_lower('tile')
+
+    def render(self, scale, origin_x, origin_y, preview=False):
+        # Draw the image at the given scale with its top-left corner at (origin_x, origin_y)
+        if self.scale is None or self.zoom_key(scale) != self.zoom_key(self.scale):
+            # Zoom changed, so none of the drawn tiles can be reused
+            self.remove_drawn_tiles()
+        else:
+            # Same zoom level, just shift the existing tiles
+            self.canvas.move('tile', origin_x - self.origin_x, origin_y - self.origin_y)
+        self.scale = scale
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.update_visible(preview)
+        self.presenter.end_frame()
+
+    def pan(self, dx, dy, preview=False):
+        # Move the tiles already on the canvas and fill in newly exposed ones
+        self.canvas.move('tile', dx, dy)
+        self.origin_x += dx
+        self.origin_y += dy
+        self.update_visible(preview)
+        self.presenter.end_frame()
+
+    def remove_drawn_tiles(self):
+        # Delete all tile items from the canvas (cached tiles are kept)
+        self.canvas.delete('tile')
+        for _, photo, _ in self.drawn_tiles.values():
+            self.presenter.release(photo)
+        self.drawn_tiles.clear()
+
+    def clear(self):
+        # Forget everything, used when a new image or display setting is loaded
+        if self.loader is not None:
+            self.loader.cancel_except(set(), prefix=('tile',))
+        self.remove_drawn_tiles()
+        self.wanted_tiles = set()
+        self.cache.clear()
+        self.set_preview(None)
+        self.scale = None
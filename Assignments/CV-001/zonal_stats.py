@@ -0,0 +1,425 @@
+# Zonal statistics (count, mean, std, min, max, histogram) of GeoTIFF bands inside polygons and
+# around points, for many rasters at once
+#
+# Example:
+#   python zonal_stats.py fields.geojson scenes/ -o zonal.csv --bins 32 --histograms hist.json --workers 8
+#
+# Zone coordinates are WGS84 longitude/latitude as in GeoJSON (or the raster's own coordinates when
+# it has no projection). Each zone reads only the raster blocks its mask actually covers. With
+# --cache the results are kept per (raster file, zone geometry, options), so a repeated query never
+# reopens the raster.
+import argparse  # For the command-line interface
+import csv  # For writing the statistics table
+import glob  # For finding input files
+import hashlib  # For cache keys
+import json  # For the cache and histogram files
+import math  # For rounding window bounds
+import os  # For file operations
+import time  # For timing the run
+from concurrent.futures import ProcessPoolExecutor, as_completed  # For parallel zones
+import numpy as np  # For array operations
+from osgeo import gdal  # GDAL library for GeoTIFF handling
+from geotransform import GeoTransform  # For lon/lat -> pixel conversion
+from normalization import BLOCK_PIXELS, band_stats  # For block grouping and histogram ranges
+from point_io import load_zones_geojson  # For reading zones from GeoJSON
+import instrumentation as inst  # For timing spans and counters
+
+DEFAULT_BINS = 32  # Histogram bins per band
+ZONES_PER_TASK = 16  # Zones per worker task; each task opens the raster once
+
+
+def parse_band_list(text):
+    # Band numbers from a comma-separated list such as 1 or 4,3,2,1
+    try:
+        bands = [int(part) for part in text.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError(f"Bands must be comma-separated numbers, not {text!r}")
+    if not bands or min(bands) < 1:
+        raise ValueError(f"Band numbers start at 1, got {text!r}")
+    return bands
+
+
+def raster_key(path):
+    # Identity of a raster file that changes whenever the file is rewritten
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def zone_key(zone):
+    # Hash of a zone's geometry, so renamed zones with the same shape share cached results
+    digest = hashlib.sha1()
+    for rings in zone.get('polygons', []):
+        for ring in rings:
+            digest.update(np.ascontiguousarray(ring, dtype=np.float64).tobytes())
+            digest.update(b'|')
+        digest.update(b'#')
+    if 'points' in zone:
+        digest.update(b'points')
+        digest.update(np.ascontiguousarray(zone['points'], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def cache_key(raster, zone_hash, options):
+    # Key of one (raster, zone) result under the given bands/bins/range/radius
+    settings = json.dumps({name: options[name] for name in ('bands', 'bins', 'value_range', 'point_radius')},
+                          sort_keys=True)
+    return hashlib.sha1(f"{raster}|{zone_hash}|{settings}".encode('utf-8')).hexdigest()
+
+
+class ZoneCache:
+    # Zonal results stored in one JSON file and kept in memory between queries
+    def __init__(self, path=None):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.results = json.load(f)
+
+    def get(self, key):
+        # Cached result or None
+        return self.results.get(key)
+
+    def put(self, key, result):
+        # Remember one result (written to disk by save)
+        self.results[key] = result
+
+    def save(self):
+        # Write the cache atomically so an interrupted run never leaves a broken file
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.results, f)
+        os.replace(temp_path, self.path)
+
+
+def polygon_mask(rings, xoff, yoff, width, height):
+    # Window pixels whose centres lie inside the rings (even-odd rule, so holes are left out).
+    # Every edge/row crossing is found at once, turned into a parity toggle at the first pixel
+    # right of the crossing, and a cumulative sum along each row fills the spans between them.
+    starts = np.concatenate(rings)
+    ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in rings])
+    x0, y0 = starts[:, 0] - xoff, starts[:, 1] - yoff
+    x1, y1 = ends[:, 0] - xoff, ends[:, 1] - yoff
+
+    # Only edges reaching into the window's rows can cross a row centre
+    near = (np.maximum(y0, y1) >= 0) & (np.minimum(y0, y1) <= height)
+    x0, y0, x1, y1 = x0[near], y0[near], x1[near], y1[near]
+    centres = np.arange(height) + 0.5
+    rows, edges = np.nonzero((y0 <= centres[:, None]) != (y1 <= centres[:, None]))
+    crossing_x = x0[edges] + (centres[rows] - y0[edges]) * (x1[edges] - x0[edges]) / (y1[edges] - y0[edges])
+
+    # First pixel whose centre (col + 0.5) is right of the crossing
+    cols = np.clip(np.floor(crossing_x - 0.5).astype(np.int64) + 1, 0, width)
+    toggles = np.bincount(rows * (width + 1) + cols, minlength=height * (width + 1)).reshape(height, width + 1)
+    return (np.cumsum(toggles[:, :width], axis=1) & 1).astype(bool)
+
+
+def zone_mask(polygons, xoff, yoff, width, height):
+    # Union of the masks of every polygon of a (Multi)Polygon zone
+    mask = None
+    for rings in polygons:
+        if not rings:
+            continue
+        part = polygon_mask(rings, xoff, yoff, width, height)
+        mask = part if mask is None else mask | part
+    return mask if mask is not None else np.zeros((height, width), dtype=bool)
+
+
+def polygon_window(polygons, raster_width, raster_height):
+    # Integer pixel window (x0, y0, x1, y1) covering the polygons, clipped to the raster (None if outside)
+    vertices = np.concatenate([ring for rings in polygons for ring in rings])
+    x0 = max(0, int(math.floor(vertices[:, 0].min())))
+    y0 = max(0, int(math.floor(vertices[:, 1].min())))
+    x1 = min(raster_width, int(math.ceil(vertices[:, 0].max())))
+    y1 = min(raster_height, int(math.ceil(vertices[:, 1].max())))
+    return (x0, y0, x1, y1) if x1 > x0 and y1 > y0 else None
+
+
+def block_windows(band, window):
+    # Block-aligned pieces of a window: one piece per tile of a tiled file, or groups of block
+    # rows for a striped file (like normalization.iter_blocks) so it is not read one scanline at a time
+    block_x, block_y = band.GetBlockSize()
+    x0, y0, x1, y1 = window
+    rows = block_y
+    if block_x >= band.XSize:
+        block_x = band.XSize
+        rows = max(block_y, (BLOCK_PIXELS // max(1, x1 - x0)) // block_y * block_y)
+    for top in range(y0 // block_y * block_y, y1, rows):
+        for left in range(x0 // block_x * block_x, x1, block_x):
+            xoff, yoff = max(left, x0), max(top, y0)
+            yield xoff, yoff, min(left + block_x, x1) - xoff, min(top + rows, y1) - yoff
+
+
+def to_pixels(transform, zone):
+    # Copy of a zone with its coordinates converted to pixel/line in one vectorized transform
+    if 'points' in zone:
+        pixel_x, pixel_y = transform.wgs84_to_pixel(zone['points'][:, 0], zone['points'][:, 1])
+        return {'id': zone['id'], 'points': np.column_stack([pixel_x, pixel_y])}
+    rings = [ring for rings in zone['polygons'] for ring in rings]
+    if not rings:
+        return {'id': zone['id'], 'polygons': []}
+    vertices = np.concatenate(rings)
+    pixel_x, pixel_y = transform.wgs84_to_pixel(vertices[:, 0], vertices[:, 1])
+    pixels = np.column_stack([pixel_x, pixel_y])
+
+    # Split the converted vertices back into the original polygons and rings
+    polygons, start = [], 0
+    for rings in zone['polygons']:
+        converted = []
+        for ring in rings:
+            converted.append(pixels[start:start + len(ring)])
+            start += len(ring)
+        polygons.append(converted)
+    return {'id': zone['id'], 'polygons': polygons}
+
+
+class BandAccumulator:
+    # Running count/sum/sum of squares/min/max/histogram of one band's values inside a zone
+    def __init__(self, value_range, bins, nodata):
+        self.lo, self.hi = value_range
+        self.bins = bins
+        self.nodata = nodata
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.hist = np.zeros(bins, dtype=np.int64)
+
+    def add(self, values):
+        # Add the zone's pixels of one block, skipping nodata and NaN
+        if self.nodata is not None:
+            values = values[values != self.nodata]
+        if values.dtype.kind == 'f':
+            values = values[~np.isnan(values)]
+        if not values.size:
+            return
+        values = values.astype(np.float64, copy=False)
+        self.count += values.size
+        self.total += float(values.sum())
+        self.total_squares += float(np.dot(values, values))
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+
+        # Values beyond the (possibly approximate) range are counted in the end bins
+        scaled = (values - self.lo) * (self.bins / (self.hi - self.lo)) if self.hi > self.lo else np.zeros(values.size)
+        np.clip(scaled, 0, self.bins - 1, out=scaled)
+        self.hist += np.bincount(scaled.astype(np.int64), minlength=self.bins)
+
+    def result(self):
+        # JSON-friendly statistics (mean/std/min/max are None for an empty zone)
+        empty = self.count == 0
+        mean = None if empty else self.total / self.count
+        std = None if empty else math.sqrt(max(0.0, self.total_squares / self.count - mean * mean))
+        return {'count': self.count, 'mean': mean, 'std': std,
+                'min': None if empty else self.minimum, 'max': None if empty else self.maximum,
+                'range': [self.lo, self.hi], 'histogram': self.hist.tolist()}
+
+
+def histogram_range(band, value_range=None):
+    # Histogram range of a band: the given one, the full byte range, or the band's min/max
+    if value_range is not None:
+        return tuple(value_range)
+    if band.DataType == gdal.GDT_Byte:
+        return 0.0, 256.0
+    lo, hi = band_stats(band, 'minmax')
+    return lo, hi
+
+
+def polygon_zone_stats(bands, accumulators, zone):
+    # Accumulate the pixels of a polygon zone, reading only blocks its mask touches
+    window = polygon_window(zone['polygons'], bands[0].XSize, bands[0].YSize) if zone['polygons'] else None
+    if window is None:
+        return
+    for xoff, yoff, xsize, ysize in block_windows(bands[0], window):
+        with inst.span('zonal.mask'):
+            mask = zone_mask(zone['polygons'], xoff, yoff, xsize, ysize)
+        if not mask.any():
+            inst.count('zonal.blocks_skipped')
+            continue
+        for band, accumulator in zip(bands, accumulators):
+            with inst.span('zonal.read'):
+                block = band.ReadAsArray(xoff, yoff, xsize, ysize)
+            inst.count('bytes_read', block.nbytes)
+            accumulator.add(block[mask])
+        inst.count('zonal.blocks_read')
+
+
+def point_zone_stats(bands, accumulators, zone, radius):
+    # Accumulate the (2 * radius + 1)^2 pixels around every point of a point zone
+    width, height = bands[0].XSize, bands[0].YSize
+    for pixel_x, pixel_y in zone['points']:
+        col, row = int(math.floor(pixel_x)), int(math.floor(pixel_y))
+        x0, y0 = max(0, col - radius), max(0, row - radius)
+        x1, y1 = min(width, col + radius + 1), min(height, row + radius + 1)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        for band, accumulator in zip(bands, accumulators):
+            accumulator.add(band.ReadAsArray(x0, y0, x1 - x0, y1 - y0).ravel())
+
+
+def stats_for_zones(path, zones, options):
+    # Worker task: statistics of several zones on one raster, opening it once
+    gdal.UseExceptions()
+    dataset = gdal.Open(path, gdal.GA_ReadOnly)
+    band_indices = options['bands'] or list(range(1, dataset.RasterCount + 1))
+    if max(band_indices) > dataset.RasterCount:
+        raise ValueError(f"Band {max(band_indices)} requested but the raster has {dataset.RasterCount}")
+    bands = [dataset.GetRasterBand(index) for index in band_indices]
+    ranges = [histogram_range(band, options['value_range']) for band in bands]
+    transform = GeoTransform.from_dataset(dataset)
+    results = []
+    for zone in zones:
+        accumulators = [BandAccumulator(value_range, options['bins'], band.GetNoDataValue())
+                        for band, value_range in zip(bands, ranges)]
+        pixel_zone = to_pixels(transform, zone)
+        with inst.span('zonal.zone', zone=zone['id']):
+            if 'points' in pixel_zone:
+                point_zone_stats(bands, accumulators, pixel_zone, options['point_radius'])
+            else:
+                polygon_zone_stats(bands, accumulators, pixel_zone)
+        results.append({str(index): accumulator.result() for index, accumulator in zip(band_indices, accumulators)})
+    return results
+
+
+def zonal_stats(paths, zones, bands=None, bins=DEFAULT_BINS, value_range=None, point_radius=0,
+                workers=None, cache=None):
+    # Statistics of every zone on every raster as ({(path, zone index): {band: stats}}, {path: error},
+    # number of zones computed rather than read from the cache). Zones are keyed by position, so zones sharing an id stay apart. Cached pairs are answered at
+    # once; the rest are split into per-raster chunks of zones run across a process pool. A raster
+    # that fails (missing file, bad band, non-invertible geotransform) is reported in the errors
+    # and the other rasters still complete.
+    options = {'bands': list(bands) if bands else None, 'bins': bins,
+               'value_range': list(value_range) if value_range else None, 'point_radius': point_radius}
+    results = {}
+    errors = {}
+    computed = {}
+    tasks = []
+    zone_hashes = [zone_key(zone) for zone in zones]
+    for path in paths:
+        try:
+            raster = raster_key(path)
+        except OSError as e:
+            errors[path] = str(e)
+            continue
+        missing = []
+        for index, (zone, zone_hash) in enumerate(zip(zones, zone_hashes)):
+            key = cache_key(raster, zone_hash, options)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                results[(path, index)] = cached
+                inst.count('zonal.cache_hits')
+            else:
+                missing.append((key, index))
+        for start in range(0, len(missing), ZONES_PER_TASK):
+            tasks.append((path, missing[start:start + ZONES_PER_TASK]))
+
+    def store(path, chunk, run):
+        # Record one task's results in the output and the cache, or the raster's error
+        try:
+            chunk_results = run()
+        except Exception as e:
+            errors.setdefault(path, str(e))
+            return
+        computed[path] = computed.get(path, 0) + len(chunk)
+        for (key, index), result in zip(chunk, chunk_results):
+            results[(path, index)] = result
+            if cache is not None:
+                cache.put(key, result)
+
+    if workers == 1 or len(tasks) == 1:
+        for path, chunk in tasks:
+            store(path, chunk, lambda: stats_for_zones(path, [zones[index] for _, index in chunk], options))
+    elif tasks:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(stats_for_zones, path, [zones[index] for _, index in chunk], options):
+                       (path, chunk) for path, chunk in tasks}
+            for future in as_completed(futures):
+                store(*futures[future], future.result)
+    for path in errors:
+        for index in range(len(zones)):
+            results.pop((path, index), None)  # Drop partial results of a failed raster
+    if cache is not None and tasks:
+        cache.save()
+    return results, errors, sum(count for path, count in computed.items() if path not in errors)
+
+
+def find_rasters(inputs, pattern='*.tif*'):
+    # GeoTIFF files from file and directory arguments, sorted for reproducible output
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(glob.glob(os.path.join(item, pattern)))
+        else:
+            paths.append(item)
+    return sorted(set(paths))
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Zonal statistics of GeoTIFF bands inside GeoJSON zones")
+    parser.add_argument('zones', help="GeoJSON file of Polygon/MultiPolygon/Point/MultiPoint features")
+    parser.add_argument('rasters', nargs='+', help="GeoTIFF files or directories")
+    parser.add_argument('-o', '--output', default='zonal_stats.csv', help="CSV file of statistics")
+    parser.add_argument('--histograms', help="Also write the histograms to this JSON file")
+    parser.add_argument('--pattern', default='*.tif*', help="Glob pattern for files in directories")
+    parser.add_argument('--id-property', help="Feature property used as the zone id")
+    parser.add_argument('--bands', default='', help="Bands such as 1 or 4,3,2 (default: all)")
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS, help="Histogram bins per band")
+    parser.add_argument('--range', type=float, nargs=2, metavar=('LO', 'HI'),
+                        help="Histogram range shared by all rasters (default: byte range or band min/max)")
+    parser.add_argument('--point-radius', type=int, default=0, help="Pixels around each point (0: one pixel)")
+    parser.add_argument('--cache', help="Keep computed zones in this JSON file (default: no cache)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Compute statistics for every zone on every raster and write them as CSV (and JSON histograms)
+    args = parse_args(argv)
+    zones = load_zones_geojson(args.zones, args.id_property)
+    paths = find_rasters(args.rasters, args.pattern)
+    if not zones or not paths:
+        print("No zones or no rasters to process")
+        return 1
+
+    try:
+        bands = parse_band_list(args.bands) if args.bands else None
+    except ValueError as e:
+        print(e)
+        return 1
+    cache = ZoneCache(args.cache) if args.cache else None
+
+    start = time.perf_counter()
+    results, errors, computed = zonal_stats(paths, zones, bands, args.bins, args.range, args.point_radius,
+                                              args.workers, cache)
+    elapsed = time.perf_counter() - start
+    for path, error in sorted(errors.items()):
+        print(f"{path}: ERROR: {error}")
+    done = [path for path in paths if path not in errors]
+
+    # One row per (raster, zone, band), in input order
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['file', 'zone', 'band', 'count', 'mean', 'std', 'min', 'max'])
+        for path in done:
+            for index, zone in enumerate(zones):
+                for band, stats in results[(path, index)].items():
+                    writer.writerow([path, zone['id'], band, stats['count'], stats['mean'], stats['std'],
+                                     stats['min'], stats['max']])
+    if args.histograms:
+        histograms = {path: [{'zone': zone['id'], 'bands': results[(path, index)]}
+                             for index, zone in enumerate(zones)] for path in done}
+        with open(args.histograms, 'w') as f:
+            json.dump(histograms, f)
+
+    print(f"{len(zones)} zones x {len(done)} rasters ({len(errors)} failed): {computed} computed, "
+          f"{len(results) - computed} cached, {elapsed:.2f} s; wrote {args.output}")
+    return 1 if errors else 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
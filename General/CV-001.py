@@ -1,6 +1,7 @@
-from PIL import Image, ImageFilter, ImageOps
+from PIL import Image
 import numpy as np
 import matplotlib.pyplot as plt
+from image_pipeline import Pipeline  # Single-pass operation pipeline with reused buffers
 
 # Load the image
 image = Image.open(r"D:\7th\CV\Github\Computer-Vision\General\Elements\fast.jpeg")
@@ -8,23 +9,20 @@ image = Image.open(r"D:\7th\CV\Github\Computer-Vision\General\Elements\fast.jpeg
 # Convert to numpy array for manipulation
 image_array = np.array(image)
 
-# Create manipulated image (invert colors)
-manipulated_image_array = 255 - image_array
-
-# Convert back to PIL Image
-manipulated_image = Image.fromarray(manipulated_image_array)
-
-# Create rotated image
-rotated_image = image.rotate(90)
-
-# Create resized image
-resized_image = image.resize((image.width // 2, image.height // 2))
-
-# Create blurred image
-blurred_image = image.filter(ImageFilter.GaussianBlur(radius=2))
-
-# Create contour image
-contour_image = ImageOps.invert(image.filter(ImageFilter.CONTOUR))
+# All manipulations in one pipeline; each reads the original image and writes into its own reused buffer
+pipeline = Pipeline([
+    {'op': 'invert', 'name': 'manipulated'},
+    {'op': 'rotate', 'angle': 90, 'input': 'source', 'name': 'rotated'},
+    {'op': 'resize', 'size': (image.width // 2, image.height // 2), 'input': 'source', 'name': 'resized'},
+    {'op': 'blur', 'radius': 2, 'input': 'source', 'name': 'blurred'},
+    {'op': 'contour', 'input': 'source', 'name': 'contour'},
+])
+results = pipeline.run(image_array)
+manipulated_image = results['manipulated']
+rotated_image = results['rotated']
+resized_image = results['resized']
+blurred_image = results['blurred']
+contour_image = results['contour']
 
 # Create subplot figure
 fig, axes = plt.subplots(2, 3, figsize=(10, 10))
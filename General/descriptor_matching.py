@@ -0,0 +1,312 @@
+# Descriptor matching: exact brute force and an approximate IVF-PQ index, both in NumPy
+#
+# Example:
+#   python descriptor_matching.py --store features/ --queries 5000 --lists 256 --probes 1 4 16
+#
+# The IVF-PQ index (inverted file with product quantization) clusters the database into coarse
+# lists, stores each descriptor as a few bytes of sub-vector codes, and only scans the lists
+# closest to each query. Candidates can be re-ranked with exact distances before the ratio test.
+import argparse  # For the command-line interface
+import os  # For file operations
+import time  # For the recall-vs-speed report
+import numpy as np  # For array operations
+from sift_features import FeatureStore  # For loading stored descriptors
+
+QUERY_CHUNK = 1024  # Queries per block in the brute-force matcher
+RATIO = 0.75  # Lowe's ratio test threshold
+KMEANS_ITERATIONS = 15
+MAX_TRAINING_POINTS = 50000  # k-means training sample size for the coarse lists
+MAX_CODEBOOK_POINTS = 16384  # Smaller sample for the 256-entry sub-vector codebooks
+
+
+def squared_distances(queries, database, database_norms=None):
+    # Squared L2 distance of every query to every database vector, in float32
+    queries = queries.astype(np.float32, copy=False)
+    database = database.astype(np.float32, copy=False)
+    if database_norms is None:
+        database_norms = np.einsum('ij,ij->i', database, database)
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+    dist = query_norms[:, None] - 2 * (queries @ database.T) + database_norms[None, :]
+    return np.maximum(dist, 0, out=dist)
+
+
+def top_k(dist, k):
+    # Indices and values of the k smallest entries of every row, sorted
+    k = min(k, dist.shape[1])
+    idx = np.argpartition(dist, k - 1, axis=1)[:, :k] if k < dist.shape[1] else np.argsort(dist, axis=1)
+    part = np.take_along_axis(dist, idx, axis=1)
+    order = np.argsort(part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+def brute_force_knn(queries, database, k=2):
+    # Exact k nearest neighbours (L2 distances and indices), computed in blocks of queries
+    database = database.astype(np.float32, copy=False)
+    norms = np.einsum('ij,ij->i', database, database)
+    distances = np.empty((len(queries), min(k, len(database))), dtype=np.float32)
+    indices = np.empty(distances.shape, dtype=np.int64)
+    for start in range(0, len(queries), QUERY_CHUNK):
+        block = squared_distances(queries[start:start + QUERY_CHUNK], database, norms)
+        dist, idx = top_k(block, k)
+        distances[start:start + len(block)] = np.sqrt(dist)
+        indices[start:start + len(block)] = idx
+    return distances, indices
+
+
+def ratio_test(distances, ratio=RATIO):
+    # Queries whose nearest neighbour is clearly closer than the second one
+    if distances.shape[1] < 2:
+        return np.ones(len(distances), dtype=bool)
+    return distances[:, 0] < ratio * distances[:, 1]
+
+
+def mutual_filter(forward, backward):
+    # Keep pairs (i, j) where j's best match in the other direction is i
+    i, j = forward[:, 0], forward[:, 1]
+    back = np.full(max(int(backward[:, 0].max(initial=-1)) + 1, 1), -1, dtype=np.int64)
+    back[backward[:, 0]] = backward[:, 1]
+    keep = np.zeros(len(forward), dtype=bool)
+    known = j < len(back)
+    keep[known] = back[j[known]] == i[known]
+    return forward[keep]
+
+
+def kmeans(data, k, rng, iterations=KMEANS_ITERATIONS):
+    # Lloyd's k-means; empty clusters are re-seeded with random points
+    data = data.astype(np.float32, copy=False)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.concatenate([np.argmin(squared_distances(data[s:s + QUERY_CHUNK], centroids), axis=1)
+                                 for s in range(0, len(data), QUERY_CHUNK)])
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.add.reduceat(data[order], starts[filled], axis=0)
+        centroids[filled] = sums / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+class IVFPQIndex:
+    # Approximate nearest-neighbour index: coarse k-means lists + product-quantized residuals
+    def __init__(self, n_lists=256, n_subvectors=16, n_centroids=256, n_probe=8, rerank=32,
+                 keep_vectors=True, seed=0):
+        self.n_lists = n_lists
+        self.n_subvectors = n_subvectors  # Each descriptor is stored as this many uint8 codes
+        self.n_centroids = min(n_centroids, 256)
+        self.n_probe = n_probe  # Lists scanned per query
+        self.rerank = rerank  # Candidates re-ranked with exact distances (0: PQ distances only)
+        self.keep_vectors = keep_vectors
+        self.rng = np.random.default_rng(seed)
+        self.coarse = None
+        self.codebooks = None
+        self.list_ids = []
+        self.list_codes = []
+        self.list_norms = []
+        self.vectors = None
+
+    def residuals(self, data, labels):
+        # Descriptors relative to their coarse centroid
+        return data.astype(np.float32) - self.coarse[labels]
+
+    def assign(self, data):
+        # Nearest coarse list of every vector
+        return np.concatenate([np.argmin(squared_distances(data[s:s + QUERY_CHUNK], self.coarse), axis=1)
+                               for s in range(0, len(data), QUERY_CHUNK)])
+
+    def train(self, data):
+        # Learn the coarse lists and the sub-vector codebooks from a sample of the data
+        dim = data.shape[1]
+        if dim % self.n_subvectors:
+            raise ValueError("Descriptor length must be divisible by n_subvectors")
+        sample = data[self.rng.choice(len(data), min(len(data), MAX_TRAINING_POINTS), replace=False)]
+        sample = sample.astype(np.float32)
+        self.coarse = kmeans(sample, self.n_lists, self.rng)
+        self.n_lists = len(self.coarse)
+        sample = sample[:MAX_CODEBOOK_POINTS]  # Already shuffled
+        residual = self.residuals(sample, self.assign(sample))
+        sub_dim = dim // self.n_subvectors
+        self.codebooks = np.stack([
+            kmeans(residual[:, j * sub_dim:(j + 1) * sub_dim], self.n_centroids, self.rng)
+            for j in range(self.n_subvectors)])
+        return self
+
+    def encode(self, residual):
+        # uint8 code of every sub-vector
+        sub_dim = residual.shape[1] // self.n_subvectors
+        codes = np.empty((len(residual), self.n_subvectors), dtype=np.uint8)
+        for j in range(self.n_subvectors):
+            part = residual[:, j * sub_dim:(j + 1) * sub_dim]
+            codes[:, j] = np.argmin(squared_distances(part, self.codebooks[j]), axis=1)
+        return codes
+
+    def decode(self, list_index):
+        # Approximate vectors of one list rebuilt from their codes
+        codes = self.list_codes[list_index]
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.n_subvectors)]
+        return np.concatenate(parts, axis=1) + self.coarse[list_index]
+
+    def add(self, data):
+        # Encode and store the database vectors, grouped by coarse list
+        labels = self.assign(data)
+        codes = self.encode(self.residuals(data, labels))
+        order = np.argsort(labels, kind='stable')
+        bounds = np.searchsorted(labels[order], np.arange(self.n_lists + 1))
+        self.list_ids = [order[bounds[i]:bounds[i + 1]] for i in range(self.n_lists)]
+        self.list_codes = [codes[ids] for ids in self.list_ids]
+        self.list_norms = [np.einsum('ij,ij->i', decoded, decoded)
+                           for decoded in map(self.decode, range(self.n_lists))]
+        if self.keep_vectors:
+            self.vectors = data
+        return self
+
+    def search(self, queries, k=2, n_probe=None):
+        # Approximate k nearest neighbours of a batch of queries: (L2 distances, indices), -1 if missing
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        queries = queries.astype(np.float32, copy=False)
+        n_queries = len(queries)
+        probes = top_k(squared_distances(queries, self.coarse), n_probe)[1]
+
+        # Scan list by list, handling every query that probes the list at once. Codes are decoded
+        # per list so the distances are one matrix product instead of per-code lookups.
+        shortlist = max(k, self.rerank if self.vectors is not None else k)
+        flat_lists = probes.ravel()
+        flat_queries = np.repeat(np.arange(n_queries), probes.shape[1])
+        order = np.argsort(flat_lists, kind='stable')
+        flat_lists, flat_queries = flat_lists[order], flat_queries[order]
+        bounds = np.searchsorted(flat_lists, np.arange(self.n_lists + 1))
+        cand_query, cand_dist, cand_id = [], [], []
+        for list_index in range(self.n_lists):
+            ids = self.list_ids[list_index]
+            q = flat_queries[bounds[list_index]:bounds[list_index + 1]]
+            if len(ids) == 0 or len(q) == 0:
+                continue
+            decoded = self.decode(list_index)
+            best_dist, best = top_k(squared_distances(queries[q], decoded, self.list_norms[list_index]), shortlist)
+            cand_query.append(np.repeat(q, best.shape[1]))
+            cand_dist.append(best_dist.ravel())
+            cand_id.append(ids[best].ravel())
+
+        distances = np.full((n_queries, k), np.inf, dtype=np.float32)
+        indices = np.full((n_queries, k), -1, dtype=np.int64)
+        if not cand_query:
+            return distances, indices
+        cand_query = np.concatenate(cand_query)
+        cand_dist = np.concatenate(cand_dist)
+        cand_id = np.concatenate(cand_id)
+
+        # Keep the best `shortlist` candidates per query across all probed lists
+        order = np.lexsort((cand_dist, cand_query))
+        cand_query, cand_dist, cand_id = cand_query[order], cand_dist[order], cand_id[order]
+        starts = np.searchsorted(cand_query, np.arange(n_queries))
+        rank = np.arange(len(cand_query)) - starts[cand_query]
+        keep = rank < shortlist
+        cand_query, cand_dist, cand_id, rank = cand_query[keep], cand_dist[keep], cand_id[keep], rank[keep]
+
+        if self.vectors is not None and self.rerank:
+            # Exact distances for the shortlist, then sort again
+            diff = queries[cand_query] - np.asarray(self.vectors[cand_id], dtype=np.float32)
+            cand_dist = np.einsum('ij,ij->i', diff, diff)
+            order = np.lexsort((cand_dist, cand_query))
+            cand_query, cand_dist, cand_id = cand_query[order], cand_dist[order], cand_id[order]
+            starts = np.searchsorted(cand_query, np.arange(n_queries))
+            rank = np.arange(len(cand_query)) - starts[cand_query]
+
+        keep = rank < k
+        distances[cand_query[keep], rank[keep]] = np.sqrt(np.maximum(cand_dist[keep], 0))
+        indices[cand_query[keep], rank[keep]] = cand_id[keep]
+        return distances, indices
+
+
+def match_descriptors(desc_a, desc_b, index_b=None, index_a=None, ratio=RATIO, mutual=True):
+    # Matches (i in a, j in b) passing the ratio test (and mutual consistency); exact if no index is given
+    search_b = index_b.search if index_b is not None else (lambda q, k: brute_force_knn(q, desc_b, k))
+    distances, indices = search_b(desc_a, 2)
+    good = ratio_test(distances, ratio) & (indices[:, 0] >= 0)
+    forward = np.stack([np.flatnonzero(good), indices[good, 0]], axis=1)
+    if not mutual or len(forward) == 0:
+        return forward
+
+    search_a = index_a.search if index_a is not None else (lambda q, k: brute_force_knn(q, desc_a, k))
+    # Only the matched b descriptors need a reverse lookup
+    targets = np.unique(forward[:, 1])
+    _, reverse = search_a(desc_b[targets], 1)
+    backward = np.stack([targets, reverse[:, 0]], axis=1)
+    return mutual_filter(forward, backward)
+
+
+def recall_report(database, queries, index, probes, k=2, ratio=RATIO):
+    # Recall@1 and ratio-test agreement of the index against brute force, for several n_probe values
+    start = time.perf_counter()
+    exact_dist, exact_idx = brute_force_knn(queries, database, k)
+    exact_seconds = time.perf_counter() - start
+    exact_good = ratio_test(exact_dist, ratio)
+    rows = [{'method': 'brute force', 'n_probe': None, 'seconds': exact_seconds,
+             'queries_per_s': len(queries) / exact_seconds, 'recall_at_1': 1.0, 'match_recall': 1.0}]
+    for n_probe in probes:
+        start = time.perf_counter()
+        dist, idx = index.search(queries, k, n_probe=n_probe)
+        seconds = time.perf_counter() - start
+        good = ratio_test(dist, ratio)
+        same = idx[:, 0] == exact_idx[:, 0]
+        rows.append({'method': 'ivf-pq', 'n_probe': n_probe, 'seconds': seconds,
+                     'queries_per_s': len(queries) / seconds,
+                     'recall_at_1': float(np.mean(same)),
+                     'match_recall': float(np.sum(good & exact_good & same) / max(1, np.sum(exact_good)))})
+    return rows
+
+
+def load_store_descriptors(store_root):
+    # All descriptors in a feature store stacked into one array, plus the image of every row
+    store = FeatureStore(store_root)
+    keys = sorted({record['key'] for record in store.index.values()})
+    blocks = [np.asarray(store.load(key)['descriptors']) for key in keys]
+    image_ids = np.concatenate([np.full(len(block), i) for i, block in enumerate(blocks)])
+    return np.concatenate(blocks), image_ids, keys
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Report recall vs speed of approximate SIFT matching")
+    parser.add_argument('--store', default='features', help="Feature store built by sift_features.py")
+    parser.add_argument('--queries', type=int, default=2000, help="Number of query descriptors to sample")
+    parser.add_argument('--lists', type=int, default=256, help="Number of coarse lists")
+    parser.add_argument('--subvectors', type=int, default=16, help="PQ codes per descriptor")
+    parser.add_argument('--rerank', type=int, default=32, help="Candidates re-ranked exactly (0: off)")
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 2, 4, 8, 16], help="n_probe values to test")
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Build the index over the store and print the recall-vs-speed table
+    args = parse_args(argv)
+    if not os.path.exists(os.path.join(args.store, 'index.json')):
+        print(f"No feature store at {args.store}; run sift_features.py first")
+        return 1
+    database, _, keys = load_store_descriptors(args.store)
+    rng = np.random.default_rng(args.seed)
+    # Queries are perturbed database descriptors, so every query has a true nearest neighbour
+    rows = rng.choice(len(database), min(args.queries, len(database)), replace=False)
+    queries = database[rows].astype(np.float32) + rng.normal(0, 4, (len(rows), database.shape[1]))
+    print(f"{len(database)} descriptors from {len(keys)} images, {len(queries)} queries")
+
+    start = time.perf_counter()
+    index = IVFPQIndex(n_lists=args.lists, n_subvectors=args.subvectors, rerank=args.rerank, seed=args.seed)
+    index.train(database).add(database)
+    print(f"Index built in {time.perf_counter() - start:.2f} s")
+
+    for row in recall_report(database, queries, index, args.probes):
+        probe = '' if row['n_probe'] is None else f"n_probe={row['n_probe']}"
+        print(f"{row['method']:12s} {probe:12s} {row['queries_per_s']:10.0f} queries/s  "
+              f"recall@1 {row['recall_at_1']:.3f}  ratio-test matches kept {row['match_recall']:.3f}")
+    return 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,224 @@
+# Reusable Haar-cascade face detector for batches of frames and video streams
+#
+# Example:
+#   detector = FaceDetector(downscale=0.5, motion_threshold=25, workers=4)
+#   for boxes in detector.detect_batch(frames):
+#       ...
+#   print(detector.stats())
+import os  # For the default worker count
+import threading  # For per-thread classifiers and the timing lock
+import time  # For stage timings
+from concurrent.futures import ThreadPoolExecutor  # OpenCV releases the GIL while detecting
+import cv2  # OpenCV library
+import numpy as np  # For box arrays
+
+DEFAULT_CASCADE = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+FULL_SCAN_FRACTION = 0.6  # Scan the whole frame when the moving area is larger than this
+REFRESH_INTERVAL = 30  # With a motion mask, rescan the whole frame every this many frames
+
+
+class StageTimer:
+    # Accumulated time per processing stage, safe to update from worker threads
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # Clear all timings and counters
+        self.seconds = {}
+        self.calls = {}
+        self.frames = 0
+        self.wall_seconds = 0.0
+
+    def add(self, stage, seconds):
+        # Record one run of a stage
+        with self.lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def add_frames(self, count, seconds):
+        # Record a processed batch for the frames/s counter
+        with self.lock:
+            self.frames += count
+            self.wall_seconds += seconds
+
+    def stats(self):
+        # Mean milliseconds per stage run, plus frames/s over all batches
+        with self.lock:
+            result = {f"{stage}_ms": 1000 * self.seconds[stage] / self.calls[stage] for stage in self.seconds}
+            result['frames'] = self.frames
+            result['fps'] = self.frames / self.wall_seconds if self.wall_seconds else 0.0
+        return result
+
+
+def to_gray(frame):
+    # Grayscale view of a BGR or already gray frame
+    return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def merge_rects(rects):
+    # Merge overlapping (x0, y0, x1, y1) rectangles until none overlap
+    rects = [list(rect) for rect in rects]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return rects
+
+
+def boxes_outside(boxes, regions):
+    # Boxes (x, y, w, h) that do not touch any (x0, y0, x1, y1) region
+    if len(boxes) == 0 or not regions:
+        return boxes
+    keep = np.ones(len(boxes), dtype=bool)
+    for x0, y0, x1, y1 in regions:
+        keep &= ~((boxes[:, 0] < x1) & (boxes[:, 0] + boxes[:, 2] > x0) &
+                  (boxes[:, 1] < y1) & (boxes[:, 1] + boxes[:, 3] > y0))
+    return boxes[keep]
+
+
+class FaceDetector:
+    # Haar-cascade detector that loads the cascade once per worker thread and processes batches
+    def __init__(self, cascade_path=DEFAULT_CASCADE, scale_factor=1.1, min_neighbors=5, min_size=(30, 30),
+                 downscale=1.0, roi=None, motion_threshold=None, workers=None):
+        if not os.path.exists(cascade_path):
+            raise FileNotFoundError(f"Cascade not found: {cascade_path}")
+        self.cascade_path = cascade_path
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+        self.downscale = downscale  # Detect on a frame resized by this factor, then rescale the boxes
+        self.roi = roi  # Optional (x, y, w, h) in full-resolution pixels; faces are only searched here
+        self.motion_threshold = motion_threshold  # Gray-level change that counts as motion (None: off)
+        self.local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.timer = StageTimer()
+        self.previous_gray = None  # Last small gray frame, for the motion mask
+        self.previous_boxes = np.zeros((0, 4), dtype=np.int32)
+        self.frames_since_scan = 0
+
+    def classifier(self):
+        # This thread's classifier; loaded from XML the first time the thread needs one
+        if getattr(self.local, 'classifier', None) is None:
+            start = time.perf_counter()
+            self.local.classifier = cv2.CascadeClassifier(self.cascade_path)
+            self.timer.add('load', time.perf_counter() - start)
+        return self.local.classifier
+
+    def prepare(self, frame):
+        # Small grayscale frame that detection runs on, and its offset in the full frame
+        start = time.perf_counter()
+        gray = to_gray(frame)
+        offset = (0, 0)
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            gray = gray[y:y + h, x:x + w]
+            offset = (x, y)
+        if self.downscale != 1.0:
+            size = (max(1, round(gray.shape[1] * self.downscale)), max(1, round(gray.shape[0] * self.downscale)))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        self.timer.add('prepare', time.perf_counter() - start)
+        return gray, offset
+
+    def motion_regions(self, gray):
+        # Rectangles (x0, y0, x1, y1) of the small frame that changed since the previous frame;
+        # None means scan the whole frame
+        previous = self.previous_gray
+        self.previous_gray = gray
+        self.frames_since_scan += 1
+        if (self.motion_threshold is None or previous is None or previous.shape != gray.shape
+                or self.frames_since_scan >= REFRESH_INTERVAL):
+            self.frames_since_scan = 0
+            return None
+
+        start = time.perf_counter()
+        diff = cv2.absdiff(gray, previous)
+        _, mask = cv2.threshold(diff, self.motion_threshold, 255, cv2.THRESH_BINARY)
+        # Grow moving areas by a face size so faces partly in motion are scanned whole
+        margin = max(3, int(max(self.min_size) * self.downscale))
+        mask = cv2.dilate(mask, np.ones((margin, margin), np.uint8))
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        height, width = gray.shape
+        rects = []
+        for x, y, w, h, _ in stats[1:count]:
+            rects.append((max(0, x - margin), max(0, y - margin),
+                          min(width, x + w + margin), min(height, y + h + margin)))
+        rects = merge_rects(rects)
+        self.timer.add('motion', time.perf_counter() - start)
+
+        if sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects) > FULL_SCAN_FRACTION * width * height:
+            self.frames_since_scan = 0
+            return None
+        return rects
+
+    def detect_small(self, gray, regions):
+        # Run the cascade on the small frame (or only inside the regions); boxes in small-frame pixels
+        start = time.perf_counter()
+        classifier = self.classifier()
+        min_size = (max(1, int(self.min_size[0] * self.downscale)), max(1, int(self.min_size[1] * self.downscale)))
+        if regions is None:
+            regions = [(0, 0, gray.shape[1], gray.shape[0])]
+        found = []
+        for x0, y0, x1, y1 in regions:
+            if x1 - x0 < min_size[0] or y1 - y0 < min_size[1]:
+                continue
+            boxes = classifier.detectMultiScale(gray[y0:y1, x0:x1], scaleFactor=self.scale_factor,
+                                                minNeighbors=self.min_neighbors, minSize=min_size)
+            if len(boxes):
+                found.append(np.asarray(boxes) + (x0, y0, 0, 0))
+        self.timer.add('detect', time.perf_counter() - start)
+        return np.concatenate(found).astype(np.int32) if found else np.zeros((0, 4), dtype=np.int32)
+
+    def to_full(self, boxes, offset):
+        # Boxes from small-frame pixels back to full-resolution (x, y, w, h)
+        if self.downscale != 1.0:
+            boxes = np.round(boxes / self.downscale).astype(np.int32)
+        return boxes + (offset[0], offset[1], 0, 0)
+
+    def detect_batch(self, frames):
+        # Face boxes (N x 4 arrays of x, y, w, h in full-resolution pixels) for each frame, in order.
+        # Frames are treated as consecutive video frames when a motion threshold is set.
+        start = time.perf_counter()
+        prepared = [self.prepare(frame) for frame in frames]
+
+        # Motion depends on the previous frame, so it is worked out in order before the parallel part
+        regions = [self.motion_regions(gray) for gray, _ in prepared]
+        detected = list(self.executor.map(self.detect_small, [gray for gray, _ in prepared], regions))
+
+        results = []
+        for (gray, offset), frame_regions, boxes in zip(prepared, regions, detected):
+            if frame_regions is not None:
+                # Static parts of the frame keep the faces found there before
+                boxes = np.concatenate([boxes_outside(self.previous_boxes, frame_regions), boxes])
+            self.previous_boxes = boxes
+            results.append(self.to_full(boxes, offset))
+        self.timer.add_frames(len(frames), time.perf_counter() - start)
+        return results
+
+    def detect(self, frame):
+        # Face boxes of a single frame
+        return self.detect_batch([frame])[0]
+
+    def stats(self):
+        # Per-stage mean timings in ms and the frames/s counter
+        return self.timer.stats()
+
+    def reset(self):
+        # Forget the previous frame and the timings (e.g. when switching to another video)
+        self.previous_gray = None
+        self.previous_boxes = np.zeros((0, 4), dtype=np.int32)
+        self.frames_since_scan = 0
+        self.timer.reset()
+
+    def close(self):
+        # Stop the worker threads
+        self.executor.shutdown(wait=True)
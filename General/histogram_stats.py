@@ -0,0 +1,209 @@
+# Streaming intensity histograms over image sets, with Otsu/percentile and tile-local thresholds
+#
+# Example:
+#   python histogram_stats.py Elements/ --workers 8 --percentiles 1 50 99 --apply thresholded/
+#
+# Histograms are merged as they arrive from the worker processes, so memory does not depend on the
+# number of images: 256 bins for 8-bit images, 65536 for 16-bit ones.
+import argparse  # For the command-line interface
+import glob  # For finding input files
+import os  # For file operations
+from concurrent.futures import ProcessPoolExecutor, as_completed  # For parallel histograms
+import cv2  # OpenCV library
+import numpy as np  # For array operations
+
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tif', '*.tiff')
+BITS_FOR_DTYPE = {np.dtype(np.uint8): 8, np.dtype(np.uint16): 16}
+PATHS_PER_TASK = 16  # Images per worker task; each task sends back one histogram
+DEFAULT_TILES = (8, 8)  # Tile grid of the local thresholds, like CLAHE's default
+
+
+def image_bits(img):
+    # Bit depth of a uint8 or uint16 image
+    if img.dtype not in BITS_FOR_DTYPE:
+        raise ValueError(f"Only uint8 and uint16 images are supported, not {img.dtype}")
+    return BITS_FOR_DTYPE[img.dtype]
+
+
+def histogram(img, bits=None):
+    # Counts of every intensity value (int64, 2**bits bins)
+    bits = bits or image_bits(img)
+    return np.bincount(img.ravel(), minlength=2 ** bits).astype(np.int64, copy=False)
+
+
+class HistogramAccumulator:
+    # Running histogram of many images; merging only adds counts
+    def __init__(self, bits=8):
+        self.bits = bits
+        self.counts = np.zeros(2 ** bits, dtype=np.int64)
+        self.images = 0
+
+    def add(self, img):
+        # Add one image (converted to grayscale if it has channels)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if image_bits(img) != self.bits:
+            raise ValueError(f"Expected {self.bits}-bit images, got {img.dtype}")
+        self.counts += histogram(img, self.bits)
+        self.images += 1
+
+    def merge(self, counts, images=1):
+        # Add a histogram computed elsewhere (e.g. by a worker process)
+        self.counts += counts
+        self.images += images
+
+    def otsu(self):
+        # Otsu threshold of everything seen so far
+        return otsu_threshold(self.counts)
+
+    def percentile(self, q):
+        # Intensity below which q percent of the pixels fall
+        return percentile_threshold(self.counts, q)
+
+
+def otsu_threshold(hist):
+    # Otsu threshold t (pixels > t are foreground, as in cv2.threshold) of histograms along the last axis
+    hist = np.asarray(hist, dtype=np.float64)
+    levels = np.arange(hist.shape[-1], dtype=np.float64)
+    total = hist.sum(axis=-1, keepdims=True)
+    weight0 = np.cumsum(hist, axis=-1)  # Pixels at or below each threshold
+    mass0 = np.cumsum(hist * levels, axis=-1)
+    weight1 = total - weight0
+    mass_total = mass0[..., -1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mass_total * weight0 - total * mass0) ** 2 / (weight0 * weight1)
+    between[~np.isfinite(between)] = -1  # Thresholds with an empty class
+    return np.argmax(between, axis=-1)
+
+
+def percentile_threshold(hist, q):
+    # Smallest intensity whose cumulative count reaches q percent, along the last axis
+    cdf = np.cumsum(np.asarray(hist, dtype=np.int64), axis=-1)
+    target = np.asarray(q, dtype=np.float64) / 100 * cdf[..., -1]
+    return np.argmax(cdf >= np.expand_dims(target, -1), axis=-1)
+
+
+def apply_threshold(img, threshold, max_value=255, out=None):
+    # Binary uint8 image: max_value where img > threshold (a scalar or a per-pixel map), else 0
+    if out is None:
+        out = np.empty(img.shape, dtype=np.uint8)
+    np.greater(img, threshold, out=out.view(np.bool_))
+    if max_value != 1:
+        np.multiply(out, np.uint8(max_value), out=out)
+    return out
+
+
+def tile_histograms(img, tiles=DEFAULT_TILES, bits=None):
+    # Histogram of every tile of a grid, shape (tiles_y, tiles_x, bins), in one bincount
+    bits = bits or image_bits(img)
+    bins = 2 ** bits
+    tiles_y, tiles_x = tiles
+    height, width = img.shape[:2]
+    tile_row = (np.arange(height) * tiles_y // height).astype(np.int64)
+    tile_col = (np.arange(width) * tiles_x // width).astype(np.int64)
+    tile_id = (tile_row[:, None] * tiles_x + tile_col[None, :]) * bins
+    counts = np.bincount((tile_id + img).ravel(), minlength=tiles_y * tiles_x * bins)
+    return counts.reshape(tiles_y, tiles_x, bins)
+
+
+def local_threshold_map(img, tiles=DEFAULT_TILES, method='otsu', q=50, bits=None):
+    # Per-pixel threshold: one threshold per tile, bilinearly interpolated between tile centres
+    # like CLAHE's mapping, so there are no seams at tile borders
+    hist = tile_histograms(img, tiles, bits)
+    if method == 'otsu':
+        per_tile = otsu_threshold(hist)
+    elif method == 'percentile':
+        per_tile = percentile_threshold(hist, q)
+    else:
+        raise ValueError("method must be 'otsu' or 'percentile'")
+    return cv2.resize(per_tile.astype(np.float32), (img.shape[1], img.shape[0]), interpolation=cv2.INTER_LINEAR)
+
+
+def local_threshold(img, tiles=DEFAULT_TILES, method='otsu', q=50, max_value=255, out=None):
+    # Binary image thresholded against the interpolated tile thresholds
+    return apply_threshold(img, local_threshold_map(img, tiles, method, q), max_value, out)
+
+
+def read_gray(path):
+    # Grayscale image keeping 16-bit depth
+    img = cv2.imread(path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise FileNotFoundError(f"Image not found: {path}")
+    return img
+
+
+def histogram_of_paths(paths, bits):
+    # Worker task: merged histogram of a few images
+    accumulator = HistogramAccumulator(bits)
+    for path in paths:
+        accumulator.add(read_gray(path))
+    return accumulator.counts, accumulator.images
+
+
+def dataset_histogram(paths, bits=None, workers=None):
+    # Merged histogram of all images, computed across a process pool
+    if not paths:
+        raise ValueError("No images given")
+    bits = bits or image_bits(read_gray(paths[0]))
+    accumulator = HistogramAccumulator(bits)
+    chunks = [paths[i:i + PATHS_PER_TASK] for i in range(0, len(paths), PATHS_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for future in as_completed([executor.submit(histogram_of_paths, chunk, bits) for chunk in chunks]):
+            accumulator.merge(*future.result())
+    return accumulator
+
+
+def find_images(input_dir):
+    # Image files in a directory, sorted for reproducible output
+    paths = set()
+    for pattern in IMAGE_PATTERNS:
+        paths.update(glob.glob(os.path.join(input_dir, pattern)))
+        paths.update(glob.glob(os.path.join(input_dir, pattern.upper())))
+    return sorted(paths)
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Dataset-wide histograms and thresholds")
+    parser.add_argument('input_dir', help="Directory of images")
+    parser.add_argument('--percentiles', type=float, nargs='+', default=[1, 50, 99])
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    parser.add_argument('--apply', metavar='OUTPUT_DIR', help="Write every image thresholded at the Otsu value")
+    parser.add_argument('--local', action='store_true', help="With --apply, use tile-local Otsu thresholds")
+    parser.add_argument('--tiles', type=int, nargs=2, default=list(DEFAULT_TILES), metavar=('Y', 'X'))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Print dataset statistics and optionally write thresholded images
+    args = parse_args(argv)
+    paths = find_images(args.input_dir)
+    if not paths:
+        print(f"No images in {args.input_dir}")
+        return 1
+    stats = dataset_histogram(paths, workers=args.workers)
+    otsu = int(stats.otsu())
+    print(f"{stats.images} images, {stats.counts.sum()} pixels, {stats.bits}-bit")
+    print(f"Otsu threshold: {otsu}")
+    for q in args.percentiles:
+        print(f"{q:g}th percentile: {int(stats.percentile(q))}")
+
+    if args.apply:
+        os.makedirs(args.apply, exist_ok=True)
+        out = None
+        for path in paths:
+            img = read_gray(path)
+            if out is None or out.shape != img.shape:
+                out = np.empty(img.shape, dtype=np.uint8)
+            if args.local:
+                local_threshold(img, tuple(args.tiles), out=out)
+            else:
+                apply_threshold(img, otsu, out=out)
+            name = os.path.splitext(os.path.basename(path))[0]
+            cv2.imwrite(os.path.join(args.apply, f"{name}_threshold.png"), out)
+    return 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,218 @@
+# Declarative image-operation pipeline with reused buffers and background disk output
+#
+# Example:
+#   pipeline = Pipeline([
+#       {'op': 'rotate', 'angle': 90, 'name': 'rotated'},
+#       {'op': 'blur', 'radius': 2, 'input': 'source', 'name': 'blurred'},
+#       {'op': 'threshold', 'value': 127},
+#   ])
+#   for index, outputs in pipeline.run_stream(paths, output_dir='out', save=('rotated', 'threshold')):
+#       ...
+#
+# Every step reads the previous step (or the step named by 'input', or 'source') and writes into a
+# buffer that belongs to that step. Buffers are allocated for the first image and reused for every
+# later image of the same size, so memory does not grow with the number of images.
+import os  # For output paths
+import queue  # For the bounded writer queue
+import threading  # For the background writer
+import cv2  # OpenCV library
+import numpy as np  # For array operations
+
+# PIL's ImageFilter.CONTOUR kernel; CV-001 shows the inverted result, which is the negated filter
+CONTOUR_KERNEL = -np.array([[-1, -1, -1],
+                            [-1, 8, -1],
+                            [-1, -1, -1]], dtype=np.float32)
+WRITE_QUEUE_SIZE = 8  # Outputs waiting to be written at most; bounds the memory used by pending writes
+
+
+def invert_shape(src, step):
+    # Output shape of the invert, blur, contour and threshold steps
+    return src.shape
+
+
+def rotate_shape(src, step):
+    # Output shape of a rotation; the canvas keeps its size unless expand=True (like PIL)
+    height, width = src.shape[:2]
+    if step.get('expand') and step['angle'] % 180 == 90:
+        return (width, height) + src.shape[2:]
+    return src.shape
+
+
+def resize_shape(src, step):
+    # Output shape of a resize given a size or a scale factor
+    height, width = src.shape[:2]
+    if 'size' in step:
+        width, height = step['size']
+    else:
+        width, height = max(1, int(width * step['scale'])), max(1, int(height * step['scale']))
+    return (height, width) + src.shape[2:]
+
+
+def run_invert(src, dst, step):
+    # 255 - image
+    cv2.bitwise_not(src, dst=dst)
+
+
+def run_rotate(src, dst, step):
+    # Counter-clockwise rotation in degrees about the image centre, like PIL's Image.rotate
+    angle = step['angle'] % 360
+    if step.get('expand') and angle in (90, 180, 270):
+        codes = {90: cv2.ROTATE_90_COUNTERCLOCKWISE, 180: cv2.ROTATE_180, 270: cv2.ROTATE_90_CLOCKWISE}
+        cv2.rotate(src, codes[angle], dst=dst)
+        return
+    height, width = src.shape[:2]
+    matrix = cv2.getRotationMatrix2D(((width - 1) / 2, (height - 1) / 2), angle, 1)  # Pixel-centre convention
+    interpolation = cv2.INTER_LINEAR if step.get('smooth') else cv2.INTER_NEAREST  # PIL default: nearest
+    cv2.warpAffine(src, matrix, (dst.shape[1], dst.shape[0]), dst=dst, flags=interpolation)
+
+
+def run_resize(src, dst, step):
+    # Resize into the step's buffer; area averaging when shrinking
+    shrinking = dst.shape[0] < src.shape[0] or dst.shape[1] < src.shape[1]
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+    cv2.resize(src, (dst.shape[1], dst.shape[0]), dst=dst, interpolation=interpolation)
+
+
+def run_blur(src, dst, step):
+    # Gaussian blur with PIL's meaning of radius (the standard deviation)
+    radius = step.get('radius', 2)
+    cv2.GaussianBlur(src, (0, 0), radius, dst=dst)
+
+
+def run_contour(src, dst, step):
+    # Inverted PIL CONTOUR filter: bright edges on a dark background
+    cv2.filter2D(src, -1, CONTOUR_KERNEL, dst=dst)
+
+
+def run_threshold(src, dst, step):
+    # Binary threshold at a fixed value, or Otsu's threshold (grayscale only) with method='otsu'
+    flags = cv2.THRESH_BINARY
+    if step.get('method') == 'otsu':
+        flags |= cv2.THRESH_OTSU
+    cv2.threshold(src, step.get('value', 127), step.get('max_value', 255), flags, dst=dst)
+
+
+# name -> (run function, output shape function, can write into its own input)
+OPERATIONS = {
+    'invert': (run_invert, invert_shape, True),
+    'rotate': (run_rotate, rotate_shape, False),
+    'resize': (run_resize, resize_shape, False),
+    'blur': (run_blur, invert_shape, True),
+    'contour': (run_contour, invert_shape, False),
+    'threshold': (run_threshold, invert_shape, True),
+}
+
+
+class DiskWriter:
+    # Writes outputs on a background thread; the queue is bounded so pending writes cannot pile up
+    def __init__(self, max_pending=WRITE_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.errors = []
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        # Worker loop: write until the None sentinel arrives
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, image = item
+            try:
+                if not cv2.imwrite(path, image):
+                    raise OSError(f"Could not write {path}")
+            except Exception as e:
+                self.errors.append(e)
+
+    def write(self, path, image):
+        # Queue a copy of the image (the pipeline reuses its buffers); blocks while the queue is full
+        self.queue.put((path, image.copy()))
+
+    def close(self):
+        # Finish pending writes and raise the first error, if any
+        self.queue.put(None)
+        self.thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+
+class Pipeline:
+    # Ordered list of steps run on one image or a stream of images
+    def __init__(self, steps):
+        self.steps = []
+        names = {'source'}
+        for index, step in enumerate(steps):
+            step = {'op': step} if isinstance(step, str) else dict(step)
+            if step['op'] not in OPERATIONS:
+                raise ValueError(f"Unknown operation {step['op']!r}; expected one of {tuple(OPERATIONS)}")
+            step.setdefault('name', step['op'] if step['op'] not in names else f"{step['op']}_{index}")
+            step.setdefault('input', self.steps[-1]['name'] if self.steps else 'source')
+            if step['input'] not in names:
+                raise ValueError(f"Step {step['name']!r} reads unknown input {step['input']!r}")
+            if step['name'] in names:
+                raise ValueError(f"Duplicate step name {step['name']!r}")
+            names.add(step['name'])
+            self.steps.append(step)
+        self.buffers = {}  # step name -> reusable output array
+
+        # A step may overwrite its input buffer when nothing else reads that intermediate
+        readers = {}
+        for step in self.steps:
+            readers[step['input']] = readers.get(step['input'], 0) + 1
+        for step in self.steps:
+            step['inplace'] = (OPERATIONS[step['op']][2] and step['input'] != 'source'
+                               and readers[step['input']] == 1)
+
+    @property
+    def names(self):
+        # Names of all step outputs, in order
+        return [step['name'] for step in self.steps]
+
+    def buffer(self, name, shape, dtype):
+        # The step's output buffer, reallocated only when the image size or type changes
+        buf = self.buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self.buffers[name] = buf
+        return buf
+
+    def run(self, image, keep=None):
+        # Run all steps on one image. The returned arrays are the pipeline's buffers and are
+        # overwritten by the next call; copy them if they must outlive it. Steps that run in place
+        # overwrite their input, so intermediates needed in the result must be listed in `keep`.
+        keep = set(keep or ())
+        results = {'source': image}
+        for step in self.steps:
+            src = results[step['input']]
+            run, shape_of, _ = OPERATIONS[step['op']]
+            if step['inplace'] and step['input'] not in keep:
+                dst = src
+            else:
+                dst = self.buffer(step['name'], shape_of(src, step), src.dtype)
+            run(src, dst, step)
+            results[step['name']] = dst
+        return results
+
+    def run_stream(self, images, output_dir=None, save=(), extension='.png', read_flags=cv2.IMREAD_UNCHANGED):
+        # Run the pipeline over arrays or image paths, yielding (index, results) per image.
+        # Outputs named in `save` are written to output_dir in the background.
+        writer = DiskWriter() if output_dir and save else None
+        if writer:
+            os.makedirs(output_dir, exist_ok=True)
+        try:
+            for index, image in enumerate(images):
+                stem = f"{index:06d}"
+                if isinstance(image, str):
+                    stem = os.path.splitext(os.path.basename(image))[0]
+                    path = image
+                    image = cv2.imread(path, read_flags)
+                    if image is None:
+                        raise FileNotFoundError(f"Image not found: {path}")
+                results = self.run(image, keep=save)
+                if writer:
+                    for name in save:
+                        writer.write(os.path.join(output_dir, f"{stem}_{name}{extension}"), results[name])
+                yield index, results
+        finally:
+            if writer:
+                writer.close()
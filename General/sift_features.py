@@ -0,0 +1,221 @@
+# SIFT detect+compute over image directories, with an on-disk columnar feature store
+#
+# Example:
+#   python sift_features.py Elements/ --store features/ --max-size 1600 --dtype uint8 --workers 8
+#
+# Store layout, one directory per (image content, settings):
+#   <store>/<sha1>-<settings>/xy.npy, size.npy, angle.npy, response.npy, octave.npy, descriptors.npy
+# Every column is a plain .npy file, so it can be memory-mapped without loading the whole store.
+# <store>/index.json maps image paths to their entry so unchanged files are not even re-hashed.
+import argparse  # For the command-line interface
+import glob  # For finding input files
+import hashlib  # For content hashes
+import json  # For the path index
+import os  # For file operations
+import shutil  # For removing partial entries
+import time  # For throughput measurement
+from concurrent.futures import ProcessPoolExecutor, as_completed  # For parallel extraction
+import cv2  # OpenCV library
+import numpy as np  # For array operations
+
+COLUMNS = ('xy', 'size', 'angle', 'response', 'octave', 'descriptors')
+DESCRIPTOR_DTYPES = ('float32', 'uint8')
+IMAGE_PATTERNS = ('*.jpg', '*.jpeg', '*.png', '*.bmp', '*.tif', '*.tiff')
+HASH_CHUNK = 1024 * 1024
+
+
+def content_hash(path):
+    # SHA-1 of the file contents, read in chunks
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_tag(max_size, n_features, dtype):
+    # Short name of the extraction settings, part of every store key
+    return f"{max_size or 'full'}-{n_features or 'all'}-{dtype}"
+
+
+def pyramid_level(gray, max_size):
+    # Halve the image with pyrDown until its longest edge fits max_size; returns the image and its scale
+    scale = 1.0
+    if max_size:
+        while max(gray.shape) > max_size:
+            gray = cv2.pyrDown(gray)
+            scale *= 0.5
+    return gray, scale
+
+
+def extract(gray, max_size=None, n_features=0, dtype='float32'):
+    # Keypoints and descriptors of a grayscale image as columns, in full-resolution coordinates
+    small, scale = pyramid_level(gray, max_size)
+    sift = cv2.SIFT_create(nfeatures=n_features)
+    keypoints, descriptors = sift.detectAndCompute(small, None)
+    if descriptors is None:
+        descriptors = np.zeros((0, 128), dtype=np.float32)
+
+    columns = {
+        'xy': np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2) / scale,
+        'size': np.array([kp.size for kp in keypoints], dtype=np.float32) / scale,
+        'angle': np.array([kp.angle for kp in keypoints], dtype=np.float32),
+        'response': np.array([kp.response for kp in keypoints], dtype=np.float32),
+        'octave': np.array([kp.octave for kp in keypoints], dtype=np.int32),
+    }
+    # SIFT descriptor values are already whole numbers in 0-255, so uint8 loses almost nothing
+    if dtype == 'uint8':
+        columns['descriptors'] = np.clip(np.rint(descriptors), 0, 255).astype(np.uint8)
+    else:
+        columns['descriptors'] = descriptors.astype(np.float32, copy=False)
+    return columns
+
+
+def to_keypoints(columns):
+    # cv2.KeyPoint objects from stored columns (e.g. for cv2.drawKeypoints)
+    return [cv2.KeyPoint(float(x), float(y), float(size), float(angle), float(response), int(octave))
+            for (x, y), size, angle, response, octave in zip(columns['xy'], columns['size'], columns['angle'],
+                                                             columns['response'], columns['octave'])]
+
+
+class FeatureStore:
+    # Directory of extracted features keyed by image content hash and extraction settings
+    def __init__(self, root):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.json')
+        os.makedirs(root, exist_ok=True)
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+    def entry_dir(self, key):
+        # Directory holding the columns of one entry
+        return os.path.join(self.root, key)
+
+    def contains(self, key):
+        # True when all columns of an entry are present
+        return os.path.exists(os.path.join(self.entry_dir(key), 'descriptors.npy'))
+
+    def key_for(self, path, tag):
+        # Store key of an image, re-hashing it only when its size or modification time changed
+        stat = os.stat(path)
+        record = self.index.get(os.path.abspath(path))
+        if record and record['mtime_ns'] == stat.st_mtime_ns and record['size'] == stat.st_size:
+            digest = record['hash']
+        else:
+            digest = content_hash(path)
+        return f"{digest}-{tag}"
+
+    def remember(self, path, key):
+        # Record which entry holds the features of a path (written by save_index)
+        stat = os.stat(path)
+        self.index[os.path.abspath(path)] = {'hash': key.split('-')[0], 'key': key,
+                                             'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+    def save_index(self):
+        # Write the path index atomically
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(temp_path, self.index_path)
+
+    def write(self, key, columns):
+        # Write one entry into a temporary directory and rename it, so readers never see partial entries
+        final_dir = self.entry_dir(key)
+        temp_dir = f"{final_dir}.{os.getpid()}.tmp"
+        os.makedirs(temp_dir, exist_ok=True)
+        try:
+            for name in COLUMNS:
+                np.save(os.path.join(temp_dir, f"{name}.npy"), columns[name])
+            os.replace(temp_dir, final_dir)
+        except OSError:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if not self.contains(key):  # Another process finishing the same entry first is fine
+                raise
+
+    def load(self, key, mmap=True):
+        # Columns of one entry, memory-mapped read-only by default
+        mode = 'r' if mmap else None
+        return {name: np.load(os.path.join(self.entry_dir(key), f"{name}.npy"), mmap_mode=mode)
+                for name in COLUMNS}
+
+    def load_path(self, path, mmap=True):
+        # Columns of an indexed image path
+        return self.load(self.index[os.path.abspath(path)]['key'], mmap=mmap)
+
+
+def process_image(path, key, store_root, options):
+    # Worker task: extract one image and write it straight into the store (nothing large is sent back)
+    start = time.perf_counter()
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise ValueError(f"Could not read image: {path}")
+    columns = extract(gray, options['max_size'], options['n_features'], options['dtype'])
+    FeatureStore(store_root).write(key, columns)
+    return len(columns['xy']), time.perf_counter() - start
+
+
+def find_images(input_dir):
+    # Image files in a directory, sorted for reproducible output
+    paths = set()
+    for pattern in IMAGE_PATTERNS:
+        paths.update(glob.glob(os.path.join(input_dir, pattern)))
+        paths.update(glob.glob(os.path.join(input_dir, pattern.upper())))
+    return sorted(paths)
+
+
+def extract_directory(input_dir, store_root, max_size=None, n_features=0, dtype='float32', workers=None):
+    # Extract every image in a directory that is not in the store yet; returns {path: key}
+    store = FeatureStore(store_root)
+    tag = settings_tag(max_size, n_features, dtype)
+    options = {'max_size': max_size, 'n_features': n_features, 'dtype': dtype}
+    keys = {path: store.key_for(path, tag) for path in find_images(input_dir)}
+    todo = {path: key for path, key in keys.items() if not store.contains(key)}
+    print(f"{len(keys)} images, {len(keys) - len(todo)} already in the store")
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_image, path, key, store_root, options): path
+                   for path, key in todo.items()}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                count, seconds = future.result()
+                print(f"{path}: {count} keypoints in {seconds:.2f} s")
+            except Exception as e:
+                failed.append(path)
+                print(f"{path}: ERROR: {e}")
+
+    for path, key in keys.items():
+        if path not in failed:
+            store.remember(path, key)
+    store.save_index()
+    return {path: key for path, key in keys.items() if path not in failed}
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Extract SIFT features for a directory of images")
+    parser.add_argument('input_dir', help="Directory of images")
+    parser.add_argument('--store', default='features', help="Feature store directory")
+    parser.add_argument('--max-size', type=int, help="Halve images until their longest edge fits this")
+    parser.add_argument('--features', type=int, default=0, help="Keep the best N keypoints (0: all)")
+    parser.add_argument('--dtype', choices=DESCRIPTOR_DTYPES, default='float32', help="Descriptor storage type")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Number of worker processes")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Extract the directory and print a throughput summary
+    args = parse_args(argv)
+    start = time.perf_counter()
+    keys = extract_directory(args.input_dir, args.store, args.max_size, args.features, args.dtype, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{len(keys)} images in the store, {elapsed:.2f} s")
+    return 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,327 @@
+# Streaming version of the CV-002 analysis (grayscale, SIFT, threshold, faces, histogram) for video
+#
+# Examples:
+#   python video_stream.py recording.mp4 --workers 4 --skip 1
+#   python video_stream.py 0 --drop drop_oldest                 # live camera 0
+#   python video_stream.py --synthetic --frames 300 --realtime  # offline test, no camera or file
+#
+# A decode thread reads frames into a bounded queue; analysis workers take frames from the queue.
+# When the analysis falls behind, the drop policy decides what happens:
+#   block        the decoder waits (no frame is lost; right for files)
+#   drop_oldest  the oldest queued frame is discarded (lowest latency; right for live cameras)
+#   drop_newest  the incoming frame is discarded
+import argparse  # For the command-line interface
+import queue  # For the bounded frame queue
+import threading  # For the decode thread
+import time  # For timestamps and pacing
+from concurrent.futures import ThreadPoolExecutor  # OpenCV releases the GIL while analysing
+import cv2  # OpenCV library
+import numpy as np  # For array operations
+from face_detector import FaceDetector, StageTimer  # For cached face detection and stage timings
+
+DROP_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+QUEUE_SIZE = 8  # Frames buffered between the decoder and the analysis
+BATCH_SIZE = 4  # Frames analysed together at most
+END = object()  # Queue marker for the end of the stream
+
+
+class SyntheticCapture:
+    # Stand-in for cv2.VideoCapture producing moving test patterns, for offline runs and tests
+    def __init__(self, width=640, height=480, frames=300, fps=30.0, realtime=False, seed=0):
+        self.width = width
+        self.height = height
+        self.frames = frames
+        self.fps = fps
+        self.realtime = realtime  # Deliver frames no faster than fps, like a camera
+        self.index = 0
+        self.next_time = None
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        # Advance one frame without producing pixels
+        if self.index >= self.frames:
+            return False
+        if self.realtime:
+            now = time.perf_counter()
+            self.next_time = now if self.next_time is None else self.next_time
+            if self.next_time > now:
+                time.sleep(self.next_time - now)
+            self.next_time += 1 / self.fps
+        self.index += 1
+        return True
+
+    def retrieve(self):
+        # Pixels of the last grabbed frame: a bright square moving over a noisy background
+        frame = self.background.copy()
+        size = min(self.width, self.height) // 4
+        x = (self.index * 7) % max(1, self.width - size)
+        y = (self.index * 3) % max(1, self.height - size)
+        cv2.rectangle(frame, (x, y), (x + size, y + size), (200, 220, 240), -1)
+        cv2.putText(frame, str(self.index), (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        return True, frame
+
+    def read(self):
+        # grab() + retrieve(), like cv2.VideoCapture.read
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        # Frame rate and size queries used by the stream
+        return {cv2.CAP_PROP_FPS: self.fps, cv2.CAP_PROP_FRAME_WIDTH: self.width,
+                cv2.CAP_PROP_FRAME_HEIGHT: self.height}.get(prop, 0.0)
+
+    def release(self):
+        pass
+
+
+class VideoStream:
+    # Decodes frames on its own thread into a bounded queue
+    def __init__(self, source, queue_size=QUEUE_SIZE, skip=0, drop_policy='block', timer=None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"drop_policy must be one of {DROP_POLICIES}")
+        # Camera index, file path/URL, or an object with the VideoCapture interface
+        self.capture = source if hasattr(source, 'read') else cv2.VideoCapture(source)
+        if not self.capture.isOpened():
+            raise OSError(f"Could not open video source {source!r}")
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.skip = skip  # Frames skipped (grabbed but not decoded) after every analysed frame
+        self.drop_policy = drop_policy
+        self.timer = timer or StageTimer()
+        self.stop_event = threading.Event()
+        self.decoded = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        # Start decoding
+        self.thread.start()
+        return self
+
+    def put(self, item):
+        # Queue a frame according to the drop policy; returns False when the stream is stopping
+        if self.drop_policy == 'drop_newest':
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self.dropped += 1
+            return not self.stop_event.is_set()
+        if self.drop_policy == 'drop_oldest':
+            while True:
+                try:
+                    self.queue.put_nowait(item)
+                    return not self.stop_event.is_set()
+                except queue.Full:
+                    try:
+                        self.queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        while not self.stop_event.is_set():  # block
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def run(self):
+        # Decode thread: read, skip and queue frames until the source ends or stop() is called
+        index = 0
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                ok, frame = self.capture.read()
+                if not ok:
+                    break
+                self.timer.add('decode', time.perf_counter() - start)
+                self.decoded += 1
+                if not self.put((index, time.perf_counter(), frame)):
+                    break
+                index += 1
+                # Skipped frames are only grabbed, which avoids decoding their pixels
+                for _ in range(self.skip):
+                    if not self.capture.grab():
+                        break
+                    self.skipped += 1
+                    index += 1
+        finally:
+            # The end marker must get through even under drop_newest
+            while True:
+                try:
+                    self.queue.put(END, timeout=0.1)
+                    break
+                except queue.Full:
+                    if self.stop_event.is_set():
+                        try:
+                            self.queue.get_nowait()
+                        except queue.Empty:
+                            pass
+
+    def frames(self, batch_size=BATCH_SIZE):
+        # Yield lists of up to batch_size queued (index, capture time, frame) tuples until the end
+        while True:
+            start = time.perf_counter()
+            item = self.queue.get()
+            self.timer.add('queue_wait', time.perf_counter() - start)
+            if item is END:
+                return
+            batch = [item]
+            while len(batch) < batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is END:
+                    yield batch
+                    return
+                batch.append(item)
+            yield batch
+
+    def stop(self):
+        # Stop decoding and release the source
+        self.stop_event.set()
+        self.thread.join()
+        self.capture.release()
+
+
+class StreamAnalyzer:
+    # Runs the CV-002 analysis on every frame of a VideoStream using a pool of worker threads
+    def __init__(self, workers=4, sift=True, threshold=127, faces=True, face_options=None,
+                 keep_threshold_image=False):
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.local = threading.local()
+        self.sift = sift
+        self.threshold = threshold
+        self.keep_threshold_image = keep_threshold_image
+        self.timer = StageTimer()
+        self.face_detector = FaceDetector(workers=workers, **(face_options or {})) if faces else None
+        self.processed = 0
+
+    def stage(self, name, func, *args):
+        # Run one analysis stage and record its time
+        start = time.perf_counter()
+        result = func(*args)
+        self.timer.add(name, time.perf_counter() - start)
+        return result
+
+    def detector(self):
+        # This thread's SIFT detector
+        if getattr(self.local, 'sift', None) is None:
+            self.local.sift = cv2.SIFT_create()
+        return self.local.sift
+
+    def analyze(self, item):
+        # Grayscale, SIFT keypoints, threshold and histogram of one frame (faces run separately)
+        index, captured, frame = item
+        gray = self.stage('gray', cv2.cvtColor, frame, cv2.COLOR_BGR2GRAY)
+        result = {'index': index, 'captured': captured, 'gray': gray}
+        if self.sift:
+            result['keypoints'] = self.stage('sift', self.detector().detect, gray, None)
+        binary = self.stage('threshold', cv2.threshold, gray, self.threshold, 255, cv2.THRESH_BINARY)[1]
+        result['foreground_fraction'] = float(np.count_nonzero(binary)) / binary.size
+        if self.keep_threshold_image:
+            result['threshold'] = binary
+        result['histogram'] = self.stage('histogram', cv2.calcHist, [gray], [0], None, [256], [0, 256]).ravel()
+        return result
+
+    def run(self, stream, batch_size=BATCH_SIZE, max_frames=None):
+        # Yield one result dictionary per analysed frame, in stream order
+        start = time.perf_counter()
+        stream.start()
+        try:
+            for batch in stream.frames(batch_size):
+                batch_start = time.perf_counter()
+                results = list(self.executor.map(self.analyze, batch))
+                if self.face_detector is not None:
+                    # Faces run as one batch so the detector's motion mask sees frames in order
+                    face_start = time.perf_counter()
+                    boxes = self.face_detector.detect_batch([result['gray'] for result in results])
+                    self.timer.add('faces', time.perf_counter() - face_start)
+                    for result, frame_boxes in zip(results, boxes):
+                        result['faces'] = frame_boxes
+                done = time.perf_counter()
+                self.timer.add_frames(len(results), done - batch_start)
+                for result in results:
+                    self.timer.add('end_to_end', done - result['captured'])
+                    del result['gray']
+                    self.processed += 1
+                    yield result
+                    if max_frames is not None and self.processed >= max_frames:
+                        return
+        finally:
+            stream.stop()
+            self.wall_seconds = time.perf_counter() - start
+
+    def metrics(self, stream):
+        # Per-stage latency (ms), frame counts and end-to-end throughput
+        result = self.timer.stats()
+        result['analysis_fps'] = result.pop('fps')
+        result.pop('frames')
+        decode = stream.timer.stats()
+        result.update({name: value for name, value in decode.items() if name.endswith('_ms')})
+        result['end_to_end_fps'] = self.processed / self.wall_seconds if getattr(self, 'wall_seconds', 0) else 0.0
+        result.update({'decoded': stream.decoded, 'skipped': stream.skipped, 'dropped': stream.dropped,
+                       'processed': self.processed})
+        return result
+
+    def close(self):
+        # Stop the worker threads
+        self.executor.shutdown(wait=True)
+        if self.face_detector is not None:
+            self.face_detector.close()
+
+
+def parse_args(argv=None):
+    # Command-line options
+    parser = argparse.ArgumentParser(description="Run the CV-002 analysis on a video stream")
+    parser.add_argument('source', nargs='?', default=None, help="Video file, URL or camera index")
+    parser.add_argument('--synthetic', action='store_true', help="Use a generated test video")
+    parser.add_argument('--frames', type=int, default=300, help="Length of the synthetic video")
+    parser.add_argument('--realtime', action='store_true', help="Pace the synthetic video like a camera")
+    parser.add_argument('--fps', type=float, default=30.0, help="Frame rate of the synthetic video")
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE, help="Frame queue size")
+    parser.add_argument('--skip', type=int, default=0, help="Frames skipped after each analysed frame")
+    parser.add_argument('--drop', choices=DROP_POLICIES, default='block', help="Policy when the queue is full")
+    parser.add_argument('--workers', type=int, default=4, help="Analysis worker threads")
+    parser.add_argument('--batch', type=int, default=BATCH_SIZE, help="Frames analysed together at most")
+    parser.add_argument('--max-frames', type=int, help="Stop after this many analysed frames")
+    parser.add_argument('--no-faces', action='store_true', help="Skip face detection")
+    parser.add_argument('--downscale', type=float, default=0.5, help="Face detection scale")
+    parser.add_argument('--motion-threshold', type=int, help="Only rescan moving regions for faces")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Stream the source through the analysis and print a progress line per second plus final metrics
+    args = parse_args(argv)
+    if args.synthetic or args.source is None:
+        source = SyntheticCapture(frames=args.frames, fps=args.fps, realtime=args.realtime)
+    else:
+        source = int(args.source) if args.source.isdigit() else args.source
+    stream = VideoStream(source, queue_size=args.queue, skip=args.skip, drop_policy=args.drop)
+    analyzer = StreamAnalyzer(workers=args.workers, faces=not args.no_faces,
+                              face_options={'downscale': args.downscale, 'motion_threshold': args.motion_threshold})
+    last_report = time.perf_counter()
+    try:
+        for result in analyzer.run(stream, args.batch, args.max_frames):
+            if time.perf_counter() - last_report >= 1.0:
+                last_report = time.perf_counter()
+                print(f"frame {result['index']}: {len(result.get('keypoints', ()))} keypoints, "
+                      f"{len(result.get('faces', ()))} faces, queue {stream.queue.qsize()}, "
+                      f"dropped {stream.dropped}")
+    finally:
+        analyzer.close()
+    for name, value in analyzer.metrics(stream).items():
+        print(f"{name:20s} {value:.2f}" if isinstance(value, float) else f"{name:20s} {value}")
+    return 0
+
+
+# Main program execution
+if __name__ == "__main__":
+    raise SystemExit(main())